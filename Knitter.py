@@ -1,43 +1,107 @@
 import tkinter as tk
-from tkinter import colorchooser, filedialog, messagebox
+from tkinter import colorchooser, filedialog, messagebox, simpledialog, ttk
 import json
-import copy
+import os
+from pattern import YARN_PER_STITCH_CM, PaletteFullError, Pattern
+from renderers import RectangleRenderer, ImageRenderer, Overlay
+from history import CellEdit, GridEdit, History, RegionEdit, ids_in, region_cells
+from fileformats import format_for_path, formats, load_pattern_file, save_pattern_file
+import transforms
+from selection import Selection, Clip, line_cells
+from instructions import color_labels, write_instructions
+from imaging import import_image, open_image, write_png
+from journal import Journal, claim_orphans, release_journal, replay
+from documents import Document
+from profiling import Profiler, profiled
+from symmetry import MODES as SYMMETRY_MODES, Symmetry
+from patterndiff import Diff, merge
+from tasks import TaskScheduler
+import generators
 
 class KnittingPatternApp:
     def __init__(self, master):
         self.master = master
         self.master.title("Knitting Pattern Designer")
         self.master.geometry("1040x520")
+        self.master.report_callback_exception = self.report_callback_error
 
         self.selected_color = "#aabbcc"
         self.default_width = 32
         self.default_height = 18
-        self.max_width = 128
-        self.max_height = 128
+        self.renderer_limits = {"rectangle": (128, 128), "image": (1024, 1024)}
+        self.renderer_kind = "rectangle"
+        self.max_width, self.max_height = self.renderer_limits[self.renderer_kind]
         self.cell_size = 24
-
-        self.history = []
-        self.redo_stack = []
+        self.debug_canvas_index = False
+        self.history_memory_budget = 32 * 1024 * 1024
+        self.yarn_per_stitch_cm = YARN_PER_STITCH_CM
+        self.profiler = Profiler()
+        self.symmetry = Symmetry()
+        self.profiler_update = None
+        self.journal_dir = os.path.join(os.path.expanduser("~"), ".pyknitter_sessions")
+        os.makedirs(self.journal_dir, exist_ok=True)
+        # Claimed before this session creates any journal of its own; offered for recovery once the window is up.
+        self.orphans = claim_orphans(self.journal_dir)
+
+        self.documents = []
+        self.document = None
+        self.untitled_count = 0
+        self.journal_count = 0
+        self.bind_document(self.new_document(pattern=Pattern(self.default_width, self.default_height)))
+        self.documents.append(self.document)
+        self.pending_changes = {}
         self.resize_timer = None
+        self.usage_update = None
+        self.usage_rows = {}
+        self.instructions_window = None
+        self.instructions_update = None
+        self.instruction_rows = set()
+        self.instruction_labels = None
+        self.tasks = TaskScheduler(self.master, self.show_task_status)
+        self.generator_window = None
+        self.generator_update = None
+        self.generator_before = None
+        self.deferred_results = []
+        self.document_loads = {}
 
         self.create_controls()
         self.bind_shortcuts()
         self.generate_grid(self.default_width, self.default_height)
+        self.history.clear()
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.is_dragging = False
-        self.last_dragged_cell = None
-        self.toggled_cells = set()
+        self.stroking = False
+        self.stroke_points = []
+        self.last_stroke_cell = None
+        self.stroke_flush = None
 
         self.box_start = None
         self.box_end = None
         self.box_mode = False
-        self.previous_rectangle = []
+
+        self.tool = None
+        self.selection = None
+        self.selection_anchor = None
+        self.selection_end = None
+        self.lasso_points = []
+        self.clipboard = None
+        self.last_stamp = None
+
+        self.recover_session()
 
 #Initialization and setup -------------------------------------------------------------------------
 
+    def report_callback_error(self, exc, value, traceback):
+        # A full palette is reported to the user; anything else goes to Tk's handler.
+        if isinstance(value, PaletteFullError):
+            messagebox.showerror("Too Many Colors", str(value))
+        else:
+            tk.Tk.report_callback_exception(self.master, exc, value, traceback)
+
     def create_controls(self):
         control_frame = tk.Frame(self.master)
-        control_frame.grid(row=0, column=0, sticky="ns")
+        control_frame.grid(row=0, column=0, rowspan=3, sticky="ns")
 
         self.create_save_load_controls(control_frame)
         self.create_grid_controls(control_frame)
@@ -46,38 +110,110 @@ class KnittingPatternApp:
         self.create_grid_resize_controls(control_frame)
         self.create_zoom_controls(control_frame)
         self.create_color_controls(control_frame)
+        self.create_selection_controls(control_frame)
+        self.create_symmetry_controls(control_frame)
 
+        self.create_tab_bar()
         self.canvas = tk.Canvas(self.master, bg='white')
-        self.canvas.grid(row=0, column=1, sticky="nsew")
+        self.canvas.grid(row=1, column=1, sticky="nsew")
+        self.create_scrollbars()
+        self.create_usage_panel()
+        self.create_status_bar()
+        self.renderer = self.create_renderer(self.renderer_kind)
+        self.overlay = Overlay(self.canvas, self.cell_size)
+
+        self.canvas.bind("<Button-1>", self.start_drag)
+        self.canvas.bind("<B1-Motion>", self.dragging)
+        self.canvas.bind("<ButtonRelease-1>", self.end_drag)
+
+        self.canvas.bind("<Button-3>", self.pick_color)
+        self.canvas.bind("<Motion>", self.hover)
 
-        self.master.grid_rowconfigure(0, weight=1)
+        self.canvas.bind("<Configure>", lambda e: self.renderer.viewport_changed())
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Shift-MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-5>", self.on_mouse_wheel)
+        self.canvas.bind("<Shift-Button-4>", self.on_mouse_wheel)
+        self.canvas.bind("<Shift-Button-5>", self.on_mouse_wheel)
+
+        self.master.grid_rowconfigure(1, weight=1)
         self.master.grid_columnconfigure(1, weight=1) 
 
-        self.master.grid_rowconfigure(1, weight=0)
+        self.master.grid_rowconfigure([0, 2], weight=0)
+
+    def create_tab_bar(self):
+        tab_frame = tk.Frame(self.master)
+        tab_frame.grid(row=0, column=1, columnspan=2, sticky="ew")
+        self.notebook = ttk.Notebook(tab_frame, height=0)
+        self.notebook.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        tk.Button(tab_frame, text="x", command=self.close_document).pack(side=tk.RIGHT)
+        tk.Button(tab_frame, text="+", command=self.open_new_document).pack(side=tk.RIGHT)
+        for document in self.documents:
+            self.notebook.add(tk.Frame(self.notebook), text=document.title)
+
+    def create_scrollbars(self):
+        self.x_scrollbar = tk.Scrollbar(self.master, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        self.x_scrollbar.grid(row=2, column=1, sticky="ew")
+        self.y_scrollbar = tk.Scrollbar(self.master, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.y_scrollbar.grid(row=1, column=2, sticky="ns")
+        self.canvas.config(xscrollcommand=self.on_x_scroll, yscrollcommand=self.on_y_scroll)
+
+    def create_usage_panel(self):
+        self.usage_frame = tk.Frame(self.master)
+        self.usage_frame.grid(row=0, column=3, rowspan=3, sticky="ns")
+        tk.Label(self.usage_frame, text="Color Usage").grid(row=0, column=0, columnspan=2)
+        self.usage_total_label = tk.Label(self.usage_frame)
+        self.usage_total_label.grid(row=1, column=0, columnspan=2)
+
+    def create_status_bar(self):
+        self.status_frame = tk.Frame(self.master)
+        self.status_frame.grid(row=3, column=1, columnspan=2, sticky="ew")
+        self.status_label = tk.Label(self.status_frame, anchor="w")
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.status_cancel = tk.Button(self.status_frame, text="Cancel", command=self.cancel_task)
+        self.status_cancel.pack(side=tk.RIGHT)
+        self.status_progress = ttk.Progressbar(self.status_frame, length=200, maximum=1.0)
+        self.status_progress.pack(side=tk.RIGHT, padx=5)
+        self.status_frame.grid_remove()
 
     def create_save_load_controls(self, parent):
         save_load_frame = tk.Frame(parent)
         save_load_frame.grid(row=0, column=0, columnspan=2, sticky="ew")
-        save_load_frame.columnconfigure([0, 1], weight=1)
+        save_load_frame.columnconfigure([0, 1, 2], weight=1)
 
         buttons = [
             ("Save Pattern", self.save_pattern),
             ("Load Pattern", self.load_pattern),
+            ("Instructions", self.show_instructions),
+            ("Export PNG", self.export_png),
+            ("Import Image", self.import_image),
+            ("Compare...", self.compare_pattern),
+            ("Merge...", self.merge_patterns),
+            ("Clear Highlights", self.clear_highlights),
+            ("Generate...", self.show_generator),
         ]
         for i, (text, cmd) in enumerate(buttons):
-            tk.Button(save_load_frame, text=text, command=cmd).grid(row=0, column=i, sticky="nsew")
+            tk.Button(save_load_frame, text=text, command=cmd).grid(row=i // 3, column=i % 3, sticky="nsew")
 
     def create_grid_controls(self, parent):
-        tk.Label(parent, text="Grid Width: (Max 128)").grid(row=1, column=0)
+        self.width_label = tk.Label(parent, text=f"Grid Width: (Max {self.max_width})")
+        self.width_label.grid(row=1, column=0)
         self.width_entry = tk.Entry(parent)
         self.width_entry.grid(row=1, column=1)
 
-        tk.Label(parent, text="Grid Height: (Max 128)").grid(row=2, column=0)
+        self.height_label = tk.Label(parent, text=f"Grid Height: (Max {self.max_height})")
+        self.height_label.grid(row=2, column=0)
         self.height_entry = tk.Entry(parent)
         self.height_entry.grid(row=2, column=1)
 
         tk.Button(parent, text="Generate Grid", command=self.handle_generate_grid).grid(row=3, column=0, columnspan=2, sticky="ew")
 
+        self.image_renderer_var = tk.BooleanVar(value=self.renderer_kind == "image")
+        tk.Checkbutton(parent, text="Large Grid Mode (image renderer)", variable=self.image_renderer_var,
+                       command=self.toggle_image_renderer).grid(row=4, column=0, columnspan=2)
+
     def create_history_controls(self, parent):
         history_frame = tk.Frame(parent)
         history_frame.grid(row=5, column=0, columnspan=2, sticky="ew")
@@ -98,9 +234,15 @@ class KnittingPatternApp:
         buttons = [
             ("Flip Horizontal", self.flip_horizontal),
             ("   Flip Vertical  ", self.flip_vertical),
+            ("Rotate Left", self.rotate_counterclockwise),
+            ("Rotate Right", self.rotate_clockwise),
+            ("Rotate 180", self.rotate_180),
+            ("Shift...", self.shift_pattern),
+            ("Tile...", self.tile_pattern),
+            ("Mirror Tile...", lambda: self.tile_pattern(mirror=True)),
         ]
         for i, (text, cmd) in enumerate(buttons):
-            tk.Button(flip_frame, text=text, command=cmd).grid(row=0, column=i, sticky="nsew")
+            tk.Button(flip_frame, text=text, command=cmd).grid(row=i // 2, column=i % 2, sticky="nsew")
 
     def create_grid_resize_controls(self, parent):
         arrow_frame = tk.Frame(parent)
@@ -146,6 +288,10 @@ class KnittingPatternApp:
         zoom_to_fit_button = tk.Button(zoom_frame, text="Zoom to Fit", command=self.zoom_to_fit)
         zoom_to_fit_button.pack(fill=tk.X, expand=True)
 
+        self.profiler_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(zoom_frame, text="Show Profiler (F12)", variable=self.profiler_var,
+                       command=self.toggle_profiler).pack()
+
     def create_color_controls(self, parent):
         color_frame = tk.Frame(parent)
         color_frame.grid(row=10, column=0, columnspan=2, sticky="ew")
@@ -163,6 +309,58 @@ class KnittingPatternApp:
         self.box_mode_button = tk.Button(color_frame, text="Box Mode", command=self.toggle_box_mode)
         self.box_mode_button.pack(fill=tk.X, expand=True)
 
+    def create_selection_controls(self, parent):
+        selection_frame = tk.Frame(parent)
+        selection_frame.grid(row=11, column=0, columnspan=2, sticky="ew")
+        selection_frame.columnconfigure([0, 1], weight=1)
+
+        self.tool_buttons = {}
+        buttons = [
+            ("Select", "select"),
+            ("Lasso", "lasso"),
+            ("Copy", self.copy_selection),
+            ("Cut", self.cut_selection),
+            ("Paste", "paste"),
+            ("Stamp", "stamp"),
+            ("Crop to Selection", self.crop_to_selection),
+            ("Clear Selection", self.clear_selection),
+            ("Fill", "fill"),
+            ("Replace Color", "replace"),
+        ]
+        for i, (text, action) in enumerate(buttons):
+            if isinstance(action, str):
+                button = tk.Button(selection_frame, text=text, command=lambda tool=action: self.set_tool(tool))
+                self.tool_buttons[action] = button
+            else:
+                button = tk.Button(selection_frame, text=text, command=action)
+            button.grid(row=i // 2, column=i % 2, sticky="nsew")
+
+        self.diagonal_fill_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(selection_frame, text="Fill diagonally (8-way)", variable=self.diagonal_fill_var)\
+            .grid(row=len(buttons) // 2, column=0, columnspan=2)
+
+    def create_symmetry_controls(self, parent):
+        symmetry_frame = tk.Frame(parent)
+        symmetry_frame.grid(row=12, column=0, columnspan=2, sticky="ew")
+        symmetry_frame.columnconfigure([0, 1], weight=1)
+
+        tk.Label(symmetry_frame, text="Symmetry:").grid(row=0, column=0, sticky="e")
+        self.symmetry_var = tk.StringVar(value=self.symmetry.mode)
+        tk.OptionMenu(symmetry_frame, self.symmetry_var, *SYMMETRY_MODES, command=self.set_symmetry_mode)\
+            .grid(row=0, column=1, sticky="ew")
+        tk.Label(symmetry_frame, text="Rotational folds:").grid(row=1, column=0, sticky="e")
+        self.symmetry_folds_var = tk.IntVar(value=self.symmetry.folds)
+        folds = tk.Spinbox(symmetry_frame, from_=self.min_symmetry_folds, to=self.max_symmetry_folds, width=4,
+                           textvariable=self.symmetry_folds_var, command=self.set_symmetry_folds)
+        folds.grid(row=1, column=1, sticky="w")
+        folds.bind("<Return>", lambda e: self.set_symmetry_folds())
+        folds.bind("<FocusOut>", lambda e: self.set_symmetry_folds())
+        button = tk.Button(symmetry_frame, text="Set Center", command=lambda: self.set_tool("center"))
+        button.grid(row=2, column=0, sticky="nsew")
+        self.tool_buttons["center"] = button
+        tk.Button(symmetry_frame, text="Center on Chart", command=lambda: self.set_symmetry_center(None))\
+            .grid(row=2, column=1, sticky="nsew")
+
     def bind_shortcuts(self):
         self.master.bind("<Control-s>", lambda e: self.save_pattern())
         self.master.bind("<Control-z>", lambda e: self.undo())
@@ -170,45 +368,23 @@ class KnittingPatternApp:
         self.master.bind("<Control-r>", lambda e: self.reset_grid())
         self.master.bind("<Control-plus>", lambda e: self.zoom_in())
         self.master.bind("<Control-minus>", lambda e: self.zoom_out())
+        self.master.bind("<Control-c>", lambda e: self.copy_selection())
+        self.master.bind("<Control-x>", lambda e: self.cut_selection())
+        self.master.bind("<Control-v>", lambda e: self.set_tool("paste"))
+        self.master.bind("<Escape>", lambda e: (self.clear_selection(), self.set_tool(None), self.clear_highlights()))
+        self.master.bind("<Control-t>", lambda e: self.open_new_document())
+        self.master.bind("<Control-w>", lambda e: self.close_document())
+        self.master.bind("<F12>", lambda e: (self.profiler_var.set(not self.profiler_var.get()), self.toggle_profiler()))
 
 #Canvas/Grid Management ---------------------------------------------------------------------------
 
     def generate_grid(self, width, height):
-        self.grid_width = width
-        self.grid_height = height
-
-        canvas_width = self.grid_width * self.cell_size
-        canvas_height = self.grid_height * self.cell_size
-
-        if hasattr(self, 'canvas'):
-            self.canvas.destroy()
+        canvas_width = width * self.cell_size
+        canvas_height = height * self.cell_size
+        self.canvas.config(width=canvas_width, height=canvas_height)
 
-        self.canvas = tk.Canvas(self.master, bg='white', width=canvas_width, height=canvas_height)
-        self.canvas.grid(row=0, column=1, sticky="nsew")
-
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
-
-        self.master.grid_rowconfigure(0, weight=1)
-        self.master.grid_columnconfigure(1, weight=1)
-
-        self.cells = {}
-
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                x1, y1 = col * self.cell_size, row * self.cell_size
-                x2, y2 = x1 + self.cell_size, y1 + self.cell_size
-                cell_id = self.canvas.create_rectangle(x1, y1, x2, y2, fill="white", outline="black")
-                self.cells[(row, col)] = "white"
-
-        self.canvas.bind("<Button-1>", self.start_drag)
-        self.canvas.bind("<B1-Motion>", self.dragging)
-        self.canvas.bind("<ButtonRelease-1>", self.end_drag)
-
-        self.canvas.bind("<Button-3>", self.pick_color)
-    
-        self.grid_dimensions_label.config(text=f"Grid Dimensions: {self.grid_width} x {self.grid_height}")
-        self.update_grid_dimensions_label()
-        self.save_state_to_history()
+        self.apply_edit(GridEdit([("reset", (width, height))], [("restore", (self.pattern.snapshot(),))]))
+        self.renderer.flush()
 
     def handle_generate_grid(self):
         try:
@@ -219,143 +395,161 @@ class KnittingPatternApp:
             else:
                 raise ValueError
         except ValueError:
-            messagebox.showerror("Invalid Input", "Please enter valid positive integers for grid dimensions (max 128x128).")
+            messagebox.showerror("Invalid Input", f"Please enter valid positive integers for grid dimensions (max {self.max_width}x{self.max_height}).")
 
     def refresh_canvas(self):
-        self.canvas.delete("all")
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                x1, y1 = col * self.cell_size, row * self.cell_size
-                x2, y2 = x1 + self.cell_size, y1 + self.cell_size
-                cell_color = self.cells.get((row, col), "white")
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=cell_color, outline="black")
-
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
+        self.renderer.sync_grid()
+        self.renderer.mark_all_dirty()
 
     def modify_grid(self, operation, axis, position):
         if axis == "row":
+            index = 0 if position == "top" else self.grid_height
             if operation == "add":
-                if position == "top":
-                    for row in reversed(range(self.grid_height)):
-                        for col in range(self.grid_width):
-                            self.cells[(row + 1, col)] = self.cells.pop((row, col))
-                    for col in range(self.grid_width):
-                        self.cells[(0, col)] = "white"
-                elif position == "bottom":
-                    for col in range(self.grid_width):
-                        self.cells[(self.grid_height, col)] = "white"
-                self.grid_height += 1
-
+                edit = transforms.insert_rows(index)
             elif operation == "remove" and self.grid_height > 1:
-                if position == "top":
-                    for col in range(self.grid_width):
-                        del self.cells[(0, col)]
-                    for row in range(1, self.grid_height):
-                        for col in range(self.grid_width):
-                            self.cells[(row - 1, col)] = self.cells.pop((row, col))
-                elif position == "bottom":
-                    for col in range(self.grid_width):
-                        del self.cells[(self.grid_height - 1, col)]
-                self.grid_height -= 1
+                edit = transforms.remove_rows(self.pattern, min(index, self.grid_height - 1))
+            else:
+                return
 
         elif axis == "column":
+            index = 0 if position == "left" else self.grid_width
             if operation == "add":
-                if position == "left":
-                    for row in range(self.grid_height):
-                        for col in reversed(range(self.grid_width)):
-                            self.cells[(row, col + 1)] = self.cells.pop((row, col))
-                    for row in range(self.grid_height):
-                        self.cells[(row, 0)] = "white"
-                elif position == "right":
-                    for row in range(self.grid_height):
-                        self.cells[(row, self.grid_width)] = "white"
-                self.grid_width += 1
-
+                edit = transforms.insert_columns(index)
             elif operation == "remove" and self.grid_width > 1:
-                if position == "left":
-                    for row in range(self.grid_height):
-                        del self.cells[(row, 0)]
-                    for row in range(self.grid_height):
-                        for col in range(1, self.grid_width):
-                            self.cells[(row, col - 1)] = self.cells.pop((row, col))
-                elif position == "right":
-                    for row in range(self.grid_height):
-                        del self.cells[(row, self.grid_width - 1)]
-                self.grid_width -= 1
+                edit = transforms.remove_columns(self.pattern, min(index, self.grid_width - 1))
+            else:
+                return
 
-        self.refresh_canvas()
-        self.update_grid_dimensions_label()
-        self.save_state_to_history()
+        self.apply_edit(edit)
 
     def reset_grid(self):
         if messagebox.askyesno("Confirm Reset", "Are you sure you want to reset the grid?"):
-            for row in range(self.grid_height):
-                for col in range(self.grid_width):
-                    self.canvas.itemconfig(self.get_canvas_id(row, col), fill="white")
-                    self.cells[(row, col)] = "white"
-            self.save_state_to_history()
-
-    def get_canvas_id(self, row, col):
-        return self.canvas.find_closest(col * self.cell_size + 1, row * self.cell_size + 1)[0]
+            self.apply_edit(GridEdit([("fill", ("white",))], [("restore", (self.pattern.snapshot(),))]))
+
+    def event_cell(self, event):
+        col = int(self.canvas.canvasx(event.x)) // self.cell_size
+        row = int(self.canvas.canvasy(event.y)) // self.cell_size
+        return row, col
+
+    def create_renderer(self, kind):
+        renderer_class = ImageRenderer if kind == "image" else RectangleRenderer
+        return renderer_class(self.canvas, self.pattern, self.cell_size, debug=self.debug_canvas_index)
+
+    def set_renderer(self, kind):
+        if kind == self.renderer_kind:
+            return True
+        max_width, max_height = self.renderer_limits[kind]
+        if self.pattern.width > max_width or self.pattern.height > max_height:
+            messagebox.showerror("Grid Too Large", f"This renderer supports grids up to {max_width}x{max_height}.")
+            return False
+
+        self.renderer.clear()
+        self.use_renderer(kind)
+        self.renderer.flush()
+        return True
+
+    def use_renderer(self, kind):
+        self.renderer_kind = kind
+        self.max_width, self.max_height = self.renderer_limits[kind]
+        self.width_label.config(text=f"Grid Width: (Max {self.max_width})")
+        self.height_label.config(text=f"Grid Height: (Max {self.max_height})")
+        self.image_renderer_var.set(kind == "image")
+        self.renderer = self.create_renderer(kind)
+
+    def toggle_image_renderer(self):
+        kind = "image" if self.image_renderer_var.get() else "rectangle"
+        if not self.set_renderer(kind):
+            self.image_renderer_var.set(self.renderer_kind == "image")
 
     def update_grid_dimensions_label(self):
         zoom_level = (self.cell_size / 20) * 100
         self.grid_dimensions_label.config(text=f"Grid Dimensions: {self.grid_width} x {self.grid_height} | Zoom: {int(zoom_level)}%")
 
-#Flipping/Mirroring -------------------------------------------------------------------------------
+#Transforms ---------------------------------------------------------------------------------------
+
+    def fits_limits(self, width, height):
+        if width <= self.max_width and height <= self.max_height:
+            return True
+        messagebox.showerror("Grid Too Large", f"The result would be {width}x{height}; the maximum is {self.max_width}x{self.max_height}.")
+        return False
 
     def flip_horizontal(self):
-        new_cells = {}
-    
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                new_col = self.grid_width - col - 1
-                new_cells[(row, new_col)] = self.cells[(row, col)]
-    
-        self.cells = new_cells
-        self.refresh_canvas()
-        self.save_state_to_history()
+        self.apply_edit(transforms.flip_horizontal())
 
     def flip_vertical(self):
-        new_cells = {}
-    
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                new_row = self.grid_height - row - 1
-                new_cells[(new_row, col)] = self.cells[(row, col)]
-    
-        self.cells = new_cells
-        self.refresh_canvas()
-        self.save_state_to_history()
+        self.apply_edit(transforms.flip_vertical())
+
+    def rotate_clockwise(self):
+        if self.fits_limits(self.grid_height, self.grid_width):
+            self.apply_edit(transforms.rotate_clockwise())
+
+    def rotate_counterclockwise(self):
+        if self.fits_limits(self.grid_height, self.grid_width):
+            self.apply_edit(transforms.rotate_counterclockwise())
+
+    def rotate_180(self):
+        self.apply_edit(transforms.rotate_180())
+
+    def shift_pattern(self):
+        rows = simpledialog.askinteger("Shift", "Rows down (negative moves up):", initialvalue=0, parent=self.master)
+        if rows is None:
+            return
+        cols = simpledialog.askinteger("Shift", "Columns right (negative moves left):", initialvalue=0, parent=self.master)
+        if cols is None or (rows, cols) == (0, 0):
+            return
+        self.apply_edit(transforms.shift(rows, cols))
+
+    def tile_pattern(self, mirror=False):
+        title = "Mirror Tile" if mirror else "Tile"
+        across = simpledialog.askinteger(title, "Repeats across:", initialvalue=2, minvalue=1, parent=self.master)
+        if across is None:
+            return
+        down = simpledialog.askinteger(title, "Repeats down:", initialvalue=2, minvalue=1, parent=self.master)
+        if down is None or (across, down) == (1, 1):
+            return
+        if self.fits_limits(self.grid_width * across, self.grid_height * down):
+            self.apply_edit(transforms.tile(self.pattern, across, down, mirror))
+
+    def crop_to(self, top, left, bottom, right):
+        top, bottom = sorted((max(0, top), min(self.grid_height - 1, bottom)))
+        left, right = sorted((max(0, left), min(self.grid_width - 1, right)))
+        self.apply_edit(transforms.crop(self.pattern, top, left, bottom + 1, right + 1))
 
 #Drawing/Interaction ------------------------------------------------------------------------------
 
+    @profiled
     def start_drag(self, event):
         self.is_dragging = True
-        self.last_dragged_cell = None
-        self.toggled_cells.clear()
+        self.last_stroke_cell = None
 
-        col = event.x // self.cell_size
-        row = event.y // self.cell_size
+        row, col = self.event_cell(event)
         if 0 <= col < self.grid_width and 0 <= row < self.grid_height:
-            if self.box_mode:
+            if self.tool:
+                self.tool_press(row, col)
+            elif self.box_mode:
                 self.box_start = (row, col)
             else:
-                self.fill_cell(event)
+                self.stroking = True
+                self.queue_stroke_point(event)
 
+    @profiled
     def dragging(self, event):
         if self.is_dragging:
-            if self.box_mode and self.box_start:
+            if self.tool:
+                self.tool_drag(*self.event_cell(event))
+            elif self.box_mode and self.box_start:
                 self.fill_rectangle(event)
-            elif not self.box_mode:
-                self.fill_cell(event)
+            elif self.stroking:
+                self.queue_stroke_point(event)
 
+    @profiled
     def end_drag(self, event):
         self.is_dragging = False
 
-        if self.box_mode and self.box_start:
-            col = event.x // self.cell_size
-            row = event.y // self.cell_size
+        if self.tool:
+            self.tool_release()
+        elif self.box_mode and self.box_start:
+            row, col = self.event_cell(event)
             if 0 <= col < self.grid_width and 0 <= row < self.grid_height:
                 self.box_end = (row, col)
 
@@ -367,25 +561,27 @@ class KnittingPatternApp:
                 bottom_right_row = max(start_row, end_row)
                 bottom_right_col = max(start_col, end_col)
 
-                for r in range(top_left_row, bottom_right_row + 1):
-                    for c in range(top_left_col, bottom_right_col + 1):
-                        self.canvas.itemconfig(self.get_canvas_id(r, c), fill=self.selected_color)
-                        self.cells[(r, c)] = self.selected_color
+                cells = [(r, c) for r in range(top_left_row, bottom_right_row + 1)
+                         for c in range(top_left_col, bottom_right_col + 1)]
+                for r, c in cells:
+                    self.record_cell(r, c)
+                self.pattern.fill_rect(top_left_row, top_left_col, bottom_right_row, bottom_right_col, self.selected_color)
+                self.redraw(cells)
 
-            self.save_state_to_history()
+            self.commit_changes()
 
-            self.previous_rectangle = []
+            self.overlay.remove("preview")
             self.box_start = None
             self.box_end = None
-        elif not self.box_mode:
-            self.save_state_to_history()
+        elif self.stroking:
+            self.flush_stroke()
+            self.commit_changes()
 
-        self.last_dragged_cell = None
-        self.toggled_cells.clear()
+        self.stroking = False
+        self.last_stroke_cell = None
 
     def fill_rectangle(self, event):
-        col = event.x // self.cell_size
-        row = event.y // self.cell_size
+        row, col = self.event_cell(event)
         if 0 <= col < self.grid_width and 0 <= row < self.grid_height:
             self.box_end = (row, col)
 
@@ -397,44 +593,55 @@ class KnittingPatternApp:
             bottom_right_row = max(start_row, end_row)
             bottom_right_col = max(start_col, end_col)
 
-            if self.previous_rectangle:
-                for r, c in self.previous_rectangle:
-                    original_color = self.cells.get((r, c), "white")
-                    self.canvas.itemconfig(self.get_canvas_id(r, c), fill=original_color)
-
-            self.previous_rectangle = []
-            for r in range(top_left_row, bottom_right_row + 1):
-                for c in range(top_left_col, bottom_right_col + 1):
-                    self.previous_rectangle.append((r, c))
-                    self.canvas.itemconfig(self.get_canvas_id(r, c), fill=self.selected_color)
-
-    def fill_cell(self, event):
-        col = event.x // self.cell_size
-        row = event.y // self.cell_size
-
-        if 0 <= col < self.grid_width and 0 <= row < self.grid_height:
-            current_cell = (row, col)
+            self.overlay.rectangle("preview", top_left_row, top_left_col, bottom_right_row + 1, bottom_right_col + 1,
+                                   fill=self.selected_color, outline="black")
+
+    def queue_stroke_point(self, event):
+        self.stroke_points.append(self.event_cell(event))
+        if self.stroke_flush is None:
+            self.stroke_flush = self.master.after_idle(self.flush_stroke)
+
+    @profiled
+    def flush_stroke(self):
+        # Points outside the grid still steer the line, so a stroke that leaves and re-enters stays continuous.
+        if self.stroke_flush is not None:
+            self.master.after_cancel(self.stroke_flush)
+            self.stroke_flush = None
+        if not self.stroke_points:
+            return
 
-            if current_cell != self.last_dragged_cell and current_cell not in self.toggled_cells:
-                self.last_dragged_cell = current_cell 
-                self.canvas.itemconfig(self.get_canvas_id(row, col), fill=self.selected_color)
-                self.cells[(row, col)] = self.selected_color 
-                self.toggled_cells.add(current_cell)
+        height, width = self.grid_height, self.grid_width
+        painted = set()
+        previous = self.last_stroke_cell
+        for point in self.stroke_points:
+            for start, end in self.symmetry.segments(previous, point, width, height):
+                cells = [end] if start is None else line_cells(*start, *end)[1:]
+                painted.update(cell for cell in cells if 0 <= cell[0] < height and 0 <= cell[1] < width)
+            previous = point
+        self.stroke_points.clear()
+        self.last_stroke_cell = previous
+
+        for row, col in painted:
+            self.record_cell(row, col)
+            self.pattern.set(row, col, self.selected_color)
+        self.redraw(painted)
+        self.renderer.flush()
 
     def toggle_cell(self, event):
-        col = event.x // self.cell_size
-        row = event.y // self.cell_size
+        row, col = self.event_cell(event)
         if 0 <= col < self.grid_width and 0 <= row < self.grid_height:
-            self.canvas.itemconfig(self.get_canvas_id(row, col), fill=self.selected_color)
-            self.cells[(row, col)] = self.selected_color
-            self.save_state_to_history()
+            self.record_cell(row, col)
+            self.renderer.paint_cell(row, col, self.selected_color)
+            self.pattern.set(row, col, self.selected_color)
+            self.schedule_usage_update()
+            self.commit_changes()
 
+    @profiled
     def pick_color(self, event):
-        col = event.x // self.cell_size
-        row = event.y // self.cell_size
+        row, col = self.event_cell(event)
 
         if 0 <= col < self.grid_width and 0 <= row < self.grid_height:
-            cell_color = self.cells.get((row, col), "white")
+            cell_color = self.pattern.get(row, col)
             self.set_color(cell_color)
 
     def toggle_box_mode(self):
@@ -444,79 +651,861 @@ class KnittingPatternApp:
         else:
             self.box_mode_button.config(relief=tk.RAISED, text="Box Mode (OFF)", bg="SystemButtonFace", fg="black")
 
-#Undo/Redo ----------------------------------------------------------------------------------------
+#Selection/Clipboard ------------------------------------------------------------------------------
 
-    def save_state_to_history(self):
-        if self.history and self.history[-1]["cells"] == self.cells:
+    def set_tool(self, tool):
+        if tool in ("paste", "stamp") and self.clipboard is None:
+            messagebox.showinfo("Nothing to Paste", "Copy a selection first.")
+            return
+        self.tool = None if tool == self.tool else tool
+        self.overlay.remove("preview")
+        for name, button in self.tool_buttons.items():
+            button.config(relief=tk.SUNKEN if name == self.tool else tk.RAISED)
+
+    @profiled
+    def hover(self, event):
+        if self.tool in ("paste", "stamp") and not self.is_dragging:
+            self.show_clip_preview(*self.event_cell(event))
+
+    @profiled
+    def tool_press(self, row, col):
+        if self.tool == "select":
+            self.selection_anchor = (row, col)
+            self.tool_drag(row, col)
+        elif self.tool == "lasso":
+            self.lasso_points = [(row, col)]
+            self.tool_drag(row, col)
+        elif self.tool == "paste":
+            self.paste_clip(row, col)
+            self.commit_changes()
+            self.set_tool(None)
+        elif self.tool == "stamp":
+            self.paste_clip(row, col)
+            self.last_stamp = (row, col)
+        elif self.tool == "fill":
+            self.flood_fill(row, col)
+        elif self.tool == "replace":
+            self.replace_color(self.pattern.get(row, col), self.selected_color)
+        elif self.tool == "center":
+            self.set_symmetry_center((2 * row, 2 * col))
+            self.set_tool(None)
+
+    @profiled
+    def tool_drag(self, row, col):
+        if self.tool == "select" and self.selection_anchor:
+            self.selection_end = (row, col)
+            selection = Selection.rectangle(*self.selection_anchor, row, col, self.grid_width, self.grid_height)
+            self.overlay.rectangle("selection", selection.top, selection.left, selection.bottom, selection.right,
+                                   outline="blue", width=2, dash=(4, 2))
+        elif self.tool == "lasso" and self.lasso_points:
+            if (row, col) != self.lasso_points[-1]:
+                self.lasso_points.append((row, col))
+            self.overlay.polygon("selection", [(r + 0.5, c + 0.5) for r, c in self.lasso_points],
+                                 outline="blue", fill="", width=2, dash=(4, 2))
+        elif self.tool == "stamp" and self.last_stamp:
+            self.show_clip_preview(row, col)
+            last_row, last_col = self.last_stamp
+            if abs(row - last_row) >= self.clipboard.height or abs(col - last_col) >= self.clipboard.width:
+                self.paste_clip(row, col)
+                self.last_stamp = (row, col)
+        elif self.tool == "paste":
+            self.show_clip_preview(row, col)
+
+    @profiled
+    def tool_release(self):
+        if self.tool == "select" and self.selection_anchor:
+            self.selection = Selection.rectangle(*self.selection_anchor, *self.selection_end, self.grid_width, self.grid_height)
+            self.selection_anchor = None
+        elif self.tool == "lasso" and self.lasso_points:
+            self.selection = Selection.lasso(self.lasso_points, self.grid_width, self.grid_height)
+            self.lasso_points = []
+        elif self.tool == "stamp":
+            self.commit_changes()
+            self.last_stamp = None
+
+    def clip_origin(self, row, col):
+        return row - self.clipboard.height // 2, col - self.clipboard.width // 2
+
+    def show_clip_preview(self, row, col):
+        top, left = self.clip_origin(row, col)
+        self.overlay.rectangle("preview", top, left, top + self.clipboard.height, left + self.clipboard.width,
+                               outline="red", width=2, dash=(4, 2))
+
+    def paste_clip(self, row, col):
+        # The change lands in the current stroke's history entry.
+        top, left = self.clip_origin(row, col)
+        self.redraw(self.clipboard.paste(self.pattern, top, left, self.pending_changes))
+
+    def push_recolor(self, indices, old_id):
+        if not indices:
             return
+        new_id = self.pattern.color_id(self.selected_color)
+        self.history.push(CellEdit(indices, bytes([old_id]) * len(indices), bytes([new_id]) * len(indices)))
+        width = self.pattern.width
+        self.redraw([divmod(i, width) for i in indices])
+
+    @profiled
+    def flood_fill(self, row, col):
+        self.commit_changes()
+        old_id = self.pattern.data[self.pattern.index(row, col)]
+        self.push_recolor(self.pattern.flood_fill(row, col, self.selected_color, self.diagonal_fill_var.get()), old_id)
+
+    @profiled
+    def replace_color(self, old_color, new_color):
+        self.commit_changes()
+        old_id = self.pattern.color_id(old_color)
+        self.push_recolor(self.pattern.replace_color(old_color, new_color), old_id)
+
+    def copy_selection(self):
+        if self.selection is not None:
+            self.clipboard = Clip.from_selection(self.pattern, self.selection)
+
+    def cut_selection(self):
+        if self.selection is not None:
+            self.copy_selection()
+            self.commit_changes()
+            self.redraw(self.selection.fill(self.pattern, "white", self.pending_changes))
+            self.commit_changes()
+
+    def crop_to_selection(self):
+        if self.selection is not None:
+            selection = self.selection
+            self.crop_to(selection.top, selection.left, selection.bottom - 1, selection.right - 1)
+
+    def clear_selection(self):
+        self.selection = None
+        self.selection_anchor = None
+        self.lasso_points = []
+        self.overlay.remove("selection")
 
-        state = {
-            "width": self.grid_width,
-            "height": self.grid_height,
-            "cells": copy.deepcopy(self.cells)
-        }
-        self.history.append(state)
-        self.redo_stack.clear()
+#Undo/Redo ----------------------------------------------------------------------------------------
 
+    def record_cell(self, row, col):
+        i = self.pattern.index(row, col)
+        self.pending_changes.setdefault(i, self.pattern.data[i])
+
+    def retained_ids(self, document):
+        # Ids undo could restore, plus uncommitted ones, must not be handed to another color.
+        ids = document.history.referenced_ids()
+        if document is self.document:
+            ids.update(self.pending_changes.values())
+            if self.generator_before is not None:
+                ids |= ids_in(self.generator_before)
+        return ids
+
+    def commit_changes(self):
+        if self.pending_changes:
+            self.history.push(CellEdit.from_changes(self.pattern, self.pending_changes))
+            self.pending_changes = {}
+
+    @profiled
+    def apply_edit(self, edit):
+        self.commit_changes()
+        self.redraw(edit.redo(self.pattern))
+        self.history.push(edit)
+
+    def refresh_view(self):
+        self.clear_selection()
+        self.grid_width = self.pattern.width
+        self.grid_height = self.pattern.height
+        self.refresh_canvas()
+        self.update_grid_dimensions_label()
+        self.instructions.invalidate()
+        self.instruction_rows = None
+        self.show_symmetry_guides()
+
+    def redraw(self, cells):
+        if cells is None:
+            self.refresh_view()
+        else:
+            self.renderer.mark_dirty(cells)
+            rows = {row for row, _ in cells}
+            self.instructions.invalidate(rows)
+            if self.instruction_rows is not None:
+                self.instruction_rows.update(rows)
+        if self.generator_before is None:  # Generator previews are only journaled once applied.
+            self.journal.record(self.pattern, cells)
+        self.schedule_usage_update()
+        self.schedule_instructions_update()
+
+    @profiled
     def undo(self):
-        if len(self.history) > 1:
-            self.redo_stack.append(self.history.pop())
-            self.restore_from_history(self.history[-1])
+        self.commit_changes()
+        if self.history.can_undo():
+            self.redraw(self.history.undo(self.pattern))
 
+    @profiled
     def redo(self):
-        if self.redo_stack:
-            next_state = self.redo_stack.pop()
-            self.history.append(next_state)
-            self.restore_from_history(next_state)
-
-    def restore_from_history(self, state):
-        self.grid_width = state["width"]
-        self.grid_height = state["height"]
-        self.cells = copy.deepcopy(state["cells"])
-        self.refresh_canvas()
+        if self.history.can_redo():
+            self.redraw(self.history.redo(self.pattern))
 
 #Save/Load ----------------------------------------------------------------------------------------
 
+    @staticmethod
+    def pattern_filetypes(can_save=False, can_load=False):
+        found = formats(can_save=can_save, can_load=can_load)
+        filetypes = [pattern_format.filetype() for pattern_format in found]
+        if can_load:
+            filetypes.insert(0, ("Pattern files", " ".join(f"*{pattern_format.extension}" for pattern_format in found)))
+        return filetypes
+
+    @profiled
     def save_pattern(self):
-        pattern = {
-            "width": self.grid_width,
-            "height": self.grid_height,
-            "selected_color": self.selected_color,
-            "cells": {f"{row},{col}": color for (row, col), color in self.cells.items()}
-        }
-        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
-        if file_path:
-            with open(file_path, 'w') as file:
-                json.dump(pattern, file)
+        save_formats = formats(can_save=True)
+        chosen_type = tk.StringVar(self.master, save_formats[0].description)
+        file_path = filedialog.asksaveasfilename(filetypes=self.pattern_filetypes(can_save=True), typevariable=chosen_type)
+        if not file_path:
+            return
+        pattern_format = format_for_path(file_path)
+        if pattern_format is None and not os.path.splitext(file_path)[1]:
+            # Without a typed extension the file type picked in the dialog decides the format.
+            pattern_format = next((f for f in save_formats if f.description == chosen_type.get()), save_formats[0])
+            file_path += pattern_format.extension
+        self.commit_changes()
+        document, pattern, selected_color = self.document, self.pattern.copy(), self.selected_color
+        # Export-only formats (like chart images) can't be reopened, so the tab keeps its old file.
+        reopenable = pattern_format is None or pattern_format.load is not None
+        if reopenable:
+            document.history.mark_saved()
+
+        def saved(_):
+            if document in self.documents and reopenable:
+                document.rename(file_path)
+                self.notebook.tab(self.documents.index(document), text=document.title)
+
+        def failed(e):
+            if reopenable:
+                document.history.mark_unsaved()
+            messagebox.showerror("Save Failed", f"Failed to save the pattern.\nError: {e}")
+
+        self.tasks.run(f"Saving {os.path.basename(file_path)}",
+                       lambda progress: save_pattern_file(file_path, pattern, selected_color), saved, failed,
+                       cancellable=False)
 
     def load_pattern(self):
-        file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
-        if file_path:
+        # Files are only read once their tab is shown.
+        file_paths = filedialog.askopenfilenames(filetypes=self.pattern_filetypes(can_load=True))
+        opened = [
+            self.add_document(self.new_document(
+                loader=lambda path=path: load_pattern_file(path, self.default_width, self.default_height), path=path))
+            for path in file_paths
+        ]
+        if opened:
+            self.select_document(opened[0])
+
+    def load_document(self, document, then=None):
+        # Every then passed while the load runs is called once it finishes, even if another tab was selected meanwhile.
+        if document in self.document_loads:
+            if then is not None:
+                self.document_loads[document].append(then)
+            return
+
+        def loaded(result):
+            thens = self.document_loads.pop(document)
+            if document not in self.documents:
+                return
+            document.finish_load(result)
+            if self.documents[self.notebook.index("current")] is document:
+                self.switch_document(document)
+            for then in thens:
+                then()
+
+        def failed(e):
+            dropped()
+            if isinstance(e, json.JSONDecodeError):
+                messagebox.showerror("Invalid File", f"Failed to load the pattern. The file is not valid JSON.\nError: {e}")
+            elif isinstance(e, (OSError, ValueError)):
+                messagebox.showerror("Invalid File", f"Failed to load the pattern.\nError: {e}")
+            else:
+                messagebox.showerror("Error", f"An unexpected error occurred: {e}")
+
+        def dropped():
+            del self.document_loads[document]
+            if document in self.documents:
+                self.remove_document(document)
+                self.notebook.select(self.documents.index(self.document))
+
+        loader = document.loader
+        self.document_loads[document] = [] if then is None else [then]
+        self.tasks.run(f"Loading {document.title}", lambda progress: loader(),
+                       self.when_generator_closed(loaded), failed, dropped)
+
+    def replace_pattern(self, loaded):
+        # Opens the chart in a new tab instead if its colors don't fit.
+        self.commit_changes()
+        before = self.pattern.snapshot()
+        try:
+            self.pattern.assign(loaded)
+        except PaletteFullError as e:
+            messagebox.showerror("Too Many Colors", f"{e}\nThe chart was opened in a new tab instead.")
+            self.select_document(self.add_document(self.new_document(pattern=loaded)))
+            return
+        self.history.push(GridEdit([("restore", (self.pattern.snapshot(),))], [("restore", (before,))]))
+        self.redraw(None)
+
+#Tabs ---------------------------------------------------------------------------------------------
+
+    def new_document(self, pattern=None, loader=None, path=None):
+        if path is None:
+            self.untitled_count += 1
+            title = f"Untitled {self.untitled_count}"
+        else:
+            title = os.path.basename(path)
+        while True:
+            # Skips names left by an earlier session that had the same pid.
+            self.journal_count += 1
+            journal_path = os.path.join(self.journal_dir, f"{os.getpid()}-{self.journal_count}.journal")
+            if not os.path.exists(journal_path) and not os.path.exists(journal_path + ".lock"):
+                break
+        journal = Journal(journal_path)
+        history = History(self.history_memory_budget)
+        return Document(title, history, journal, pattern, loader, path)
+
+    def add_document(self, document):
+        self.documents.append(document)
+        self.notebook.add(tk.Frame(self.notebook), text=document.title)
+        return document
+
+    def bind_document(self, document):
+        self.document = document
+        self.pattern = document.pattern
+        self.pattern.retained_ids = lambda: self.retained_ids(document)
+        self.history = document.history
+        self.instructions = document.instructions
+        self.journal = document.journal
+
+    def open_new_document(self):
+        self.select_document(self.add_document(self.new_document(pattern=Pattern(self.default_width, self.default_height))))
+
+    def select_document(self, document, then=None):
+        self.notebook.select(self.documents.index(document))
+        self.switch_document(document, then)
+
+    def on_tab_changed(self, event):
+        document = self.documents[self.notebook.index("current")]
+        if document is not self.document:
+            self.switch_document(document)
+
+    @profiled
+    def switch_document(self, document, then=None):
+        # A document that hasn't been read yet is loaded first, with the current chart staying on screen meanwhile.
+        if document is self.document:
+            return
+        if not document.loaded:
+            self.load_document(document, then)
+            return
+
+        self.commit_changes()
+        self.set_tool(None)
+        self.clear_selection()
+        self.overlay.clear()
+        previous = self.document
+        previous.renderer_kind = self.renderer_kind
+        previous.cell_size = self.cell_size
+        previous.suspend((self.canvas.xview()[0], self.canvas.yview()[0]))
+        self.renderer.clear()
+
+        document.resume()
+        self.bind_document(document)
+        if document.selected_color:
+            self.set_color(document.selected_color)
+            document.selected_color = None
+        kind = document.renderer_kind
+        limit_width, limit_height = self.renderer_limits["rectangle"]
+        if self.pattern.width > limit_width or self.pattern.height > limit_height:
+            kind = "image"
+        self.use_renderer(kind)
+        self.cell_size = document.cell_size or self.cell_size
+        self.renderer.set_cell_size(self.cell_size)
+        self.overlay.set_cell_size(self.cell_size)
+        self.zoom_slider.set(self.cell_size)
+
+        self.refresh_view()
+        self.renderer.flush()
+        self.canvas.xview_moveto(document.view[0])
+        self.canvas.yview_moveto(document.view[1])
+        self.schedule_usage_update()
+        self.schedule_instructions_update()
+        if then is not None:
+            then()
+
+    def close_document(self):
+        if len(self.documents) == 1:
+            return
+        self.commit_changes()
+        document = self.document
+        if document.history.is_modified() and not messagebox.askyesno(
+                "Close Tab", f"Close {document.title}? Changes since it was last saved will be lost."):
+            return
+        self.discard_document(document)
+
+    def discard_document(self, document):
+        # The current tab can only go once a neighbour is shown, which may have to be loaded first.
+        if document not in self.documents or len(self.documents) == 1:
+            return
+        if document is self.document:
+            index = self.documents.index(document)
+            self.select_document(self.documents[index - 1 if index else 1], lambda: self.discard_document(document))
+        else:
+            self.remove_document(document)
+
+    def remove_document(self, document):
+        self.notebook.forget(self.documents.index(document))
+        self.documents.remove(document)
+        document.close()
+
+#Compare/Merge ------------------------------------------------------------------------------------
+
+    max_highlights = 500
+
+    def ask_pattern_file(self, title):
+        return filedialog.askopenfilename(title=title, filetypes=self.pattern_filetypes(can_load=True)) or None
+
+    def read_pattern(self, path):
+        # Runs on the worker thread; the dialogs have already run.
+        return load_pattern_file(path, self.default_width, self.default_height)[0]
+
+    def compare_pattern(self):
+        other_path = self.ask_pattern_file("Compare With")
+        if other_path is None:
+            return
+        offset = simpledialog.askstring("Compare", "Offset of the other chart's top-left cell (rows,cols):",
+                                        initialvalue="0,0", parent=self.master)
+        if offset is None:
+            return
+        try:
+            rows, cols = (int(part) for part in offset.split(","))
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Enter the offset as two integers, e.g. 2,-1.")
+            return
+
+        document, pattern = self.document, self.pattern.copy()
+
+        def compared(diff):
+            if document is not self.document:
+                return
+            self.show_highlights(diff.rectangles, "magenta")
+            messagebox.showinfo("Compare", f"{diff.changed} cells differ in {len(diff.rectangles)} regions."
+                                if diff else "The charts are identical.")
+
+        self.tasks.run(f"Comparing with {os.path.basename(other_path)}",
+                       lambda progress: Diff(pattern, self.read_pattern(other_path), (rows, cols), progress),
+                       compared, lambda e: messagebox.showerror("Compare Failed", f"Failed to compare the charts.\nError: {e}"))
+
+    def merge_patterns(self):
+        base_path = self.ask_pattern_file("Common Base Version")
+        if base_path is None:
+            return
+        their_path = self.ask_pattern_file("Version to Merge In")
+        if their_path is None:
+            return
+        self.commit_changes()
+        document, ours = self.document, self.pattern.copy()
+
+        def merged(result):
+            merged, conflicts = result
+            if document is not self.document or self.pattern.snapshot() != ours.snapshot():
+                messagebox.showwarning("Merge", "The chart changed or lost focus while merging; run the merge again.")
+                return
+            self.replace_pattern(merged)
+            self.show_highlights(conflicts, "red")
+            if conflicts:
+                messagebox.showwarning("Merge", f"{len(conflicts)} regions were changed in both versions; "
+                                                "this chart's colors were kept there.")
+
+        self.tasks.run(f"Merging {os.path.basename(their_path)}",
+                       lambda progress: merge(self.read_pattern(base_path), ours, self.read_pattern(their_path), progress),
+                       self.when_generator_closed(merged), lambda e: messagebox.showerror("Merge Failed", str(e)))
+
+    def show_highlights(self, rectangles, color):
+        self.clear_highlights()
+        for i, (top, left, bottom, right) in enumerate(rectangles[:self.max_highlights]):
+            self.overlay.rectangle(f"highlight{i}", top, left, bottom, right, outline=color, width=2)
+
+    def clear_highlights(self):
+        for name in [name for name in self.overlay.shapes if name.startswith("highlight")]:
+            self.overlay.remove(name)
+
+#Session recovery ---------------------------------------------------------------------------------
+
+    def recover_session(self):
+        # A journal is only deleted once its chart is reopened or discarded; Cancel keeps them for the next start.
+        found = []
+        for path, lock in self.orphans:
             try:
-                with open(file_path, 'r') as file:
-                    pattern = json.load(file)
+                pattern = replay(path)
+            except (OSError, ValueError, EOFError):
+                release_journal(path, lock)
+                continue
+            if pattern is None:
+                release_journal(path, lock, delete=True)
+            else:
+                found.append((path, lock, pattern))
+        self.orphans = []
+        if not found:
+            return
 
-                self.selected_color = pattern.get("selected_color", self.selected_color)
-                self.choose_color_button.config(bg=self.selected_color)
-                width = pattern.get("width", self.default_width)
-                height = pattern.get("height", self.default_height)
+        answer = messagebox.askyesnocancel(
+            "Recover Session", f"An earlier session did not close properly. Recover its {len(found)} pattern(s)?\n\n"
+                               "No discards them; Cancel keeps them to recover next time.")
+        if answer:
+            documents = [self.add_document(self.new_document(pattern=pattern)) for _, _, pattern in found]
+            for document in documents:
+                document.history.mark_unsaved()
+            self.select_document(documents[0])
+        for path, lock, _ in found:
+            release_journal(path, lock, delete=answer is not None)
+
+    def on_close(self):
+        if self.tasks.busy and not messagebox.askyesno(
+                "Quit", f"{self.tasks.current.title} is still running. Quit anyway?"):
+            return
+        for document in self.documents:
+            document.close()
+        self.master.destroy()
 
-                self.generate_grid(width, height)
+#Images -------------------------------------------------------------------------------------------
+
+    def export_png(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG images", "*.png")])
+        if not file_path:
+            return
+        scale = simpledialog.askinteger("Export PNG", "Pixels per stitch:", parent=self.master,
+                                        initialvalue=1, minvalue=1, maxvalue=64)
+        if scale is None:
+            return
+        gridlines = None
+        if scale > 1 and messagebox.askyesno("Export PNG", "Draw gridlines between stitches?"):
+            gridlines = "black"
+        pattern = self.pattern.copy()
+        self.tasks.run(f"Exporting {os.path.basename(file_path)}",
+                       lambda progress: write_png(file_path, pattern, scale, gridlines, progress), lambda _: None,
+                       lambda e: messagebox.showerror("Export Failed", f"Failed to export the image.\nError: {e}"))
+
+    def import_image(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Images", "*.png *.ppm *.pgm"), ("All files", "*.*")])
+        if not file_path:
+            return
+        try:
+            image = open_image(file_path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Invalid File", f"Failed to open the image.\nError: {e}")
+            return
 
-                for key, color in pattern.get("cells", {}).items():
-                    row, col = map(int, key.split(','))
-                    if (row, col) in self.cells:
-                        self.canvas.itemconfig(self.get_canvas_id(row, col), fill=color)
-                        self.cells[(row, col)] = color
+        width = simpledialog.askinteger("Import Image", "Chart width (stitches):", parent=self.master,
+                                        initialvalue=min(self.grid_width, image.width), minvalue=1,
+                                        maxvalue=min(self.max_width, image.width))
+        if width is None:
+            return
+        height = max(1, min(self.max_height, round(image.height * width / image.width)))
+        colors = simpledialog.askinteger("Import Image", "Number of colors:", parent=self.master,
+                                         initialvalue=6, minvalue=1, maxvalue=255)
+        if colors is None:
+            return
 
-                self.save_state_to_history()
-            except json.JSONDecodeError as e:
-                messagebox.showerror("Invalid File", f"Failed to load the pattern. The file is not valid JSON.\nError: {e}")
-            except Exception as e:
-                messagebox.showerror("Error", f"An unexpected error occurred: {e}")
+        document = self.document
+
+        def imported(pattern):
+            # Left for another tab meanwhile: open the chart in its own tab rather than overwrite that one.
+            if document is self.document:
+                self.replace_pattern(pattern)
+            else:
+                self.select_document(self.add_document(self.new_document(pattern=pattern)))
+
+        self.tasks.run(f"Importing {os.path.basename(file_path)} as {width}x{height} stitches",
+                       lambda progress: import_image(file_path, width, height, colors, progress),
+                       self.when_generator_closed(imported),
+                       lambda e: messagebox.showerror("Import Failed", f"Failed to import the image.\nError: {e}"))
+
+#Background tasks ---------------------------------------------------------------------------------
+
+    def when_generator_closed(self, callback):
+        # Results that change the chart or tab wait while a generator preview is showing.
+        def run(*args):
+            if self.generator_window is None:
+                callback(*args)
+            else:
+                self.deferred_results.append(lambda: callback(*args))
+        return run
+
+    def show_task_status(self, task):
+        if task is None:
+            self.status_progress.stop()
+            self.status_progress.config(mode="determinate", value=0)
+            self.status_frame.grid_remove()
+            return
+        waiting = len(self.tasks.pending)
+        self.status_label.config(text=task.title + "..." + (f" ({waiting} more queued)" if waiting else ""))
+        self.status_cancel.config(state=tk.NORMAL if task.cancellable and not task.cancelled.is_set() else tk.DISABLED)
+        if task.progress is None:
+            if str(self.status_progress.cget("mode")) != "indeterminate":
+                self.status_progress.config(mode="indeterminate")
+                self.status_progress.start(20)
+        else:
+            self.status_progress.stop()
+            self.status_progress.config(mode="determinate", value=task.progress)
+        self.status_frame.grid()
+
+    def cancel_task(self):
+        if self.tasks.current is not None:
+            self.tasks.cancel(self.tasks.current)
+            self.show_task_status(self.tasks.current)
+
+#Generators ---------------------------------------------------------------------------------------
+
+    def generator_fields(self, kind):
+        # (key, label, default, choices) per field; choices is None for free text.
+        color = self.selected_color
+        return {
+            "repeat": [("layout", "Layout:", "straight", generators.REPEAT_LAYOUTS),
+                       ("row_offset", "Row offset:", "0", None),
+                       ("col_offset", "Column offset:", "0", None)],
+            "fair isle": [("bands", "Bands:", "peerie, zigzag, oxo, zigzag", None),
+                          ("colors", "Colors:", f"{color}, #8b0000", None),
+                          ("background", "Background:", "white", None),
+                          ("gap", "Rows between bands:", "1", None)],
+            "gradient": [("colors", "Colors:", f"white, {color}", None),
+                         ("direction", "Direction:", "vertical", generators.GRADIENT_DIRECTIONS),
+                         ("dither", "Dither:", "ordered", generators.DITHERS)],
+            "text": [("message", "Text:", "KNIT", None),
+                     ("color", "Color:", color, None),
+                     ("background", "Background:", "white", None),
+                     ("scale", "Scale:", "1", None),
+                     ("spacing", "Letter spacing:", "1", None)],
+        }[kind]
+
+    def show_generator(self):
+        if self.generator_window is not None:
+            self.generator_window.lift()
+            return
+        self.commit_changes()
+        selection = self.selection
+        if selection is not None:
+            self.generator_region = (selection.top, selection.left, selection.bottom, selection.right)
+        else:
+            self.generator_region = (0, 0, self.grid_height, self.grid_width)
+        self.generator_before = self.pattern.region_ids(*self.generator_region)
+
+        window = tk.Toplevel(self.master)
+        window.title("Generate")
+        window.transient(self.master)
+        window.protocol("WM_DELETE_WINDOW", self.close_generator)
+
+        options = tk.Frame(window)
+        options.pack(fill=tk.X, padx=5, pady=5)
+        tk.Label(options, text="Generator:").pack(side=tk.LEFT)
+        self.generator_kind_var = tk.StringVar(value="repeat" if self.clipboard is not None else "fair isle")
+        tk.OptionMenu(options, self.generator_kind_var, *generators.GENERATORS,
+                      command=lambda _: self.build_generator_fields()).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.generator_frame = tk.Frame(window)
+        self.generator_frame.pack(fill=tk.X, padx=5)
+        self.generator_status = tk.Label(window, fg="red", anchor="w")
+        self.generator_status.pack(fill=tk.X, padx=5)
+        buttons = tk.Frame(window)
+        buttons.pack(fill=tk.X, padx=5, pady=5)
+        tk.Button(buttons, text="Apply", command=self.apply_generator).pack(side=tk.RIGHT)
+        tk.Button(buttons, text="Cancel", command=self.close_generator).pack(side=tk.RIGHT)
+
+        # Keep the chart still while its region is being previewed.
+        window.grab_set()
+        self.generator_window = window
+        self.build_generator_fields()
+
+    def build_generator_fields(self):
+        for widget in self.generator_frame.winfo_children():
+            widget.destroy()
+        self.generator_vars = {}
+        for row, (key, label, default, choices) in enumerate(self.generator_fields(self.generator_kind_var.get())):
+            tk.Label(self.generator_frame, text=label).grid(row=row, column=0, sticky="e")
+            var = self.generator_vars[key] = tk.StringVar(value=default)
+            if choices is None:
+                tk.Entry(self.generator_frame, textvariable=var).grid(row=row, column=1, sticky="ew")
+            else:
+                tk.OptionMenu(self.generator_frame, var, *choices).grid(row=row, column=1, sticky="ew")
+            var.trace_add("write", lambda *args: self.schedule_generator_preview())
+        self.schedule_generator_preview()
+
+    def schedule_generator_preview(self):
+        if self.generator_update is not None:
+            self.master.after_cancel(self.generator_update)
+        self.generator_update = self.master.after(150, self.preview_generator)
+
+    def generated_clip(self, kind, values, width, height):
+        # Raises ValueError with a message for the dialog.
+        def number(key):
+            try:
+                return int(values[key])
+            except ValueError:
+                raise ValueError(f"{key.replace('_', ' ').capitalize()} must be a whole number.")
+
+        def color(name):
+            try:
+                self.master.winfo_rgb(name)
+            except tk.TclError:
+                raise ValueError(f"Unknown color: {name}")
+            return name
+
+        def color_list(key):
+            return [color(name.strip()) for name in values[key].split(",") if name.strip()]
+
+        if kind == "repeat":
+            motif = self.clipboard
+            if motif is None:
+                raise ValueError("Copy a motif first; it is repeated over the region.")
+            drop = motif.height // 2 if values["layout"] == "half-drop" else 0
+            brick = motif.width // 2 if values["layout"] == "half-brick" else 0
+            return generators.repeat(motif, width, height, number("row_offset"), number("col_offset"), drop, brick)
+        if kind == "fair isle":
+            bands = [band.strip() for band in values["bands"].split(",") if band.strip()]
+            return generators.fair_isle(width, height, bands, color_list("colors"), color(values["background"]),
+                                        number("gap"))
+        if kind == "gradient":
+            return generators.gradient(width, height, color_list("colors"), values["direction"], values["dither"])
+        return generators.text(values["message"], width, height, color(values["color"]), color(values["background"]),
+                               number("scale"), number("spacing"))
+
+    def preview_generator(self):
+        self.generator_update = None
+        top, left, bottom, right = self.generator_region
+        values = {key: var.get() for key, var in self.generator_vars.items()}
+        try:
+            clip = self.generated_clip(self.generator_kind_var.get(), values, right - left, bottom - top)
+            clip.paste(self.pattern, top, left)
+        except ValueError as e:
+            self.generator_status.config(text=str(e))
+            return False
+        self.generator_status.config(text="")
+        self.redraw(region_cells(self.pattern, *self.generator_region))
+        return True
+
+    def apply_generator(self):
+        if self.generator_update is not None:
+            self.master.after_cancel(self.generator_update)
+        if not self.preview_generator():
+            return
+        after = self.pattern.region_ids(*self.generator_region)
+        self.history.push(RegionEdit(*self.generator_region, self.generator_before, after))
+        self.generator_before = None
+        self.journal.record(self.pattern, region_cells(self.pattern, *self.generator_region))
+        self.close_generator()
+
+    def close_generator(self):
+        # Puts back the region's cells unless the fill was applied.
+        if self.generator_update is not None:
+            self.master.after_cancel(self.generator_update)
+            self.generator_update = None
+        if self.generator_before is not None:
+            self.pattern.put_region_ids(*self.generator_region, self.generator_before)
+            self.redraw(region_cells(self.pattern, *self.generator_region))
+            self.generator_before = None
+        self.generator_window.destroy()
+        self.generator_window = None
+        deferred, self.deferred_results = self.deferred_results, []
+        for result in deferred:
+            result()
+
+#Instructions -------------------------------------------------------------------------------------
+
+    def show_instructions(self):
+        if self.instructions_window is not None:
+            self.instructions_window.lift()
+            return
+        window = tk.Toplevel(self.master)
+        window.title("Knitting Instructions")
+        window.protocol("WM_DELETE_WINDOW", self.close_instructions)
+
+        options = tk.Frame(window)
+        options.pack(fill=tk.X)
+        self.instruction_mode_var = tk.StringVar(value=self.instructions.mode)
+        for text, mode in [("Flat", "flat"), ("In the Round", "round")]:
+            tk.Radiobutton(options, text=text, value=mode, variable=self.instruction_mode_var,
+                           command=self.set_instruction_mode).pack(side=tk.LEFT)
+        tk.Button(options, text="Export...", command=self.export_instructions).pack(side=tk.RIGHT)
+
+        scrollbar = tk.Scrollbar(window)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.instructions_text = tk.Text(window, wrap="word", width=60, height=30, yscrollcommand=scrollbar.set)
+        self.instructions_text.pack(fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.instructions_text.yview)
+
+        self.instructions_window = window
+        self.instruction_rows = None
+        self.update_instructions()
+
+    def close_instructions(self):
+        self.instructions_window.destroy()
+        self.instructions_window = None
+
+    def set_instruction_mode(self):
+        self.instructions.mode = self.instruction_mode_var.get()
+        self.instruction_rows = None
+        self.schedule_instructions_update()
+
+    def schedule_instructions_update(self):
+        if self.instructions_window is not None and self.instructions_update is None:
+            self.instructions_update = self.master.after_idle(self.update_instructions)
+
+    @profiled
+    def update_instructions(self):
+        self.instructions_update = None
+        if self.instructions_window is None:
+            return
+        labels = color_labels(self.pattern)
+        text = self.instructions_text
+        text.config(state=tk.NORMAL)
+        if self.instruction_rows is None or labels != self.instruction_labels:
+            text.delete("1.0", tk.END)
+            text.insert("1.0", "\n".join(self.instructions.lines(labels)))
+        else:
+            for row in self.instruction_rows:
+                line = self.instructions.row_number(row)
+                text.delete(f"{line}.0", f"{line}.end")
+                text.insert(f"{line}.0", self.instructions.line(row, labels))
+        text.config(state=tk.DISABLED)
+        self.instruction_labels = labels
+        self.instruction_rows = set()
+
+    def export_instructions(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".txt",
+                                                 filetypes=[("Text files", "*.txt"), ("Markdown files", "*.md")])
+        if not file_path:
+            return
+        pattern, mode = self.pattern.copy(), self.instructions.mode
+
+        def export(progress):
+            # The worker builds its own RowInstructions; the document's cache belongs to the Tk thread.
+            with open(file_path, 'w') as file:
+                write_instructions(file, pattern, mode, file_path.lower().endswith(".md"))
+
+        self.tasks.run(f"Exporting instructions to {os.path.basename(file_path)}", export, lambda _: None,
+                       lambda e: messagebox.showerror("Export Failed", f"Failed to export the instructions.\nError: {e}"),
+                       cancellable=False)
 
 #Color Management ---------------------------------------------------------------------------------
 
+    def schedule_usage_update(self):
+        if self.usage_update is None:
+            self.usage_update = self.master.after_idle(self.update_color_usage)
+
+    @profiled
+    def update_color_usage(self):
+        self.usage_update = None
+        usage = self.pattern.color_usage(self.yarn_per_stitch_cm)
+        for color in set(self.usage_rows) - {color for color, _, _ in usage}:
+            for widget in self.usage_rows.pop(color):
+                widget.destroy()
+        for position, (color, stitches, meters) in enumerate(usage, start=2):
+            if color not in self.usage_rows:
+                swatch = tk.Label(self.usage_frame, bg=color, width=2, relief=tk.RIDGE)
+                swatch.bind("<Button-1>", lambda e, c=color: self.set_color(c))
+                self.usage_rows[color] = (swatch, tk.Label(self.usage_frame, anchor="w"))
+            swatch, label = self.usage_rows[color]
+            swatch.grid(row=position, column=0, sticky="ew")
+            label.config(text=f"{stitches} st  ~{meters:.1f} m")
+            label.grid(row=position, column=1, sticky="w")
+        total = sum(stitches for _, stitches, _ in usage)
+        self.usage_total_label.config(text=f"{total} stitches, ~{total * self.yarn_per_stitch_cm / 100:.1f} m")
+
     def set_color(self, color):
         """Set the selected color."""
         self.selected_color = color
@@ -540,25 +1529,111 @@ class KnittingPatternApp:
         if color:
             self.set_color(color)
         
+#Scrolling ----------------------------------------------------------------------------------------
+
+    def on_x_scroll(self, first, last):
+        self.x_scrollbar.set(first, last)
+        self.renderer.viewport_changed()
+
+    def on_y_scroll(self, first, last):
+        self.y_scrollbar.set(first, last)
+        self.renderer.viewport_changed()
+
+    @profiled
+    def on_mouse_wheel(self, event):
+        if event.num == 4:
+            steps = -1
+        elif event.num == 5:
+            steps = 1
+        else:
+            steps = -1 if event.delta > 0 else 1
+        if event.state & 0x0001:
+            self.canvas.xview_scroll(steps, "units")
+        else:
+            self.canvas.yview_scroll(steps, "units")
+
+#Symmetry -----------------------------------------------------------------------------------------
+
+    def set_symmetry_mode(self, mode):
+        self.symmetry.mode = mode
+        self.show_symmetry_guides()
+
+    min_symmetry_folds = 2
+    max_symmetry_folds = 12
+
+    def set_symmetry_folds(self):
+        # Typed values are clamped; anything that isn't a number puts the current value back.
+        try:
+            folds = self.symmetry_folds_var.get()
+        except tk.TclError:
+            folds = self.symmetry.folds
+        self.symmetry.folds = max(self.min_symmetry_folds, min(self.max_symmetry_folds, folds))
+        self.symmetry_folds_var.set(self.symmetry.folds)
+
+    def set_symmetry_center(self, center):
+        # The center is in doubled cell coordinates (see Symmetry); None means the middle of the chart.
+        self.symmetry.center = center
+        self.show_symmetry_guides()
+
+    def show_symmetry_guides(self):
+        for name in [name for name in self.overlay.shapes if name.startswith("symmetry")]:
+            self.overlay.remove(name)
+        for i, ((row1, col1), (row2, col2)) in enumerate(self.symmetry.guides(self.grid_width, self.grid_height)):
+            self.overlay.rectangle(f"symmetry{i}", row1, col1, row2, col2, outline="red", dash=(4, 2), width=2)
+
+#Profiling ----------------------------------------------------------------------------------------
+
+    def toggle_profiler(self):
+        self.profiler.enabled = self.profiler_var.get()
+        self.profiler.clear()
+        if self.profiler.enabled:
+            self.update_profiler_overlay()
+        else:
+            if self.profiler_update is not None:
+                self.master.after_cancel(self.profiler_update)
+                self.profiler_update = None
+            self.canvas.delete("profiler")
+
+    def update_profiler_overlay(self):
+        flush_time, flush_items = self.renderer.last_flush
+        history = self.history
+        lines = [
+            f"render flush {flush_time * 1000:.1f} ms, {flush_items} items created",
+            f"history {history.memory_used / 1048576:.2f} / {history.memory_budget / 1048576:.0f} MB, "
+            f"{len(history.entries)} edits",
+            f"{'handler (ms)':<20}{'last':>8}{'mean':>8}{'worst':>8}",
+        ]
+        for name, last, mean, worst in self.profiler.summary()[:10]:
+            lines.append(f"{name:<20}{last * 1000:8.1f}{mean * 1000:8.1f}{worst * 1000:8.1f}")
+
+        self.canvas.delete("profiler")
+        x, y = self.canvas.canvasx(4), self.canvas.canvasy(4)
+        text = self.canvas.create_text(x + 4, y + 4, text="\n".join(lines), anchor="nw", font=("Courier", 9),
+                                       fill="white", tags="profiler")
+        self.canvas.create_rectangle(self.canvas.bbox(text) or (x, y, x, y), fill="black", outline="", tags="profiler")
+        self.canvas.tag_raise(text)
+        self.profiler_update = self.master.after(250, self.update_profiler_overlay)
+
 #Zooming ------------------------------------------------------------------------------------------
 
-    def on_zoom_slider_change(self, value):
-        self.cell_size = int(value)
-        self.refresh_canvas()
+    @profiled
+    def set_cell_size(self, cell_size):
+        self.cell_size = cell_size
+        self.renderer.set_cell_size(cell_size)
+        self.overlay.set_cell_size(cell_size)
         self.update_grid_dimensions_label()
 
+    def on_zoom_slider_change(self, value):
+        self.set_cell_size(int(value))
+
     def zoom_in(self):
         if self.cell_size < 50:
-            self.cell_size += 2
-            self.refresh_canvas()
-            self.update_grid_dimensions_label()
+            self.set_cell_size(self.cell_size + 2)
             self.zoom_slider.set(self.cell_size)
 
     def zoom_out(self):
         if self.cell_size > 5:
-            self.cell_size -= 2
-            self.refresh_canvas()
-            self.update_grid_dimensions_label()
+            self.set_cell_size(self.cell_size - 2)
             self.zoom_slider.set(self.cell_size)
 
     def zoom_to_fit(self):
@@ -570,9 +1645,7 @@ class KnittingPatternApp:
 
         optimal_cell_size = min(max_cell_size_width, max_cell_size_height)
 
-        self.cell_size = max(5, optimal_cell_size)
-        self.refresh_canvas()
-        self.update_grid_dimensions_label()
+        self.set_cell_size(max(5, optimal_cell_size))
         self.zoom_slider.set(self.cell_size)
 
 if __name__ == "__main__":
@@ -0,0 +1,234 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from fileformats import FORMATS, formats, load_pattern_file, save_pattern_file
+from imaging import write_png
+from pattern import YARN_PER_STITCH_CM
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; workers then run without a memory cap.
+    resource = None
+
+# Headless batch processing of pattern files. Nothing here (or in the modules it
+# imports) touches tkinter, so it runs on machines without a display.
+#
+#   python batch.py library/ -o out/ --format knit --flip horizontal --png 4 --report counts.csv
+
+PATTERN_EXTENSIONS = tuple(pattern_format.extension for pattern_format in formats(can_load=True))
+FLIPS = {"horizontal": "flip_horizontal", "vertical": "flip_vertical"}
+
+
+def find_patterns(paths):
+    """Expand directories into the pattern files they contain, keeping plain files as given.
+
+    Returns ``(path, relative)`` pairs, where ``relative`` is where the file's
+    outputs go under the output directory: its path inside the directory it was
+    found in, or just its name for files given directly.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.lower().endswith(PATTERN_EXTENSIONS):
+                        found = os.path.join(root, name)
+                        files.append((found, os.path.relpath(found, path)))
+        else:
+            files.append((path, os.path.basename(path)))
+    return files
+
+
+def plan_outputs(files, options):
+    """Choose every file's output paths up front; returns ``({path: [target, ...]}, [(path, error), ...])``.
+
+    A file is refused if one of its targets is the file itself or is also the
+    target of an earlier file, so nothing is overwritten by accident.
+    """
+    extensions = []
+    if options["format"]:
+        extensions.append(FORMATS[options["format"]].extension)
+    if options["png"]:
+        extensions.append(".png")
+
+    plans = {}
+    errors = []
+    claimed = {}
+    for path, relative in files:
+        stem = os.path.splitext(relative)[0]
+        targets = [os.path.join(options["output_dir"], stem + extension) for extension in extensions]
+        keys = [os.path.normcase(os.path.realpath(target)) for target in targets]
+        source = os.path.normcase(os.path.realpath(path))
+        if source in keys:
+            errors.append((path, ValueError(f"refusing to overwrite the input file with {targets[keys.index(source)]}")))
+            continue
+        clash = next((key for key in keys if key in claimed or keys.count(key) > 1), None)
+        if clash is not None:
+            other = claimed.get(clash, path)
+            errors.append((path, ValueError(f"{targets[keys.index(clash)]} would also be written for {other}")))
+            continue
+        claimed.update((key, path) for key in keys)
+        plans[path] = targets
+    return plans, errors
+
+
+def limit_memory(max_memory_mb):
+    if resource is not None and max_memory_mb:
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def process_file(path, targets, options):
+    """Load, transform and write out one pattern to the ``targets`` from plan_outputs.
+
+    Returns a summary dict for the parent process.
+    """
+    started = time.perf_counter()
+    pattern, selected_color = load_pattern_file(path)
+    if pattern.width * pattern.height > options["max_cells"]:
+        raise ValueError(f"{pattern.width}x{pattern.height} is larger than the {options['max_cells']} cell limit")
+
+    if options["flip"]:
+        getattr(pattern, FLIPS[options["flip"]])()
+    if options["tile"]:
+        pattern.tile(*options["tile"])
+    for old_color, new_color in options["recolor"]:
+        pattern.replace_color(old_color, new_color)
+
+    targets = iter(targets)
+    outputs = []
+    if options["format"]:
+        target = next(targets)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        save_pattern_file(target, pattern, selected_color)
+        outputs.append(target)
+    if options["png"]:
+        target = next(targets)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        write_png(target, pattern, options["png"])
+        outputs.append(target)
+
+    return {
+        "path": path,
+        "width": pattern.width,
+        "height": pattern.height,
+        "usage": pattern.color_usage(options["yarn_per_stitch"]) if options["report"] else [],
+        "outputs": outputs,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def write_report(path, results):
+    with open(path, 'w') as file:
+        file.write("file,width,height,color,stitches,yarn_m\n")
+        for result in results:
+            for color, stitches, meters in result["usage"]:
+                file.write(f"{result['path']},{result['width']},{result['height']},{color},{stitches},{meters:.2f}\n")
+
+
+def parse_tile(text):
+    try:
+        across, down = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected ACROSSxDOWN, e.g. 2x3")
+    if across < 1 or down < 1:
+        raise argparse.ArgumentTypeError("tile counts must be at least 1")
+    return across, down
+
+
+def parse_recolor(text):
+    old_color, sep, new_color = text.partition("=")
+    if not sep or not old_color or not new_color:
+        raise argparse.ArgumentTypeError("expected OLD=NEW, e.g. white=#F0B884")
+    return old_color, new_color
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Convert, transform, preview and report on knitting pattern files.")
+    parser.add_argument("inputs", nargs="*", help=f"pattern files or directories to search for {'/'.join(PATTERN_EXTENSIONS)} files")
+    parser.add_argument("-o", "--output-dir", default=".", help="where converted files and previews are written")
+    parser.add_argument("--format", choices=[f.name for f in formats(can_save=True)],
+                        help="save each pattern in this format (see --list-formats)")
+    parser.add_argument("--list-formats", action="store_true", help="list the registered file formats and exit")
+    parser.add_argument("--flip", choices=sorted(FLIPS))
+    parser.add_argument("--tile", type=parse_tile, metavar="ACROSSxDOWN")
+    parser.add_argument("--recolor", type=parse_recolor, action="append", default=[], metavar="OLD=NEW",
+                        help="replace every stitch of one color with another; may be repeated")
+    parser.add_argument("--png", type=int, metavar="SCALE", help="write a PNG preview, SCALE pixels per stitch")
+    parser.add_argument("--report", metavar="CSV", help="write per-color stitch counts and yarn lengths for every file")
+    parser.add_argument("--yarn-per-stitch", type=float, default=YARN_PER_STITCH_CM, metavar="CM")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--max-cells", type=int, default=4096 * 4096, help="skip patterns with more stitches than this")
+    parser.add_argument("--max-memory", type=int, default=1024, metavar="MB",
+                        help="address space limit per worker, 0 for none")
+    parser.add_argument("--tasks-per-worker", type=int, default=200,
+                        help="restart each worker after this many files to return its memory")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.list_formats:
+        for pattern_format in formats():
+            modes = "/".join(mode for mode, func in (("load", pattern_format.load), ("save", pattern_format.save)) if func)
+            print(f"{pattern_format.name:<10}{pattern_format.extension:<8}{modes:<11}{pattern_format.description}")
+        return 0
+    if not args.inputs:
+        parser.error("no input files given")
+    files = find_patterns(args.inputs)
+    if not files:
+        print("No pattern files found", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+    options = {
+        "output_dir": args.output_dir,
+        "format": args.format,
+        "flip": args.flip,
+        "tile": args.tile,
+        "recolor": args.recolor,
+        "png": args.png,
+        "report": bool(args.report),
+        "yarn_per_stitch": args.yarn_per_stitch,
+        "max_cells": args.max_cells,
+    }
+
+    started = time.perf_counter()
+    results = []
+    plans, failures = plan_outputs(files, options)
+    for path, error in failures:
+        print(f"{path}: skipped: {error}", file=sys.stderr)
+    stitches = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=limit_memory, initargs=(args.max_memory,),
+                             max_tasks_per_child=args.tasks_per_worker) as executor:
+        futures = {executor.submit(process_file, path, targets, options): path for path, targets in plans.items()}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as error:
+                failures.append((path, error))
+                print(f"[{done}/{len(futures)}] {path}: failed: {error}", file=sys.stderr)
+                continue
+            results.append(result)
+            stitches += result["width"] * result["height"]
+            print(f"[{done}/{len(futures)}] {path} ({result['seconds'] * 1000:.0f} ms)", file=sys.stderr)
+
+    if args.report:
+        results.sort(key=lambda result: result["path"])
+        write_report(args.report, results)
+
+    elapsed = time.perf_counter() - started
+    print(f"Processed {len(results)} of {len(files)} files in {elapsed:.2f} s: "
+          f"{len(results) / elapsed:.1f} files/s, {stitches / elapsed:,.0f} stitches/s", file=sys.stderr)
+    for path, error in failures:
+        print(f"  failed: {path}: {error}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tkinter as tk
+from itertools import count
+
+import transforms
+from fileformats import load_pattern_file, save_pattern_file
+from history import CellEdit, History
+from pattern import Pattern
+from renderers import ImageRenderer, RectangleRenderer
+
+# Headless timings for the model, history, file formats and renderers.
+#
+#   python benchmarks.py -o before.json
+#   python benchmarks.py -o after.json --compare before.json
+#
+# With a display (a real one, or e.g. ``xvfb-run python benchmarks.py``) the
+# renderers draw onto a real Tk canvas. Without one they draw onto MockCanvas,
+# which only keeps item bookkeeping, so its timings show the Python side of
+# rendering and the image renderer is skipped since it needs Tk photo images.
+
+SIZES = [(32, 18), (128, 128), (512, 512), (1024, 1024)]
+RENDERER_LIMITS = {"rectangle": (128, 128), "image": (1024, 1024)}
+VIEW_SIZE = (800, 600)
+CELL_SIZE = 20
+
+
+class MockCanvas:
+    """The parts of tk.Canvas the renderers use, keeping items in a dict."""
+
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.items = {}
+        self.ids = count(1)
+        self.pending = {}
+
+    def create_item(self, coords, options):
+        item = next(self.ids)
+        tags = options.get("tags", ())
+        self.items[item] = [list(coords), options, (tags,) if isinstance(tags, str) else tuple(tags)]
+        return item
+
+    def create_rectangle(self, *coords, **options):
+        return self.create_item(coords, options)
+
+    create_line = create_image = create_polygon = create_text = create_rectangle
+
+    def find_withtag(self, tag):
+        if isinstance(tag, int):
+            return (tag,) if tag in self.items else ()
+        return tuple(item for item, (_, _, tags) in self.items.items() if tag in tags)
+
+    def coords(self, item, *coords):
+        if coords:
+            self.items[item][0] = list(coords)
+        return self.items[item][0]
+
+    def itemconfig(self, tag, **options):
+        for item in self.find_withtag(tag):
+            self.items[item][1].update(options)
+
+    def delete(self, *tags):
+        for tag in tags:
+            for item in self.find_withtag(tag):
+                del self.items[item]
+
+    def scale(self, tag, x, y, x_scale, y_scale):
+        for item in self.find_withtag(tag):
+            coords = self.items[item][0]
+            coords[0::2] = [value * x_scale for value in coords[0::2]]
+            coords[1::2] = [value * y_scale for value in coords[1::2]]
+
+    def tag_lower(self, *args):
+        pass
+
+    tag_raise = tag_lower
+
+    def config(self, **options):
+        pass
+
+    def canvasx(self, x):
+        return x
+
+    canvasy = canvasx
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def after_idle(self, callback):
+        key = next(self.ids)
+        self.pending[key] = callback
+        return key
+
+    def after_cancel(self, key):
+        self.pending.pop(key, None)
+
+
+def make_canvas():
+    """A real canvas when Tk can open a display, otherwise a MockCanvas."""
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return MockCanvas(*VIEW_SIZE), "mock"
+    canvas = tk.Canvas(root, width=VIEW_SIZE[0], height=VIEW_SIZE[1])
+    canvas.pack()
+    root.update()
+    return canvas, "tk"
+
+
+def striped_pattern(width, height, colors=8):
+    pattern = Pattern(width, height)
+    for row in range(height):
+        pattern.fill_rect(row, 0, row, width - 1, f"#{(row % colors) * 32:02x}4080")
+    return pattern
+
+
+#Suites -------------------------------------------------------------------------------------------
+
+def model_cases(width, height):
+    """(name, setup, run) cases; setup builds fresh state so every repeat does the same work."""
+    stroke = [(row % height, (row * 7) % width) for row in range(200)]
+
+    def new_history():
+        pattern = striped_pattern(width, height)
+        history = History()
+        for _ in range(10):
+            history.push(transforms.flip_horizontal())
+            transforms.flip_horizontal().redo(pattern)
+        return pattern, history
+
+    def push_stroke(state):
+        pattern, history = state
+        changes = {}
+        for row, col in stroke:
+            i = pattern.index(row, col)
+            changes.setdefault(i, pattern.data[i])
+            pattern.set(row, col, "red")
+        history.push(CellEdit.from_changes(pattern, changes))
+
+    def undo_redo(state):
+        pattern, history = state
+        while history.can_undo():
+            history.undo(pattern)
+        while history.can_redo():
+            history.redo(pattern)
+
+    return [
+        ("generate_grid", lambda: Pattern(1, 1), lambda pattern: pattern.reset(width, height)),
+        ("flip_horizontal", lambda: striped_pattern(width, height), lambda p: transforms.flip_horizontal().redo(p)),
+        ("flip_vertical", lambda: striped_pattern(width, height), lambda p: transforms.flip_vertical().redo(p)),
+        ("rotate_clockwise", lambda: striped_pattern(width, height), lambda p: transforms.rotate_clockwise().redo(p)),
+        ("modify_grid", lambda: striped_pattern(width, height), lambda p: (
+            transforms.insert_rows(0).redo(p), transforms.remove_columns(p, p.width - 1).redo(p))),
+        ("save_state_to_history", new_history, push_stroke),
+        ("undo_redo_10_flips", new_history, undo_redo),
+        ("replace_color", lambda: striped_pattern(width, height), lambda p: p.replace_color(p.palette[1], "red")),
+    ]
+
+
+def file_cases(width, height, directory):
+    cases = []
+    for extension in ("json", "knit"):
+        path = os.path.join(directory, f"bench.{extension}")
+        save_pattern_file(path, striped_pattern(width, height))
+        cases.append((f"save_{extension}", lambda: striped_pattern(width, height),
+                      lambda pattern, path=path: save_pattern_file(path, pattern)))
+        cases.append((f"load_{extension}", lambda: None, lambda _, path=path: load_pattern_file(path)))
+    return cases
+
+
+def render_cases(canvas, kind, width, height):
+    renderer_class = ImageRenderer if kind == "image" else RectangleRenderer
+
+    def new_renderer():
+        renderer = renderer_class(canvas, striped_pattern(width, height), CELL_SIZE)
+        renderer.flush()
+        return renderer
+
+    def first_draw(renderer):
+        renderer.flush()
+
+    def refresh(renderer):
+        renderer.mark_all_dirty()
+        renderer.flush()
+
+    def flip_and_draw(renderer):
+        transforms.flip_horizontal().redo(renderer.pattern)
+        renderer.mark_all_dirty()
+        renderer.flush()
+
+    def stroke(renderer):
+        renderer.mark_dirty([(row % height, row % width) for row in range(100)])
+        renderer.flush()
+
+    def zoom(renderer):
+        renderer.set_cell_size(CELL_SIZE + 4)
+        renderer.flush()
+
+    cases = [
+        ("generate_grid_render", lambda: renderer_class(canvas, striped_pattern(width, height), CELL_SIZE), first_draw),
+        ("refresh_canvas", new_renderer, refresh),
+        ("flip_render", new_renderer, flip_and_draw),
+        ("stroke_100_cells", new_renderer, stroke),
+        ("zoom", new_renderer, zoom),
+    ]
+    return [(name, setup, run, lambda renderer: renderer.clear()) for name, setup, run in cases]
+
+
+def run_case(name, setup, run, repeats, teardown=None, **labels):
+    times = []
+    items = 0
+    for _ in range(repeats):
+        state = setup()
+        started = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - started)
+        items = getattr(state, "last_flush", (0, 0))[1]
+        if teardown is not None:
+            teardown(state)
+    result = dict(labels, name=name, repeats=repeats, median=statistics.median(times), min=min(times))
+    if items:
+        result["items_created"] = items
+    return result
+
+
+def run_benchmarks(sizes, repeats, progress=None):
+    canvas, backend = make_canvas()
+    results = []
+
+    def report(result):
+        results.append(result)
+        if progress is not None:
+            progress(result)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for width, height in sizes:
+            size = f"{width}x{height}"
+            for name, setup, run in model_cases(width, height) + file_cases(width, height, directory):
+                report(run_case(name, setup, run, repeats, size=size, renderer=None))
+            for kind, (max_width, max_height) in RENDERER_LIMITS.items():
+                if width > max_width or height > max_height or (kind == "image" and backend == "mock"):
+                    continue
+                for name, setup, run, teardown in render_cases(canvas, kind, width, height):
+                    report(run_case(name, setup, run, repeats, teardown, size=size, renderer=kind))
+    return {
+        "format": 1,
+        "backend": backend,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "results": results,
+    }
+
+
+#Reporting ----------------------------------------------------------------------------------------
+
+def result_key(result):
+    return result["name"], result["size"], result["renderer"]
+
+
+def compare(baseline, current):
+    """Lines comparing median times with an earlier run; ratios above 1 are slowdowns."""
+    before = {result_key(result): result for result in baseline["results"]}
+    lines = [f"{'benchmark':<28}{'size':>11}{'renderer':>11}{'before ms':>12}{'after ms':>12}{'ratio':>8}"]
+    for result in current["results"]:
+        old = before.get(result_key(result))
+        if old is None:
+            continue
+        ratio = result["median"] / old["median"] if old["median"] else float("inf")
+        lines.append(f"{result['name']:<28}{result['size']:>11}{result['renderer'] or '-':>11}"
+                     f"{old['median'] * 1000:>12.2f}{result['median'] * 1000:>12.2f}{ratio:>8.2f}")
+    return lines
+
+
+def parse_size(text):
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected WIDTHxHEIGHT, e.g. 128x128")
+    return width, height
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time pattern, history, file and rendering operations.")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="JSON", help="an earlier results file to compare against")
+    parser.add_argument("--size", type=parse_size, action="append", metavar="WxH",
+                        help="grid size to run, may be repeated (default: 32x18 up to 1024x1024)")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    def progress(result):
+        print(f"{result['name']:<28}{result['size']:>11}{result['renderer'] or '-':>11}"
+              f"{result['median'] * 1000:>10.2f} ms", file=sys.stderr)
+
+    results = run_benchmarks(args.size or SIZES, args.repeats, progress)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=1)
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            print("\n".join(compare(json.load(file), results)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import os
+
+from instructions import RowInstructions
+
+
+class Document:
+    """One open chart with its own history, journal and view settings.
+
+    A document opened from a file keeps only a ``loader`` until its tab is first
+    focused. While it's in the background its history is packed and the app
+    drops its canvas items, so only ``view`` (scroll fractions) and
+    ``cell_size`` are needed to put it back on screen.
+    """
+
+    def __init__(self, title, history, journal, pattern=None, loader=None, path=None):
+        self.title = title
+        self.history = history
+        self.journal = journal
+        self.pattern = None
+        self.instructions = None
+        self.loader = loader
+        self.path = path
+        self.selected_color = None
+        self.renderer_kind = "rectangle"
+        self.cell_size = None
+        self.view = (0.0, 0.0)
+        if pattern is not None:
+            self.set_pattern(pattern)
+
+    @property
+    def loaded(self):
+        return self.pattern is not None
+
+    def set_pattern(self, pattern):
+        self.pattern = pattern
+        self.instructions = RowInstructions(pattern)
+        self.journal.start(pattern)
+
+    def finish_load(self, loaded):
+        """Take the loader's result, ``(pattern, selected_color)`` like load_pattern_file.
+
+        The app runs ``loader`` on a worker thread the first time the tab is shown.
+        """
+        pattern, self.selected_color = loaded
+        self.loader = None
+        self.set_pattern(pattern)
+
+    def suspend(self, view):
+        self.view = view
+        self.history.pack()
+
+    def resume(self):
+        self.history.unpack()
+
+    def close(self):
+        self.journal.close(delete=True)
+
+    def rename(self, path):
+        self.path = path
+        self.title = os.path.basename(path)
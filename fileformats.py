@@ -0,0 +1,194 @@
+import importlib
+import json
+import os
+import struct
+import zlib
+
+from pattern import Pattern
+
+MAGIC = b"KNIT"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBIIH")
+CHUNK_SIZE = 64 * 1024
+
+
+def is_binary_file(path):
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def load_pattern_file(path, default_width=32, default_height=18):
+    """Load a pattern in any registered format, returning ``(pattern, selected_color)``.
+
+    Files starting with the .knit magic are read as such whatever their name;
+    otherwise the extension picks the format, falling back to JSON.
+    """
+    if is_binary_file(path):
+        return load_binary(path)
+    pattern_format = format_for_path(path) or FORMATS["json"]
+    if pattern_format.load is None:
+        raise ValueError(f"{pattern_format.description} files can't be opened as patterns.")
+    return pattern_format.load(path, default_width, default_height)
+
+
+def save_pattern_file(path, pattern, selected_color=None):
+    """Save in the format registered for the path's extension, or as JSON for unknown extensions."""
+    pattern_format = format_for_path(path) or FORMATS["json"]
+    if pattern_format.save is None:
+        raise ValueError(f"{pattern_format.description} files can't be written.")
+    pattern_format.save(path, pattern, selected_color)
+
+#Format registry ----------------------------------------------------------------------------------
+#
+# Formats beyond the app's own live in plugin modules that call register_format
+# when imported; the modules in PLUGIN_MODULES are imported the first time the
+# registry is consulted. ``save(path, pattern, selected_color)`` should write
+# row by row rather than building the whole file in memory, and
+# ``load(path, default_width, default_height)`` returns ``(pattern, selected_color)``.
+
+PLUGIN_MODULES = ["formatplugins"]
+
+
+class PatternFormat:
+    def __init__(self, name, extension, description, save=None, load=None):
+        self.name = name
+        self.extension = extension
+        self.description = description
+        self.save = save
+        self.load = load
+
+    def filetype(self):
+        return (self.description, f"*{self.extension}")
+
+
+FORMATS = {}
+plugins_loaded = False
+
+
+def register_format(name, extension, description, save=None, load=None):
+    FORMATS[name] = PatternFormat(name, extension, description, save, load)
+    return FORMATS[name]
+
+
+def load_plugins():
+    global plugins_loaded
+    if not plugins_loaded:
+        plugins_loaded = True
+        for module in PLUGIN_MODULES:
+            importlib.import_module(module)
+
+
+def formats(can_save=False, can_load=False):
+    load_plugins()
+    return [f for f in FORMATS.values() if (f.save or not can_save) and (f.load or not can_load)]
+
+
+def format_for_path(path):
+    extension = os.path.splitext(path)[1].lower()
+    return next((f for f in formats() if f.extension == extension), None)
+
+#JSON ---------------------------------------------------------------------------------------------
+
+def load_json(path, default_width=32, default_height=18):
+    with open(path, 'r') as file:
+        data = json.load(file)
+    return Pattern.from_dict(data, default_width, default_height), data.get("selected_color")
+
+
+def save_json(path, pattern, selected_color=None):
+    data = pattern.to_dict()
+    if selected_color is not None:
+        data["selected_color"] = selected_color
+        data["cells"] = data.pop("cells")
+    with open(path, 'w') as file:
+        json.dump(data, file)
+
+#Binary -------------------------------------------------------------------------------------------
+#
+# Layout (little endian):
+#   header   magic "KNIT", version u8, width u32, height u32, palette size u16
+#   palette  one (length u8, utf-8 bytes) entry per color
+#   selected (length u8, utf-8 bytes), empty when unset
+#   cells    zlib stream of width * height palette indices, row-major, one byte each
+
+def write_string(file, text):
+    encoded = text.encode("utf-8")
+    if len(encoded) > 255:
+        raise ValueError(f"Color name is too long to save: {text!r}")
+    file.write(bytes([len(encoded)]))
+    file.write(encoded)
+
+
+def read_exact(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Pattern file is truncated.")
+    return data
+
+
+def read_string(file):
+    return read_exact(file, read_exact(file, 1)[0]).decode("utf-8")
+
+
+def save_binary(path, pattern, selected_color=None):
+    used = sorted(set(pattern.data))
+    palette = [pattern.palette[cid] for cid in used]
+    table = bytearray(256)
+    for new_id, cid in enumerate(used):
+        table[cid] = new_id
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, pattern.width, pattern.height, len(palette)))
+        for color in palette:
+            write_string(file, color)
+        write_string(file, selected_color or "")
+
+        compressor = zlib.compressobj(9)
+        rows_per_chunk = max(1, CHUNK_SIZE // pattern.width)
+        for row in range(0, pattern.height, rows_per_chunk):
+            start = row * pattern.width
+            chunk = pattern.data[start:start + rows_per_chunk * pattern.width]
+            file.write(compressor.compress(chunk.translate(table)))
+        file.write(compressor.flush())
+
+
+def load_binary(path):
+    with open(path, 'rb') as file:
+        magic, version, width, height, palette_size = HEADER.unpack(read_exact(file, HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("Not a pattern file.")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Pattern file version {version} is newer than this app supports.")
+        if width <= 0 or height <= 0:
+            raise ValueError("Pattern file has invalid dimensions.")
+
+        palette = [read_string(file) for _ in range(palette_size)]
+        selected_color = read_string(file) or None
+
+        decompressor = zlib.decompressobj()
+        data = bytearray()
+        expected = width * height
+        while len(data) < expected:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            data += decompressor.decompress(chunk, expected - len(data))
+            while decompressor.unconsumed_tail and len(data) < expected:
+                data += decompressor.decompress(decompressor.unconsumed_tail, expected - len(data))
+
+    if len(data) != expected:
+        raise ValueError("Pattern file is truncated.")
+    if not palette or max(data) >= palette_size:
+        raise ValueError("Pattern file references a color outside its palette.")
+
+    pattern = Pattern(width, height, palette[0])
+    for color in palette:
+        pattern.color_id(color)
+    pattern.restore((width, height, data))
+    return pattern, selected_color
+
+
+#Built-in formats ---------------------------------------------------------------------------------
+
+register_format("json", ".json", "JSON files", save_json, load_json)
+register_format("knit", ".knit", "Compact pattern files", save_binary, lambda path, *defaults: load_binary(path))
@@ -0,0 +1,126 @@
+import csv
+import struct
+
+from fileformats import read_exact, read_string, register_format, write_string
+from imaging import write_png
+from pattern import DEFAULT_COLOR, Pattern
+
+# Exchange formats for knitting machines and other charting software. Each
+# registers itself with fileformats on import and writes one chart row at a time.
+
+#Machine bitmask ----------------------------------------------------------------------------------
+#
+# For electronic and punch-card machines, which knit each row as one carriage
+# pass per color and select needles by a bit pattern. Rows are stored in
+# knitting order (the bottom chart row first). Little endian:
+#   header   magic "KNMB", version u8, width u16, height u16, palette size u16
+#   palette  one (length u8, utf-8 bytes) entry per color
+#   rows     pass count u8, then per pass: color index u8 and ceil(width / 8)
+#            bytes with one bit per needle, most significant bit = leftmost stitch
+
+MACHINE_MAGIC = b"KNMB"
+MACHINE_VERSION = 1
+MACHINE_HEADER = struct.Struct("<4sBHHH")
+BITS = bytes.maketrans(b"\0\1", b"01")
+
+
+def needle_bits(mask, width):
+    """Pack a 0/1 byte per needle into bits, padding the last byte with zeros."""
+    padded = mask.translate(BITS) + b"0" * (-width % 8)
+    return int(padded, 2).to_bytes(len(padded) // 8, "big")
+
+
+def needle_mask(bits, width):
+    return format(int.from_bytes(bits, "big"), f"0{len(bits) * 8}b")[:width].encode().translate(bytes.maketrans(b"01", b"\0\1"))
+
+
+def save_machine(path, pattern, selected_color=None):
+    used = sorted(set(pattern.data))
+    if len(used) > 255 or pattern.width > 0xFFFF or pattern.height > 0xFFFF:
+        raise ValueError("The chart is too large for the machine format.")
+    table = bytearray(256)
+    for new_id, cid in enumerate(used):
+        table[cid] = new_id
+
+    with open(path, 'wb') as file:
+        file.write(MACHINE_HEADER.pack(MACHINE_MAGIC, MACHINE_VERSION, pattern.width, pattern.height, len(used)))
+        for cid in used:
+            write_string(file, pattern.palette[cid])
+        for row in range(pattern.height - 1, -1, -1):
+            ids = pattern.row_ids(row).translate(table)
+            colors = sorted(set(ids))
+            file.write(bytes([len(colors)]))
+            for color in colors:
+                select = bytearray(256)
+                select[color] = 1
+                file.write(bytes([color]) + needle_bits(ids.translate(select), pattern.width))
+
+
+def load_machine(path, default_width=32, default_height=18):
+    with open(path, 'rb') as file:
+        magic, version, width, height, palette_size = MACHINE_HEADER.unpack(read_exact(file, MACHINE_HEADER.size))
+        if magic != MACHINE_MAGIC:
+            raise ValueError("Not a machine bitmask file.")
+        if version > MACHINE_VERSION:
+            raise ValueError(f"Machine file version {version} is newer than this app supports.")
+        if width <= 0 or height <= 0 or not palette_size:
+            raise ValueError("Machine file has invalid dimensions.")
+        palette = [read_string(file) for _ in range(palette_size)]
+
+        pattern = Pattern(width, height, palette[0])
+        ids = [pattern.color_id(color) for color in palette]
+        span = (width + 7) // 8
+        for row in range(height - 1, -1, -1):
+            cells = bytearray(width)
+            for _ in range(read_exact(file, 1)[0]):
+                color = read_exact(file, 1)[0]
+                if color >= palette_size:
+                    raise ValueError("Machine file references a color outside its palette.")
+                mask = needle_mask(read_exact(file, span), width)
+                start = mask.find(1)
+                while start != -1:
+                    cells[start] = ids[color]
+                    start = mask.find(1, start + 1)
+            pattern.put_row_ids(row, cells)
+    return pattern, None
+
+#CSV ----------------------------------------------------------------------------------------------
+#
+# One line per chart row, top row first, holding each cell's color name.
+
+def save_csv(path, pattern, selected_color=None):
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        for row in range(pattern.height):
+            writer.writerow(pattern.row_colors(row))
+
+
+def load_csv(path, default_width=32, default_height=18):
+    with open(path, 'r', newline='') as file:
+        rows = [row for row in csv.reader(file)]
+    while rows and not any(rows[-1]):
+        rows.pop()
+    width = max((len(row) for row in rows), default=0)
+    if not rows or not width:
+        raise ValueError("The CSV file holds no cells.")
+
+    pattern = Pattern(width, len(rows))
+    for r, colors in enumerate(rows):
+        pattern.put_row_ids(r, bytes(pattern.color_id(color.strip() or DEFAULT_COLOR)
+                                     for color in colors + [DEFAULT_COLOR] * (width - len(colors))))
+    return pattern, None
+
+#Chart image --------------------------------------------------------------------------------------
+#
+# A printable chart: each stitch as a square block with gridlines between them.
+
+CHART_CELL_PIXELS = 16
+
+
+def save_chart_image(path, pattern, selected_color=None):
+    write_png(path, pattern, CHART_CELL_PIXELS, gridlines="black")
+
+
+register_format("machine", ".kmb", "Knitting machine bitmask", save_machine, load_machine)
+register_format("csv", ".csv", "CSV color grid", save_csv, load_csv)
+register_format("chart", ".png", "Chart image (PNG)", save_chart_image)
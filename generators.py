@@ -0,0 +1,222 @@
+from pattern import DEFAULT_COLOR
+from selection import Clip
+
+# Procedural fills. Every generator returns a Clip of the requested size whose
+# ids index its own color list, so it can be pasted over any region of any chart
+# (Clip.paste maps the colors into the chart's palette) and kept as a single
+# RegionEdit. Rows are built as byte strings and repeated, sliced or translated
+# in bulk; only error-diffusion dithering has to visit cells one by one.
+
+GENERATORS = ("repeat", "fair isle", "gradient", "text")
+REPEAT_LAYOUTS = ("straight", "half-drop", "half-brick")
+GRADIENT_DIRECTIONS = ("vertical", "horizontal")
+DITHERS = ("ordered", "floyd-steinberg", "none")
+
+
+def repeated(row, start, width):
+    """``width`` bytes of ``row`` repeated end to end, beginning at offset ``start`` into it."""
+    return (row * (width // len(row) + 2))[start:start + width]
+
+#Repeats ------------------------------------------------------------------------------------------
+
+def repeat(motif, width, height, row_offset=0, col_offset=0, drop=0, brick=0):
+    """Tile ``motif`` (a Clip; a lasso mask is ignored) over a width x height block.
+
+    The offsets move the first repeat's top-left corner from the block's. ``drop``
+    moves each column of repeats that many rows below the one to its left and
+    ``brick`` moves each row of repeats right of the one above, so half the
+    motif's height or width gives a half-drop or half-brick layout.
+    """
+    if drop and brick:
+        raise ValueError("A repeat can be dropped or bricked, not both.")
+    motif_width, motif_height = motif.width, motif.height
+    rows = [motif.ids[row * motif_width:(row + 1) * motif_width] for row in range(motif_height)]
+    ids = bytearray()
+    if drop:
+        first = -col_offset // motif_width
+        last = -(-(width - col_offset) // motif_width)
+        start = -(col_offset + first * motif_width)
+        for row in range(height):
+            line = b"".join(rows[(row - row_offset - block * drop) % motif_height] for block in range(first, last))
+            ids += line[start:start + width]
+    else:
+        for row in range(height):
+            band, motif_row = divmod(row - row_offset, motif_height)
+            ids += repeated(rows[motif_row], -(col_offset + band * brick) % motif_width, width)
+    return Clip(width, height, list(motif.colors), bytes(ids))
+
+#Fair Isle ----------------------------------------------------------------------------------------
+#
+# Small two-color band motifs, "#" for the contrast color and "." for the background.
+
+BAND_MOTIFS = {
+    "peerie": ["..#...", ".#.#..", "#...#.", ".#.#..", "..#..."],
+    "cross": ["..#...", ".###..", "..#..."],
+    "zigzag": ["#.....", ".#...#", "..#.#.", "...#.."],
+    "waves": ["..##..", ".#..#.", "#....#"],
+    "checks": ["#.", ".#"],
+    "oxo": [".###..#...#.", "#...#..#.#..", "#...#...#...", "#...#..#.#..", ".###..#...#."],
+    "stripe": ["#"],
+}
+
+
+def fair_isle(width, height, bands, colors, background=DEFAULT_COLOR, gap=1):
+    """Horizontal bands of BAND_MOTIFS, top to bottom, cycling through ``bands`` until the block is full.
+
+    Each band takes the next of ``colors`` against ``background``, so no row
+    carries more than two yarns. Motifs are centered across the width and bands
+    are separated by ``gap`` background rows.
+    """
+    if not bands or not colors:
+        raise ValueError("Fair Isle needs at least one band and one color.")
+    unknown = [band for band in bands if band not in BAND_MOTIFS]
+    if unknown:
+        raise ValueError(f"Unknown band motif: {unknown[0]} (choose from {', '.join(BAND_MOTIFS)})")
+    if gap < 0:
+        raise ValueError("The gap between bands can't be negative.")
+
+    size = width * height
+    ids = bytearray()
+    band = 0
+    while len(ids) < size:
+        ids += bytes(width * gap)
+        motif = BAND_MOTIFS[bands[band % len(bands)]]
+        table = bytes.maketrans(b".#", bytes([0, 1 + band % len(colors)]))
+        motif_width = len(motif[0])
+        start = -((width - motif_width) // 2) % motif_width
+        for line in motif:
+            ids += repeated(line.encode().translate(table), start, width)
+        band += 1
+    return Clip(width, height, [background] + list(colors), bytes(ids[:size]))
+
+#Gradients ----------------------------------------------------------------------------------------
+
+def bayer_matrix(size):
+    matrix = [[0]]
+    while len(matrix) < size:
+        matrix = ([[4 * v for v in row] + [4 * v + 2 for v in row] for row in matrix] +
+                  [[4 * v + 3 for v in row] + [4 * v + 1 for v in row] for row in matrix])
+    return matrix
+
+
+BAYER = [[(v + 0.5) / 64 for v in row] for row in bayer_matrix(8)]
+ROUNDING = [[0.5] * 8] * 8
+
+
+def quantize(value, threshold, top):
+    base = int(value)
+    return min(top, base + (value - base > threshold))
+
+
+def diffuse(width, height, level, top):
+    """Floyd-Steinberg dithering of ``level(row, col)`` to the whole numbers 0..top."""
+    ids = bytearray()
+    errors = [0.0] * (width + 2)
+    for row in range(height):
+        below = [0.0] * (width + 2)
+        for col in range(width):
+            value = level(row, col) + errors[col + 1]
+            chosen = min(top, max(0, int(value + 0.5)))
+            ids.append(chosen)
+            error = value - chosen
+            errors[col + 2] += error * 7 / 16
+            below[col] += error * 3 / 16
+            below[col + 1] += error * 5 / 16
+            below[col + 2] += error / 16
+        errors = below
+    return bytes(ids)
+
+
+def gradient(width, height, colors, direction="vertical", dither="ordered"):
+    """Blend through ``colors`` from top to bottom ("vertical") or left to right ("horizontal").
+
+    A stitch can only be one yarn, so shades in between are dithered: "ordered"
+    uses an 8x8 Bayer matrix, giving a regular texture built a row at a time;
+    "floyd-steinberg" diffuses the error for a smoother but irregular look and is
+    computed cell by cell; "none" steps between solid bands.
+    """
+    if not colors:
+        raise ValueError("A gradient needs at least one color.")
+    if direction not in GRADIENT_DIRECTIONS:
+        raise ValueError(f"Unknown gradient direction: {direction}")
+    if dither not in DITHERS:
+        raise ValueError(f"Unknown dither: {dither}")
+    top = len(colors) - 1
+    span = max(1, (height if direction == "vertical" else width) - 1)
+
+    def level(row, col):
+        return (row if direction == "vertical" else col) * top / span
+
+    if dither == "floyd-steinberg":
+        ids = diffuse(width, height, level, top)
+    else:
+        thresholds = BAYER if dither == "ordered" else ROUNDING
+        if direction == "vertical":
+            ids = b"".join(repeated(bytes(quantize(level(row, 0), t, top) for t in thresholds[row % 8]), 0, width)
+                           for row in range(height))
+        else:
+            phases = [bytes(quantize(level(0, col), thresholds[phase][col % 8], top) for col in range(width))
+                      for phase in range(8)]
+            ids = b"".join(phases[row % 8] for row in range(height))
+    return Clip(width, height, list(colors), ids)
+
+#Text ---------------------------------------------------------------------------------------------
+#
+# A 5x7 bitmap font: seven rows per glyph, each a hex byte whose low five bits
+# are the pixels, most significant bit leftmost.
+
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 7
+FONT = {char: bytes.fromhex(rows) for char, rows in {
+    "A": "0E1111111F1111", "B": "1E11111E11111E", "C": "0E11101010110E", "D": "1C12111111121C",
+    "E": "1F10101E10101F", "F": "1F10101E101010", "G": "0E11101711110F", "H": "1111111F111111",
+    "I": "0E04040404040E", "J": "0702020202120C", "K": "11121418141211", "L": "1010101010101F",
+    "M": "111B1515111111", "N": "11111915131111", "O": "0E11111111110E", "P": "1E11111E101010",
+    "Q": "0E11111115120D", "R": "1E11111E141211", "S": "0F10100E01011E", "T": "1F040404040404",
+    "U": "1111111111110E", "V": "11111111110A04", "W": "1111111515150A", "X": "11110A040A1111",
+    "Y": "1111110A040404", "Z": "1F01020408101F",
+    "0": "0E11131519110E", "1": "040C040404040E", "2": "0E11010204081F", "3": "1F02040201110E",
+    "4": "02060A121F0202", "5": "1F101E0101110E", "6": "0608101E11110E", "7": "1F010204080808",
+    "8": "0E11110E11110E", "9": "0E11110F01020C",
+    " ": "00000000000000", ".": "00000000000C0C", ",": "000000000C0408", "!": "04040404000004",
+    "?": "0E110102040004", "-": "0000001F000000", "'": "0C040800000000", ":": "000C0C000C0C00",
+    "/": "00010204081000", "&": "0C12140815120D", "+": "0004041F040400", "#": "0A0A1F0A1F0A0A",
+    "*": "0004150E150400", "(": "02040808080402", ")": "08040202020408", "♥": "000A1F1F0E0400",
+}.items()}
+PIXELS = bytes.maketrans(b"01", b"\0\1")
+
+
+def glyph_row(char, row):
+    return format(FONT.get(char, FONT["?"])[row], f"0{GLYPH_WIDTH}b").encode().translate(PIXELS)
+
+
+def text(message, width, height, color="black", background=DEFAULT_COLOR, scale=1, spacing=1):
+    """``message`` in the built-in font, centered in a width x height block of ``background``.
+
+    Each font pixel is ``scale`` stitches square and letters are ``spacing``
+    pixels apart. Letters are upper-cased, characters the font lacks are drawn
+    as "?", lines split on newlines, and anything outside the block is cut off.
+    """
+    if scale < 1 or spacing < 0:
+        raise ValueError("The text scale must be at least 1 and the spacing can't be negative.")
+    gap = bytes(spacing)
+    pixel_rows = []
+    for number, line in enumerate(message.upper().split("\n")):
+        if number:
+            pixel_rows += [b""] * spacing
+        for row in range(GLYPH_HEIGHT):
+            pixel_rows.append(gap.join(glyph_row(char, row) for char in line))
+
+    text_width = max(len(row) for row in pixel_rows) * scale
+    top = (height - len(pixel_rows) * scale) // 2
+    left = (width - text_width) // 2
+    ids = bytearray(width * height)
+    for number, pixels in enumerate(pixel_rows):
+        stitches = bytes(pixels[i // scale] for i in range(len(pixels) * scale))
+        skip = max(0, -left)
+        stitches = stitches[skip:skip + width - max(0, left)]
+        for row in range(top + number * scale, top + (number + 1) * scale):
+            if 0 <= row < height:
+                start = row * width + max(0, left)
+                ids[start:start + len(stitches)] = stitches
+    return Clip(width, height, [background, color], bytes(ids))
@@ -0,0 +1,259 @@
+import pickle
+import zlib
+from array import array
+
+
+class CellEdit:
+    """Cells changed in place, stored as flat indices with their old and new color ids."""
+
+    def __init__(self, indices, before, after):
+        self.indices = array('I', indices)
+        self.before = bytes(before)
+        self.after = bytes(after)
+
+    @classmethod
+    def from_changes(cls, pattern, changes):
+        """Build an edit from a {flat index: previous color id} map, dropping cells that ended unchanged."""
+        data = pattern.data
+        indices = sorted(i for i, old in changes.items() if data[i] != old)
+        return cls(indices, (changes[i] for i in indices), (data[i] for i in indices))
+
+    def __len__(self):
+        return len(self.indices)
+
+    def apply(self, pattern, values):
+        pattern.put_ids(self.indices, values)
+        width = pattern.width
+        return [divmod(i, width) for i in self.indices]
+
+    def undo(self, pattern):
+        return self.apply(pattern, self.before)
+
+    def redo(self, pattern):
+        return self.apply(pattern, self.after)
+
+    def size(self):
+        return len(self.indices) * self.indices.itemsize + len(self.before) + len(self.after) + 64
+
+    def ids(self):
+        return set(self.before) | set(self.after)
+
+
+class RegionEdit:
+    """A rectangle [top, bottom) x [left, right) overwritten in bulk, stored as its old and new ids row-major."""
+
+    def __init__(self, top, left, bottom, right, before, after):
+        self.top = top
+        self.left = left
+        self.bottom = bottom
+        self.right = right
+        self.before = bytes(before)
+        self.after = bytes(after)
+
+    def __len__(self):
+        return 0 if self.before == self.after else len(self.after)
+
+    def apply(self, pattern, ids):
+        pattern.put_region_ids(self.top, self.left, self.bottom, self.right, ids)
+        return region_cells(pattern, self.top, self.left, self.bottom, self.right)
+
+    def undo(self, pattern):
+        return self.apply(pattern, self.before)
+
+    def redo(self, pattern):
+        return self.apply(pattern, self.after)
+
+    def size(self):
+        return len(self.before) + len(self.after) + 64
+
+    def ids(self):
+        return ids_in(self.before) | ids_in(self.after)
+
+
+def ids_in(data):
+    """The distinct color ids in a byte string."""
+    if len(data) < 4096:
+        return set(data)
+    return {cid for cid in range(256) if cid in data}
+
+
+def region_cells(pattern, top, left, bottom, right):
+    """The cells of a rectangle to redraw, or None when it covers the whole chart."""
+    if (top, left, bottom, right) == (0, 0, pattern.height, pattern.width):
+        return None
+    return [(row, col) for row in range(top, bottom) for col in range(left, right)]
+
+
+class GridEdit:
+    """A structural change replayed through Pattern methods, paired with the operations that invert it.
+
+    Operations are ``(method name, args)`` tuples, so a flip is its own inverse and
+    removing a row only keeps that row's color ids around for undo.
+    """
+
+    def __init__(self, redo_ops, undo_ops):
+        self.redo_ops = list(redo_ops)
+        self.undo_ops = list(undo_ops)
+
+    def __len__(self):
+        return len(self.redo_ops)
+
+    def run(self, pattern, ops):
+        for name, args in ops:
+            getattr(pattern, name)(*args)
+        return None
+
+    def undo(self, pattern):
+        return self.run(pattern, self.undo_ops)
+
+    def redo(self, pattern):
+        return self.run(pattern, self.redo_ops)
+
+    def size(self):
+        payload = 0
+        for _, args in self.redo_ops + self.undo_ops:
+            for arg in args:
+                if isinstance(arg, (bytes, bytearray)):
+                    payload += len(arg)
+                elif isinstance(arg, tuple):
+                    payload += sum(len(a) for a in arg if isinstance(a, (bytes, bytearray)))
+        return payload + 64
+
+    def ids(self):
+        """Color ids held in the operations' arguments, e.g. removed rows or a snapshot to restore."""
+        ids = set()
+        for _, args in self.redo_ops + self.undo_ops:
+            for arg in args:
+                if isinstance(arg, tuple):
+                    for a in arg:
+                        if isinstance(a, (bytes, bytearray)):
+                            ids |= ids_in(a)
+                elif isinstance(arg, (bytes, bytearray)):
+                    ids |= ids_in(arg)
+        return ids
+
+
+class PackedEdit:
+    """An edit kept zlib-compressed while its document is in the background."""
+
+    def __init__(self, edit):
+        self.length = len(edit)
+        self.color_ids = edit.ids()
+        self.data = zlib.compress(pickle.dumps(edit, pickle.HIGHEST_PROTOCOL), 1)
+
+    def __len__(self):
+        return self.length
+
+    def unpack(self):
+        return pickle.loads(zlib.decompress(self.data))
+
+    def size(self):
+        return len(self.data) + 64
+
+    def ids(self):
+        return self.color_ids
+
+
+class History:
+    """Undo/redo list of edits with a memory budget.
+
+    ``entries[:position]`` have been applied; the rest can be redone. Undo and redo
+    return the cells they touched, or None when the whole grid needs redrawing.
+    When the estimated size of all entries exceeds ``memory_budget`` the oldest
+    ones are dropped. ``saved_position`` is the position that matches the file on
+    disk, or None once that state can no longer be reached.
+    """
+
+    def __init__(self, memory_budget=32 * 1024 * 1024):
+        self.memory_budget = memory_budget
+        self.entries = []
+        self.position = 0
+        self.saved_position = 0
+        self.memory_used = 0
+        self.packed = False
+
+    def clear(self):
+        self.entries.clear()
+        self.position = 0
+        self.saved_position = 0
+        self.memory_used = 0
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.entries)
+
+    def mark_saved(self):
+        self.saved_position = self.position
+
+    def mark_unsaved(self):
+        self.saved_position = None
+
+    def is_modified(self):
+        return self.position != self.saved_position
+
+    def push(self, edit):
+        if not len(edit):
+            return
+        for dropped in self.entries[self.position:]:
+            self.memory_used -= dropped.size()
+        del self.entries[self.position:]
+        if self.saved_position is not None and self.saved_position > self.position:
+            self.saved_position = None
+
+        self.entries.append(edit)
+        self.position += 1
+        self.memory_used += edit.size()
+        self.evict()
+
+    def evict(self):
+        while self.memory_used > self.memory_budget and len(self.entries) > 1:
+            if self.position > 0:
+                dropped = self.entries.pop(0)
+                self.position -= 1
+                if self.saved_position is not None:
+                    self.saved_position = self.saved_position - 1 if self.saved_position else None
+            else:
+                dropped = self.entries.pop()
+                if self.saved_position is not None and self.saved_position > len(self.entries):
+                    self.saved_position = None
+            self.memory_used -= dropped.size()
+
+    def pack(self):
+        """Compress every entry; ``unpack`` must be called before the history is used again."""
+        if self.packed:
+            return
+        self.entries = [PackedEdit(edit) for edit in self.entries]
+        self.packed = True
+        self.recount_memory()
+
+    def unpack(self):
+        if not self.packed:
+            return
+        self.entries = [edit.unpack() for edit in self.entries]
+        self.packed = False
+        self.recount_memory()
+
+    def referenced_ids(self):
+        """Every color id an undo or redo could write back into the pattern."""
+        ids = set()
+        for edit in self.entries:
+            ids |= edit.ids()
+        return ids
+
+    def recount_memory(self):
+        self.memory_used = sum(edit.size() for edit in self.entries)
+
+    def undo(self, pattern):
+        if not self.can_undo():
+            return []
+        self.position -= 1
+        return self.entries[self.position].undo(pattern)
+
+    def redo(self, pattern):
+        if not self.can_redo():
+            return []
+        edit = self.entries[self.position]
+        self.position += 1
+        return edit.redo(pattern)
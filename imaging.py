@@ -0,0 +1,419 @@
+import os
+import struct
+import zlib
+from collections import Counter
+from operator import add, itemgetter
+
+from pattern import Pattern
+
+# Image input and output without Tk: colors are parsed here instead of by
+# winfo_rgb, PNGs are written as indexed images straight from a pattern's
+# palette ids, and pictures are read, sampled down and quantized one scanline at
+# a time in plain Python so a worker thread can do it without holding the UI.
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Tk color names the app itself uses or offers; anything else should be a "#" hex string.
+NAMED_COLORS = {
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "red": (255, 0, 0),
+    "green": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "cyan": (0, 255, 255),
+    "magenta": (255, 0, 255),
+    "gray": (190, 190, 190),
+    "grey": (190, 190, 190),
+    "orange": (255, 165, 0),
+    "purple": (160, 32, 240),
+    "pink": (255, 192, 203),
+    "brown": (165, 42, 42),
+}
+
+
+def color_rgb(color):
+    """(r, g, b) in 0-255 for a Tk color string: "#rgb", "#rrggbb", "#rrrrggggbbbb" or a known name."""
+    if color.startswith("#"):
+        digits = color[1:]
+        if len(digits) in (3, 6, 9, 12):
+            step = len(digits) // 3
+            try:
+                channels = [int(digits[i:i + step], 16) for i in range(0, len(digits), step)]
+            except ValueError:
+                pass
+            else:
+                scale = 16 ** step - 1
+                return tuple(round(value * 255 / scale) for value in channels)
+    elif color.lower() in NAMED_COLORS:
+        return NAMED_COLORS[color.lower()]
+    raise ValueError(f"Unknown color: {color!r}")
+
+
+def rgb_hex(rgb):
+    return "#%02x%02x%02x" % rgb
+
+#PNG output ---------------------------------------------------------------------------------------
+
+def write_chunk(file, kind, payload):
+    file.write(struct.pack(">I", len(payload)))
+    file.write(kind)
+    file.write(payload)
+    file.write(struct.pack(">I", zlib.crc32(payload, zlib.crc32(kind))))
+
+
+def write_png(path, pattern, scale=1, gridlines=None, progress=None):
+    """Write the pattern as an indexed PNG with each stitch drawn as a ``scale`` x ``scale`` block.
+
+    With a ``gridlines`` color (and a scale of at least 2) the first pixel row and
+    column of every block, plus one closing row and column, are drawn in that color.
+    If writing fails or ``progress`` raises, the partly written file is removed.
+    """
+    if scale < 1:
+        raise ValueError("Scale must be at least 1")
+    palette = [color_rgb(color) for color in pattern.palette]
+    grid_id = None
+    if gridlines is not None and scale > 1:
+        grid_rgb = color_rgb(gridlines)
+        if grid_rgb in palette:
+            grid_id = palette.index(grid_rgb)
+        elif len(palette) < 256:
+            grid_id = len(palette)
+            palette.append(grid_rgb)
+        else:
+            raise ValueError("No palette entry is left for the gridline color")
+
+    border = 0 if grid_id is None else 1
+    width, height = pattern.width * scale + border, pattern.height * scale + border
+    compressor = zlib.compressobj(6)
+    scanline = bytearray(width + 1)
+    if grid_id is not None:
+        grid_line = b"\0" + bytes([grid_id]) * width
+        scanline[1::scale] = bytes([grid_id]) * (pattern.width + 1)
+    try:
+        with open(path, 'wb') as file:
+            file.write(PNG_SIGNATURE)
+            write_chunk(file, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0))
+            write_chunk(file, b"PLTE", b"".join(bytes(rgb) for rgb in palette))
+            for row in range(pattern.height):
+                if progress is not None and row % 64 == 0:
+                    progress(row / pattern.height)
+                ids = pattern.row_ids(row)
+                for offset in range(border, scale):
+                    scanline[1 + offset::scale] = ids
+                if grid_id is None:
+                    data = compressor.compress(bytes(scanline) * scale)
+                else:
+                    data = compressor.compress(grid_line + bytes(scanline) * (scale - 1))
+                if data:
+                    write_chunk(file, b"IDAT", data)
+            if grid_id is not None:
+                write_chunk(file, b"IDAT", compressor.compress(grid_line))
+            write_chunk(file, b"IDAT", compressor.flush())
+            write_chunk(file, b"IEND", b"")
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+#Image input --------------------------------------------------------------------------------------
+#
+# Readers expose ``width``, ``height``, ``rows()`` (raw scanlines, top to bottom)
+# and ``rgb(scanline)`` (packed 8-bit RGB). Every scanline has to be decoded since
+# PNG filters refer to the previous one, but only the ones that get sampled are
+# converted to RGB, and at most one image row is held at a time.
+
+def add_bytes(a, b):
+    """Bytewise a + b mod 256 over whole scanlines, done with big-integer arithmetic."""
+    n = len(a)
+    x, y = int.from_bytes(a, "big"), int.from_bytes(b, "big")
+    low, high = int.from_bytes(b"\x7f" * n, "big"), int.from_bytes(b"\x80" * n, "big")
+    return (((x & low) + (y & low)) ^ ((x ^ y) & high)).to_bytes(n, "big")
+
+
+def unfilter(kind, line, previous, bpp):
+    if kind == 0:
+        return line
+    if kind == 2:
+        return add_bytes(line, previous)
+    line = bytearray(line)
+    n = len(line)
+    if kind == 1:
+        for i in range(bpp, n):
+            line[i] = (line[i] + line[i - bpp]) & 255
+    elif kind == 3:
+        for i in range(n):
+            left = line[i - bpp] if i >= bpp else 0
+            line[i] = (line[i] + ((left + previous[i]) >> 1)) & 255
+    elif kind == 4:
+        for i in range(n):
+            if i >= bpp:
+                a, c = line[i - bpp], previous[i - bpp]
+            else:
+                a = c = 0
+            b = previous[i]
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            if pa <= pb and pa <= pc:
+                line[i] = (line[i] + a) & 255
+            elif pb <= pc:
+                line[i] = (line[i] + b) & 255
+            else:
+                line[i] = (line[i] + c) & 255
+    else:
+        raise ValueError(f"Unknown PNG filter type {kind}")
+    return bytes(line)
+
+
+class PngReader:
+    """Non-interlaced PNGs of any color type, at 1-16 bits per sample. Alpha is blended onto white."""
+
+    CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+    def __init__(self, path):
+        self.path = path
+        self.palette = None
+        self.transparency = None
+        with open(path, 'rb') as file:
+            if file.read(8) != PNG_SIGNATURE:
+                raise ValueError("Not a PNG file")
+            for kind, payload in self.chunks(file):
+                if kind == b"IHDR":
+                    self.width, self.height, self.depth, self.color_type, _, _, interlace = struct.unpack(">IIBBBBB", payload)
+                    if self.color_type not in self.CHANNELS:
+                        raise ValueError(f"Unsupported PNG color type {self.color_type}")
+                    if interlace:
+                        raise ValueError("Interlaced PNGs are not supported")
+                elif kind == b"PLTE":
+                    self.palette = payload
+                elif kind == b"tRNS":
+                    self.transparency = payload
+                elif kind == b"IDAT":
+                    break
+        self.samples = self.CHANNELS[self.color_type]
+        self.bpp = max(1, self.samples * self.depth // 8)
+        self.stride = (self.width * self.samples * self.depth + 7) // 8
+        if self.color_type == 3:
+            if self.palette is None:
+                raise ValueError("Palette PNG without a palette")
+            self.tables = self.palette_tables()
+
+    @staticmethod
+    def chunks(file):
+        while True:
+            header = file.read(8)
+            if len(header) < 8:
+                return
+            length, kind = struct.unpack(">I4s", header)
+            payload = file.read(length)
+            file.read(4)
+            yield kind, payload
+            if kind == b"IEND":
+                return
+
+    def rows(self):
+        decompressor = zlib.decompressobj()
+        previous = bytes(self.stride)
+        pending = b""
+        with open(self.path, 'rb') as file:
+            file.read(8)
+            for kind, payload in self.chunks(file):
+                if kind != b"IDAT":
+                    continue
+                pending += decompressor.decompress(payload)
+                start = 0
+                while len(pending) - start > self.stride:
+                    line = unfilter(pending[start], pending[start + 1:start + 1 + self.stride], previous, self.bpp)
+                    start += self.stride + 1
+                    previous = line
+                    yield line
+                pending = pending[start:]
+
+    def palette_tables(self):
+        """Translate tables taking palette indices to red, green and blue, with tRNS alpha blended onto white."""
+        alpha = self.transparency or b""
+        channels = [bytearray(256) for _ in range(3)]
+        for i in range(len(self.palette) // 3):
+            a = alpha[i] if i < len(alpha) else 255
+            for channel, value in zip(channels, self.palette[3 * i:3 * i + 3]):
+                channel[i] = (value * a + 255 * (255 - a)) // 255
+        return [bytes(channel) for channel in channels]
+
+    def samples_of(self, line):
+        """One byte per sample: 16-bit samples keep their high byte, packed low depths are scaled up."""
+        if self.depth == 8:
+            return line
+        if self.depth == 16:
+            return line[0::2]
+        per_byte = 8 // self.depth
+        mask = (1 << self.depth) - 1
+        scale = 1 if self.color_type == 3 else 255 // mask
+        out = bytearray()
+        for byte in line:
+            out.extend(((byte >> (8 - self.depth * (k + 1))) & mask) * scale for k in range(per_byte))
+        return bytes(out[:self.width * self.samples])
+
+    def rgb(self, line):
+        values = self.samples_of(line)
+        out = bytearray(3 * self.width)
+        if self.color_type == 3:
+            for channel, table in enumerate(self.tables):
+                out[channel::3] = values.translate(table)
+        elif self.color_type in (0, 4):
+            gray = values[0::self.samples]
+            if self.color_type == 4:
+                gray = blend_white(gray, values[1::2])
+            out[0::3] = out[1::3] = out[2::3] = gray
+        else:
+            for channel in range(3):
+                out[channel::3] = values[channel::self.samples]
+            if self.color_type == 6:
+                alpha = values[3::4]
+                for channel in range(3):
+                    out[channel::3] = blend_white(out[channel::3], alpha)
+        return out
+
+
+def blend_white(values, alpha):
+    if alpha.count(255) == len(alpha):
+        return values
+    return bytes((v * a + 255 * (255 - a)) // 255 for v, a in zip(values, alpha))
+
+
+class PpmReader:
+    """Binary PPM (P6) and PGM (P5) files with 8-bit samples."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            fields = []
+            self.offset = 0
+            data = file.read(4096)
+            while len(fields) < 4:
+                while data[self.offset:self.offset + 1].isspace():
+                    self.offset += 1
+                if data[self.offset:self.offset + 1] == b"#":
+                    self.offset = data.index(b"\n", self.offset)
+                    continue
+                end = self.offset
+                while end < len(data) and not data[end:end + 1].isspace():
+                    end += 1
+                fields.append(data[self.offset:end])
+                self.offset = end
+            self.offset += 1
+        magic, width, height, maxval = fields
+        if magic not in (b"P5", b"P6") or int(maxval) != 255:
+            raise ValueError("Only 8-bit binary PPM/PGM files are supported")
+        self.samples = 3 if magic == b"P6" else 1
+        self.width, self.height = int(width), int(height)
+
+    def rows(self):
+        stride = self.width * self.samples
+        with open(self.path, 'rb') as file:
+            file.seek(self.offset)
+            for _ in range(self.height):
+                yield file.read(stride)
+
+    def rgb(self, line):
+        if self.samples == 3:
+            return line
+        out = bytearray(3 * self.width)
+        out[0::3] = out[1::3] = out[2::3] = line
+        return out
+
+
+def open_image(path):
+    with open(path, 'rb') as file:
+        start = file.read(8)
+    if start == PNG_SIGNATURE:
+        return PngReader(path)
+    if start[:2] in (b"P5", b"P6"):
+        return PpmReader(path)
+    raise ValueError("Images must be PNG or binary PPM/PGM files")
+
+#Sampling and quantization ------------------------------------------------------------------------
+
+def sample_positions(source, target, samples):
+    """``samples`` evenly spaced source positions inside each of ``target`` equal boxes."""
+    return [min(source - 1, int((i + (k + 0.5) / samples) * source / target))
+            for i in range(target) for k in range(samples)]
+
+
+def downsample(image, width, height, samples=3, progress=None):
+    """Average ``samples`` x ``samples`` points per stitch; returns width * height (r, g, b) tuples."""
+    rows = sample_positions(image.height, height, samples)
+    cols = sample_positions(image.width, width, samples)
+    wanted = Counter(rows)
+    pick = itemgetter(*cols) if len(cols) > 1 else lambda values: (values[cols[0]],)
+    area = samples * samples
+
+    pixels = []
+    sums = None
+    taken = 0
+    for y, line in enumerate(image.rows()):
+        if progress is not None and y % 64 == 0:
+            progress(y / image.height)
+        if y not in wanted:
+            continue
+        rgb = image.rgb(line)
+        channels = []
+        for channel in range(3):
+            picked = pick(rgb[channel::3])
+            channels.append(list(map(sum, zip(*(picked[k::samples] for k in range(samples))))))
+        for _ in range(wanted[y]):
+            sums = channels if sums is None else [list(map(add, total, new)) for total, new in zip(sums, channels)]
+            taken += 1
+            if taken % samples == 0:
+                pixels.extend(zip(*([(value + area // 2) // area for value in channel] for channel in sums)))
+                sums = None
+    return pixels
+
+
+def median_cut(pixels, count):
+    """Up to ``count`` colors for ``pixels``; returns (palette, {pixel: palette index})."""
+    boxes = [list(Counter(pixels).items())]
+    while len(boxes) < count:
+        best = None
+        for i, box in enumerate(boxes):
+            if len(box) < 2:
+                continue
+            ranges = [max(c[0][ch] for c in box) - min(c[0][ch] for c in box) for ch in range(3)]
+            spread = max(ranges)
+            if best is None or spread > best[0]:
+                best = (spread, i, ranges.index(spread))
+        if best is None:
+            break
+        _, i, channel = best
+        box = sorted(boxes[i], key=lambda item: item[0][channel])
+        half = sum(n for _, n in box) / 2
+        seen = 0
+        for split, (_, n) in enumerate(box, 1):
+            seen += n
+            if seen >= half:
+                break
+        split = min(split, len(box) - 1)
+        boxes[i:i + 1] = [box[:split], box[split:]]
+
+    palette = []
+    mapping = {}
+    for box in boxes:
+        total = sum(n for _, n in box)
+        palette.append(tuple((sum(c[ch] * n for c, n in box) + total // 2) // total for ch in range(3)))
+        for color, _ in box:
+            mapping[color] = len(palette) - 1
+    return palette, mapping
+
+
+def import_image(path, width, height, colors=8, progress=None):
+    """Read a picture into a new width x height pattern with at most ``colors`` colors."""
+    image = open_image(path)
+    pixels = downsample(image, width, height, progress=progress and (lambda done: progress(0.9 * done)))
+    palette, mapping = median_cut(pixels, colors)
+    if progress is not None:
+        progress(0.95)
+    pattern = Pattern(width, height)
+    ids = bytes(pattern.color_id(rgb_hex(rgb)) for rgb in palette)
+    pattern.put_region_ids(0, 0, height, width, bytes(ids[mapping[pixel]] for pixel in pixels))
+    if progress is not None:
+        progress(1.0)
+    return pattern
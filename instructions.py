@@ -0,0 +1,102 @@
+from itertools import groupby
+
+# Charts are worked from the bottom up: the last chart row is knitting row 1.
+# Flat knitting alternates right side (RS, read right to left) and wrong side
+# (WS, read left to right) rows; in the round every round is read right to left.
+
+MODES = ("flat", "round")
+
+
+def color_labels(pattern):
+    """MC for the most used color, then CC1, CC2, ... by decreasing stitch count."""
+    counts = pattern.counts
+    used = sorted((cid for cid in range(len(pattern.palette)) if counts[cid]), key=lambda cid: (-counts[cid], cid))
+    return {cid: "MC" if n == 0 else f"CC{n}" for n, cid in enumerate(used)}
+
+
+def row_runs(pattern, row):
+    """(color id, stitches) runs across one chart row, left to right."""
+    return [(cid, sum(1 for _ in group)) for cid, group in groupby(pattern.row_ids(row))]
+
+
+class RowInstructions:
+    """Run-length instructions for each row of a pattern, cached per chart row.
+
+    Runs are stored in chart order and don't depend on the mode or the color
+    labels, so only rows touched by an edit need ``invalidate``; changing the
+    mode just re-formats the cached runs.
+    """
+
+    def __init__(self, pattern, mode="flat"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown knitting mode: {mode}")
+        self.pattern = pattern
+        self.mode = mode
+        self.runs = {}
+
+    def invalidate(self, rows=None):
+        """Forget cached runs for some chart rows, or for all of them."""
+        if rows is None:
+            self.runs.clear()
+        else:
+            for row in rows:
+                self.runs.pop(row, None)
+
+    def row_runs(self, row):
+        runs = self.runs.get(row)
+        if runs is None:
+            runs = self.runs[row] = row_runs(self.pattern, row)
+        return runs
+
+    def row_number(self, row):
+        return self.pattern.height - row
+
+    def line(self, row, labels):
+        number = self.row_number(row)
+        runs = self.row_runs(row)
+        if self.mode == "round":
+            heading = f"Rnd {number}"
+            runs = runs[::-1]
+        elif number % 2:
+            heading = f"Row {number} (RS)"
+            runs = runs[::-1]
+        else:
+            heading = f"Row {number} (WS)"
+        return f"{heading}: " + ", ".join(f"{stitches} {labels[cid]}" for cid, stitches in runs)
+
+    def lines(self, labels=None):
+        """Yield one instruction line per row, starting from knitting row 1."""
+        if labels is None:
+            labels = color_labels(self.pattern)
+        for row in range(self.pattern.height - 1, -1, -1):
+            yield self.line(row, labels)
+
+
+def legend(pattern, labels):
+    counts = pattern.counts
+    return [(label, pattern.palette[cid], counts[cid]) for cid, label in sorted(labels.items(), key=lambda item: -counts[item[0]])]
+
+
+def write_instructions(file, pattern, mode="flat", markdown=False, instructions=None):
+    """Stream instructions for a pattern to an open text file, one row at a time."""
+    if instructions is None:
+        instructions = RowInstructions(pattern, mode)
+    labels = color_labels(pattern)
+    noun = "Rounds" if mode == "round" else "Rows"
+    summary = f"{pattern.width} stitches x {pattern.height} {noun.lower()}, {'in the round' if mode == 'round' else 'worked flat'}."
+    if markdown:
+        file.write(f"# Knitting Instructions\n\n{summary}\n\n")
+        file.write("| Label | Color | Stitches |\n| --- | --- | --- |\n")
+        for label, color, stitches in legend(pattern, labels):
+            file.write(f"| {label} | {color} | {stitches} |\n")
+        file.write(f"\n## {noun}\n\n")
+        for line in instructions.lines(labels):
+            heading, _, body = line.partition(": ")
+            file.write(f"- **{heading}:** {body}\n")
+    else:
+        file.write(f"{summary}\n\n")
+        for label, color, stitches in legend(pattern, labels):
+            file.write(f"{label} = {color} ({stitches} st)\n")
+        file.write("\n")
+        for line in instructions.lines(labels):
+            file.write(line + "\n")
@@ -0,0 +1,217 @@
+import marshal
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+from pattern import Pattern
+
+try:
+    import fcntl
+except ImportError:  # Windows locks a byte of the file instead.
+    fcntl = None
+    import msvcrt
+
+# Crash recovery journal. Every change to the chart is appended as a record:
+# either the new ids of the cells that changed or, after structural edits and
+# every so often, a snapshot of the whole chart. Colors are journaled as they are
+# added to the palette, so ids in later records stay meaningful on replay; when
+# the pattern reuses an id for another color the next record is a snapshot.
+#
+# The Tk thread only builds records and queues them; a writer thread batches
+# them to disk and, when the file has grown well past the size of a snapshot,
+# starts a fresh file from that snapshot. A journal left behind at startup means
+# the last session didn't exit cleanly.
+#
+# While a session runs it holds an exclusive lock on "<journal>.lock". The OS
+# drops the lock when the process dies, so a journal whose lock can be taken
+# belongs to a session that crashed, never to another instance still running.
+#
+# Layout: magic "KNJ1", then records of (length u32, crc32 u32, marshal payload).
+# Replay stops at the first short or damaged record, as left by a crash mid-write.
+
+MAGIC = b"KNJ1"
+RECORD = struct.Struct("<II")
+
+
+class Journal:
+    def __init__(self, path, batch_delay=0.5, snapshot_interval=500, compact_ratio=4):
+        self.path = path
+        self.batch_delay = batch_delay
+        self.snapshot_interval = snapshot_interval
+        self.compact_ratio = compact_ratio
+        self.palette_size = 0
+        self.palette_generation = 0
+        self.since_snapshot = 0
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = None
+
+    def start(self, pattern):
+        """Begin a new journal holding a snapshot of ``pattern``."""
+        self.lock = lock_journal(self.path)
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+        self.snapshot(pattern)
+
+    def record(self, pattern, cells):
+        """Journal the cells (row, col) that just changed, or the whole chart when ``cells`` is None."""
+        if self.thread is None:
+            return
+        if (cells is None or self.since_snapshot >= self.snapshot_interval or len(cells) * 2 > len(pattern.data)
+                or pattern.palette_generation != self.palette_generation):
+            self.snapshot(pattern)
+            return
+        if not cells:
+            return
+        width, data = pattern.width, pattern.data
+        indices = [row * width + col for row, col in cells]
+        self.queue.put(("cells", self.new_colors(pattern), indices, bytes(data[i] for i in indices)))
+        self.since_snapshot += 1
+
+    def snapshot(self, pattern):
+        self.palette_size = len(pattern.palette)
+        self.palette_generation = pattern.palette_generation
+        self.since_snapshot = 0
+        self.queue.put(("snapshot", list(pattern.palette), pattern.width, pattern.height, bytes(pattern.data)))
+
+    def new_colors(self, pattern):
+        colors = pattern.palette[self.palette_size:]
+        self.palette_size = len(pattern.palette)
+        return colors
+
+    def close(self, delete=False):
+        """Write out anything queued and stop the writer; ``delete`` removes the journal after a clean exit."""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        if self.lock is not None:
+            release_journal(self.path, self.lock, delete)
+            self.lock = None
+        elif delete and os.path.exists(self.path):
+            os.remove(self.path)
+
+#Writer thread ------------------------------------------------------------------------------------
+
+    def write_loop(self):
+        file = self.open_fresh()
+        snapshot_size = 0
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.batch_delay
+            while batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+
+            chunks = []
+            for record in batch:
+                chunk = encode_record(record)
+                if record[0] == "snapshot":
+                    snapshot_size = len(chunk)
+                    if file.tell() > snapshot_size * self.compact_ratio:
+                        file = self.compact(file, chunk)
+                        chunks = []
+                        continue
+                chunks.append(chunk)
+            if chunks:
+                file.write(b"".join(chunks))
+                file.flush()
+                os.fsync(file.fileno())
+        file.close()
+
+    def open_fresh(self, first_chunk=b""):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(MAGIC + first_chunk)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        return open(self.path, 'ab')
+
+    def compact(self, file, snapshot_chunk):
+        """Start the journal over from a snapshot, replacing the old file in one step."""
+        file.close()
+        return self.open_fresh(snapshot_chunk)
+
+
+def encode_record(record):
+    payload = marshal.dumps(record)
+    return RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+
+#Locking ------------------------------------------------------------------------------------------
+
+def lock_journal(path):
+    """Open and exclusively lock a journal's lock file; returns None if a live process holds it."""
+    lock = open(path + ".lock", 'ab')
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def release_journal(path, lock, delete=False):
+    """Give up a journal's lock, first removing the journal and its lock file if ``delete``."""
+    if delete:
+        for leftover in (path, path + ".lock"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    lock.close()
+
+
+def claim_orphans(directory):
+    """Lock every journal in ``directory`` whose session has died; returns ``(path, lock)`` pairs."""
+    orphans = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".journal"):
+            path = os.path.join(directory, name)
+            lock = lock_journal(path)
+            if lock is not None:
+                orphans.append((path, lock))
+    return orphans
+
+#Recovery -----------------------------------------------------------------------------------------
+
+def replay(path):
+    """Rebuild the last journaled chart, or return None if the journal holds no snapshot."""
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            return None
+        content = file.read()
+
+    pattern = None
+    position = 0
+    while position + RECORD.size <= len(content):
+        length, crc = RECORD.unpack_from(content, position)
+        payload = content[position + RECORD.size:position + RECORD.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        position += RECORD.size + length
+        record = marshal.loads(payload)
+
+        if record[0] == "snapshot":
+            _, palette, width, height, data = record
+            pattern = Pattern(width, height, palette[0])
+            for color in palette:
+                pattern.color_id(color)
+            pattern.restore((width, height, data))
+        elif pattern is not None:
+            _, colors, indices, ids = record
+            for color in colors:
+                pattern.color_id(color)
+            pattern.put_ids(indices, ids)
+    return pattern
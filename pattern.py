@@ -0,0 +1,477 @@
+from collections import Counter
+from itertools import compress
+
+DEFAULT_COLOR = "white"
+MAX_PALETTE_SIZE = 256
+YARN_PER_STITCH_CM = 2.5
+
+
+class PaletteFullError(ValueError):
+    """A new color was needed while every one of the MAX_PALETTE_SIZE ids was still in use."""
+
+
+class Pattern:
+    """A knitting chart stored as a flat, row-major bytearray of palette indices.
+
+    A color id keeps its color as long as anything may refer to it, so ids held
+    outside the pattern (e.g. by undo history) stay valid after the grid is
+    resized, reset or reassigned. New colors get new ids until the palette is
+    full; after that an id is reused only if no cell holds it and it isn't among
+    ``retained_ids()``, a hook for whoever keeps ids outside the pattern.
+    ``palette_generation`` counts such reuses.
+
+    ``counts[cid]`` is the number of cells holding each color id. Every method
+    that writes ``data`` keeps it current, so code outside this class should
+    write cells through those methods rather than into ``data`` directly.
+    """
+
+    def __init__(self, width, height, color=DEFAULT_COLOR):
+        self.palette = []
+        self.palette_index = {}
+        self.width = 0
+        self.height = 0
+        self.data = bytearray()
+        self.counts = [0] * MAX_PALETTE_SIZE
+        self.palette_generation = 0
+        self.reset(width, height, color)
+
+#Palette ------------------------------------------------------------------------------------------
+
+    retained_ids = None
+
+    def color_id(self, color, reserved=()):
+        """The id for ``color``, adding it to the palette if needed; ids in ``reserved`` are never reused."""
+        cid = self.palette_index.get(color)
+        if cid is None:
+            if len(self.palette) < MAX_PALETTE_SIZE:
+                cid = len(self.palette)
+                self.palette.append(color)
+            else:
+                cid = self.free_id(reserved)
+                del self.palette_index[self.palette[cid]]
+                self.palette[cid] = color
+                self.palette_generation += 1
+            self.palette_index[color] = cid
+        return cid
+
+    def color_ids(self, colors):
+        """Ids for several colors at once, e.g. for a translation table built before any cell is written.
+
+        An id handed out for one of the colors isn't reused for a later one, even
+        though no cell holds it yet.
+        """
+        ids = []
+        for color in colors:
+            ids.append(self.color_id(color, ids))
+        return ids
+
+    def free_id(self, reserved=()):
+        retained = self.retained_ids() if self.retained_ids is not None else ()
+        for cid, n in enumerate(self.counts):
+            if not n and cid not in retained and cid not in reserved:
+                return cid
+        raise PaletteFullError(f"A chart can use at most {MAX_PALETTE_SIZE} colors at once, "
+                               "counting those its undo history can bring back.")
+
+    def color_of(self, cid):
+        return self.palette[cid]
+
+#Color counts -------------------------------------------------------------------------------------
+
+    def count_ids(self, ids, sign=1):
+        """Add the color ids in ``ids`` to the histogram, or remove them with ``sign=-1``."""
+        counts = self.counts
+        if len(ids) > 1024 and len(self.palette) <= 32:
+            for cid in range(len(self.palette)):
+                counts[cid] += sign * ids.count(cid)
+        else:
+            for cid, n in Counter(ids).items():
+                counts[cid] += sign * n
+
+    def recount(self):
+        self.counts = [0] * MAX_PALETTE_SIZE
+        self.count_ids(self.data)
+
+    def color_counts(self):
+        """Stitches per color, for the colors in use."""
+        return {self.palette[cid]: n for cid, n in enumerate(self.counts[:len(self.palette)]) if n}
+
+    def color_usage(self, yarn_per_stitch=YARN_PER_STITCH_CM):
+        """(color, stitches, estimated meters of yarn) for each color in use, most used first."""
+        usage = [(color, n, n * yarn_per_stitch / 100) for color, n in self.color_counts().items()]
+        usage.sort(key=lambda entry: -entry[1])
+        return usage
+
+#Cell access --------------------------------------------------------------------------------------
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.height and 0 <= col < self.width
+
+    def index(self, row, col):
+        return row * self.width + col
+
+    def get(self, row, col):
+        return self.palette[self.data[row * self.width + col]]
+
+    def set(self, row, col, color):
+        """Set one cell and return True if its color changed."""
+        i = row * self.width + col
+        cid = self.color_id(color)
+        old = self.data[i]
+        if old == cid:
+            return False
+        self.counts[old] -= 1
+        self.counts[cid] += 1
+        self.data[i] = cid
+        return True
+
+    def put_ids(self, indices, ids):
+        """Write color ids to flat cell indices."""
+        data, counts = self.data, self.counts
+        for i, cid in zip(indices, ids):
+            counts[data[i]] -= 1
+            counts[cid] += 1
+            data[i] = cid
+
+    def row_ids(self, row):
+        start = row * self.width
+        return self.data[start:start + self.width]
+
+    def put_row_ids(self, row, ids):
+        start = row * self.width
+        self.count_ids(self.data[start:start + self.width], -1)
+        self.count_ids(ids)
+        self.data[start:start + self.width] = ids
+
+    def column_ids(self, col):
+        return self.data[col::self.width]
+
+    def put_column_ids(self, col, ids):
+        self.count_ids(self.data[col::self.width], -1)
+        self.count_ids(ids)
+        self.data[col::self.width] = ids
+
+    def region_ids(self, top, left, bottom, right):
+        """Color ids of the cells in [top, bottom) x [left, right), row-major."""
+        width = self.width
+        data = self.data
+        return bytes(bytearray().join([data[start + left:start + right] for start in range(top * width, bottom * width, width)]))
+
+    def put_region_ids(self, top, left, bottom, right, ids):
+        span = right - left
+        if span <= 0:
+            return
+        self.count_ids(self.region_ids(top, left, bottom, right), -1)
+        self.count_ids(ids)
+        width = self.width
+        data = self.data
+        for offset, start in enumerate(range(top * width, bottom * width, width)):
+            data[start + left:start + right] = ids[offset * span:(offset + 1) * span]
+
+    def row_colors(self, row):
+        palette = self.palette
+        return [palette[cid] for cid in self.row_ids(row)]
+
+    def cells(self):
+        palette = self.palette
+        width = self.width
+        for i, cid in enumerate(self.data):
+            yield divmod(i, width), palette[cid]
+
+#Bulk operations ----------------------------------------------------------------------------------
+
+    def reset(self, width, height, color=DEFAULT_COLOR):
+        if width <= 0 or height <= 0:
+            raise ValueError("Pattern dimensions must be positive.")
+        cid = self.color_id(color)
+        self.width = width
+        self.height = height
+        self.data = bytearray([cid]) * (width * height)
+        self.counts = [0] * MAX_PALETTE_SIZE
+        self.counts[cid] = len(self.data)
+
+    def fill(self, color):
+        cid = self.color_id(color)
+        self.data = bytearray([cid]) * len(self.data)
+        self.counts = [0] * MAX_PALETTE_SIZE
+        self.counts[cid] = len(self.data)
+
+    def fill_rect(self, row1, col1, row2, col2, color):
+        """Fill the inclusive rectangle spanned by two corner cells."""
+        top, bottom = sorted((max(0, row1), min(self.height - 1, row2)))
+        left, right = sorted((max(0, col1), min(self.width - 1, col2)))
+        cid = self.color_id(color)
+        run = bytearray([cid]) * (right - left + 1)
+        self.count_ids(self.region_ids(top, left, bottom + 1, right + 1), -1)
+        self.counts[cid] += len(run) * (bottom - top + 1)
+        for row in range(top, bottom + 1):
+            start = row * self.width + left
+            self.data[start:start + len(run)] = run
+
+    def flood_fill(self, row, col, color, diagonal=False):
+        """Scanline fill of the region of same-colored cells around (row, col).
+
+        Regions are 4-connected, or 8-connected with ``diagonal``. Each span is found
+        and written as one slice. Returns the flat indices that changed; they all
+        held the starting cell's color id before.
+        """
+        width, height, data = self.width, self.height, self.data
+        target = data[row * width + col]
+        cid = self.color_id(color)
+        if target == cid:
+            return []
+        target_byte = bytes([target])
+
+        filled = []
+        stack = [(row, col)]
+        while stack:
+            row, col = stack.pop()
+            start = row * width
+            if data[start + col] != target:
+                continue
+            left = len(data[start:start + col].rstrip(target_byte))
+            right = width - len(data[start + col:start + width].lstrip(target_byte)) - 1
+            data[start + left:start + right + 1] = bytes([cid]) * (right - left + 1)
+            filled.extend(range(start + left, start + right + 1))
+
+            low, high = (max(0, left - 1), min(width - 1, right + 1)) if diagonal else (left, right)
+            for neighbor in (row - 1, row + 1):
+                if not 0 <= neighbor < height:
+                    continue
+                base = neighbor * width
+                segment = data[base + low:base + high + 1]
+                found = segment.find(target_byte)
+                while found != -1:
+                    stack.append((neighbor, low + found))
+                    run_end = len(segment) - len(segment[found:].lstrip(target_byte))
+                    found = segment.find(target_byte, run_end)
+        self.counts[target] -= len(filled)
+        self.counts[cid] += len(filled)
+        return filled
+
+    def replace_color(self, old_color, new_color):
+        """Recolor every cell of one color; returns the flat indices that changed.
+
+        The histogram says up front how many cells match. A few are located with
+        ``find``; when the color is common a 0/1 mask and ``compress`` list them
+        without a Python step per cell.
+        """
+        old_id = self.palette_index.get(old_color)
+        if old_id is None or not self.counts[old_id]:
+            return []
+        new_id = self.color_id(new_color)
+        if old_id == new_id:
+            return []
+        data = self.data
+        old_byte = bytes([old_id])
+        matches = self.counts[old_id]
+        if matches * 16 < len(data):
+            indices = []
+            i = data.find(old_byte)
+            while i != -1:
+                indices.append(i)
+                i = data.find(old_byte, i + 1)
+        else:
+            mask = bytearray(256)
+            mask[old_id] = 1
+            indices = list(compress(range(len(data)), data.translate(mask)))
+        table = bytearray(range(256))
+        table[old_id] = new_id
+        data[:] = data.translate(table)
+        self.counts[new_id] += matches
+        self.counts[old_id] = 0
+        return indices
+
+    def flip_horizontal(self):
+        width = self.width
+        reversed_data = self.data[::-1]
+        self.data = bytearray().join([reversed_data[start:start + width] for start in range(len(reversed_data) - width, -1, -width)])
+
+    def flip_vertical(self):
+        width = self.width
+        rows = [self.data[start:start + width] for start in range(0, len(self.data), width)]
+        rows.reverse()
+        self.data = bytearray().join(rows)
+
+    def rotate_clockwise(self):
+        width, data = self.width, self.data
+        self.data = bytearray().join([data[col::width][::-1] for col in range(width)])
+        self.width, self.height = self.height, width
+
+    def rotate_counterclockwise(self):
+        width, data = self.width, self.data
+        self.data = bytearray().join([data[col::width] for col in range(width - 1, -1, -1)])
+        self.width, self.height = self.height, width
+
+    def rotate_180(self):
+        self.data = self.data[::-1]
+
+    def shift(self, rows=0, cols=0):
+        """Cyclically shift the chart down by ``rows`` and right by ``cols`` (negative values go up/left)."""
+        width = self.width
+        data = self.data
+        rows %= self.height
+        cols %= width
+        if rows:
+            cut = len(data) - rows * width
+            data = data[cut:] + data[:cut]
+        if cols:
+            split = width - cols
+            parts = []
+            for start in range(0, len(data), width):
+                parts.append(data[start + split:start + width])
+                parts.append(data[start:start + split])
+            data = bytearray().join(parts)
+        self.data = bytearray(data)
+
+    def crop(self, top, left, bottom, right):
+        """Keep only the cells in [top, bottom) x [left, right)."""
+        if not (0 <= top < bottom <= self.height and 0 <= left < right <= self.width):
+            raise IndexError("Crop region out of range.")
+        self.data = bytearray(self.region_ids(top, left, bottom, right))
+        self.width, self.height = right - left, bottom - top
+        self.recount()
+
+    def tile(self, across, down, mirror=False):
+        """Repeat the whole chart ``across`` times horizontally and ``down`` times vertically.
+
+        With ``mirror`` every other repeat in a row is flipped horizontally and every
+        other row of repeats vertically, so neighbouring copies reflect each other.
+        The top-left copy is always the original.
+        """
+        if across <= 0 or down <= 0:
+            raise ValueError("Tile counts must be positive.")
+        width = self.width
+        data = self.data
+        rows = [data[start:start + width] for start in range(0, len(data), width)]
+        if mirror:
+            lines = [bytearray().join([row if copy % 2 == 0 else row[::-1] for copy in range(across)]) for row in rows]
+            flipped = bytearray().join(reversed(lines))
+            block = bytearray().join(lines)
+            self.data = bytearray().join([block if copy % 2 == 0 else flipped for copy in range(down)])
+        else:
+            self.data = bytearray().join([row * across for row in rows]) * down
+        self.width *= across
+        self.height *= down
+        self.counts = [n * across * down for n in self.counts]
+
+    def insert_rows(self, index, count=1, color=DEFAULT_COLOR):
+        if not 0 <= index <= self.height:
+            raise IndexError("Row index out of range.")
+        if count <= 0:
+            return
+        cid = self.color_id(color)
+        start = index * self.width
+        self.data[start:start] = bytearray([cid]) * (self.width * count)
+        self.counts[cid] += self.width * count
+        self.height += count
+
+    def remove_rows(self, index, count=1):
+        if self.height - count < 1:
+            raise ValueError("A pattern must keep at least one row.")
+        if not (0 <= index and index + count <= self.height):
+            raise IndexError("Row index out of range.")
+        start = index * self.width
+        self.count_ids(self.data[start:start + self.width * count], -1)
+        del self.data[start:start + self.width * count]
+        self.height -= count
+
+    def insert_columns(self, index, count=1, color=DEFAULT_COLOR):
+        if not 0 <= index <= self.width:
+            raise IndexError("Column index out of range.")
+        if count <= 0:
+            return
+        cid = self.color_id(color)
+        run = bytes([cid]) * count
+        self.counts[cid] += count * self.height
+        width = self.width
+        data = self.data
+        parts = []
+        for start in range(0, len(data), width):
+            parts.append(data[start:start + index])
+            parts.append(run)
+            parts.append(data[start + index:start + width])
+        self.data = bytearray().join(parts)
+        self.width += count
+
+    def remove_columns(self, index, count=1):
+        if self.width - count < 1:
+            raise ValueError("A pattern must keep at least one column.")
+        if not (0 <= index and index + count <= self.width):
+            raise IndexError("Column index out of range.")
+        self.count_ids(self.region_ids(0, index, self.height, index + count), -1)
+        width = self.width
+        data = self.data
+        parts = []
+        for start in range(0, len(data), width):
+            parts.append(data[start:start + index])
+            parts.append(data[start + index + count:start + width])
+        self.data = bytearray().join(parts)
+        self.width -= count
+
+    def insert_row(self, index, color=DEFAULT_COLOR):
+        self.insert_rows(index, 1, color)
+
+    def remove_row(self, index):
+        self.remove_rows(index, 1)
+
+    def insert_column(self, index, color=DEFAULT_COLOR):
+        self.insert_columns(index, 1, color)
+
+    def remove_column(self, index):
+        self.remove_columns(index, 1)
+
+#Snapshots and copies -----------------------------------------------------------------------------
+
+    def snapshot(self):
+        return (self.width, self.height, bytes(self.data))
+
+    def restore(self, snapshot):
+        self.width, self.height, data = snapshot
+        self.data = bytearray(data)
+        self.recount()
+
+    def copy(self):
+        other = Pattern.__new__(Pattern)
+        other.palette = list(self.palette)
+        other.palette_index = dict(self.palette_index)
+        other.width = self.width
+        other.height = self.height
+        other.data = bytearray(self.data)
+        other.counts = list(self.counts)
+        other.palette_generation = self.palette_generation
+        return other
+
+    def assign(self, other):
+        """Replace this pattern's contents with another's, keeping existing color ids.
+
+        Only the colors ``other`` actually uses are mapped; nothing changes if they don't fit.
+        """
+        used = [cid for cid in range(len(other.palette)) if other.counts[cid]]
+        table = bytearray(256)
+        for cid, new_id in zip(used, self.color_ids([other.palette[cid] for cid in used])):
+            table[cid] = new_id
+        self.width = other.width
+        self.height = other.height
+        self.data = bytearray(other.data.translate(table))
+        self.recount()
+
+#Serialization ------------------------------------------------------------------------------------
+
+    def to_dict(self):
+        return {
+            "width": self.width,
+            "height": self.height,
+            "cells": {f"{row},{col}": color for (row, col), color in self.cells()},
+        }
+
+    @classmethod
+    def from_dict(cls, pattern, default_width=32, default_height=18):
+        width = pattern.get("width", default_width)
+        height = pattern.get("height", default_height)
+        result = cls(width, height)
+        for key, color in pattern.get("cells", {}).items():
+            row, col = map(int, key.split(','))
+            if result.in_bounds(row, col):
+                result.set(row, col, color)
+        return result
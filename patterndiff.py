@@ -0,0 +1,213 @@
+import argparse
+import json
+import sys
+from operator import ne
+
+from fileformats import load_pattern_file, save_pattern_file
+from pattern import MAX_PALETTE_SIZE, Pattern
+
+# Comparing and merging charts by color rather than by palette id, since two
+# versions of a chart rarely share a palette. Both sides are translated into one
+# id space, whole rows are compared as bytes, and only rows that differ are
+# compared cell by cell. Changed cells are reported as rectangles by merging
+# identical column runs on consecutive rows.
+#
+#   python patterndiff.py diff old.json new.json [--offset 2,0]
+#   python patterndiff.py merge base.json ours.json theirs.json -o merged.json
+
+ABSENT = 0
+PROGRESS_ROWS = 64
+
+
+class SharedPalette:
+    """Maps colors of several patterns to one id space; id 0 stands for "no cell here"."""
+
+    def __init__(self):
+        self.colors = [None]
+        self.index = {}
+
+    def table(self, pattern):
+        """Translation table from the pattern's ids; ids no cell uses stay unmapped, so they don't take up room."""
+        ids = []
+        for i, color in enumerate(pattern.palette):
+            if not pattern.counts[i]:
+                ids.append(0)
+                continue
+            cid = self.index.get(color)
+            if cid is None:
+                if len(self.colors) >= MAX_PALETTE_SIZE:
+                    raise ValueError(f"The charts use more than {MAX_PALETTE_SIZE - 1} colors between them.")
+                cid = self.index[color] = len(self.colors)
+                self.colors.append(color)
+            ids.append(cid)
+        return bytes(ids).ljust(256, b"\0")
+
+
+def placed_rows(pattern, table, top, left, height, width):
+    """Rows of ``pattern`` in shared ids, placed at (top, left) inside a height x width frame of ABSENT."""
+    blank = bytes(width)
+    rows = []
+    for row in range(height):
+        source = row - top
+        if 0 <= source < pattern.height:
+            ids = pattern.row_ids(source).translate(table)
+            start, stop = max(0, left), min(width, left + pattern.width)
+            rows.append(blank[:start] + ids[start - left:stop - left] + blank[stop:])
+        else:
+            rows.append(blank)
+    return rows
+
+
+def changed_runs(mask):
+    """(start, stop) runs of nonzero bytes in a 0/1 mask row."""
+    runs = []
+    start = mask.find(1)
+    while start != -1:
+        stop = mask.find(0, start)
+        if stop == -1:
+            stop = len(mask)
+        runs.append((start, stop))
+        start = mask.find(1, stop)
+    return runs
+
+
+def rectangles(masks):
+    """Merge the changed runs of consecutive mask rows into (top, left, bottom, right) rectangles, ends exclusive."""
+    found = []
+    open_runs = {}
+    for row, mask in enumerate(masks):
+        runs = set(changed_runs(mask)) if mask is not None else set()
+        for run in list(open_runs):
+            if run not in runs:
+                found.append((open_runs.pop(run), run[0], row, run[1]))
+        for run in runs:
+            open_runs.setdefault(run, row)
+    for run, top in open_runs.items():
+        found.append((top, run[0], len(masks), run[1]))
+    return sorted(found)
+
+
+class Diff:
+    """Cells that differ between two charts, with ``new`` placed at ``offset`` (rows, cols) from ``old``.
+
+    Rectangles are in ``old``'s coordinates and may reach outside it where ``new``
+    is larger or shifted; cells present in only one chart count as changed.
+    ``progress``, if given, is called with the fraction of rows compared.
+    """
+
+    def __init__(self, old, new, offset=(0, 0), progress=None):
+        row_offset, col_offset = offset
+        self.top = min(0, row_offset)
+        self.left = min(0, col_offset)
+        height = max(old.height, row_offset + new.height) - self.top
+        width = max(old.width, col_offset + new.width) - self.left
+
+        palette = SharedPalette()
+        old_rows = placed_rows(old, palette.table(old), -self.top, -self.left, height, width)
+        new_rows = placed_rows(new, palette.table(new), row_offset - self.top, col_offset - self.left, height, width)
+
+        masks = []
+        self.changed = 0
+        for row, (old_row, new_row) in enumerate(zip(old_rows, new_rows)):
+            if progress is not None and row % PROGRESS_ROWS == 0:
+                progress(row / height)
+            if old_row == new_row:
+                masks.append(None)
+                continue
+            mask = bytes(map(ne, old_row, new_row))
+            self.changed += mask.count(1)
+            masks.append(mask)
+        self.rectangles = [(top + self.top, left + self.left, bottom + self.top, right + self.left)
+                           for top, left, bottom, right in rectangles(masks)]
+
+    def __bool__(self):
+        return bool(self.changed)
+
+
+def merge(base, ours, theirs, progress=None):
+    """Three-way merge of same-sized charts; returns ``(merged, conflicts)``.
+
+    A cell takes whichever side changed it. Where both sides changed it to
+    different colors ours is kept and the cell is reported in ``conflicts`` (as
+    rectangles, like Diff). ``progress`` is called as for Diff.
+    """
+    if not (base.width == ours.width == theirs.width and base.height == ours.height == theirs.height):
+        raise ValueError("Three-way merge needs three charts of the same size.")
+    width, height = base.width, base.height
+    palette = SharedPalette()
+    tables = [palette.table(pattern) for pattern in (base, ours, theirs)]
+
+    merged_ids = bytearray()
+    masks = []
+    for row in range(height):
+        if progress is not None and row % PROGRESS_ROWS == 0:
+            progress(row / height)
+        base_row, our_row, their_row = (pattern.row_ids(row).translate(table)
+                                        for pattern, table in zip((base, ours, theirs), tables))
+        if their_row == base_row or our_row == their_row:
+            merged_ids += our_row
+            masks.append(None)
+            continue
+        if our_row == base_row:
+            merged_ids += their_row
+            masks.append(None)
+            continue
+        mask = bytearray(width)
+        for col, (b, o, t) in enumerate(zip(base_row, our_row, their_row)):
+            if o == b:
+                o = t
+            elif t != b and t != o:
+                mask[col] = 1
+            merged_ids.append(o)
+        masks.append(bytes(mask) if 1 in mask else None)
+
+    merged = Pattern(width, height, palette.colors[merged_ids[0]])
+    table = bytes(merged.color_id(color) if color is not None else 0 for color in palette.colors).ljust(256, b"\0")
+    merged.put_region_ids(0, 0, height, width, bytes(merged_ids).translate(table))
+    return merged, rectangles(masks)
+
+#Command line -------------------------------------------------------------------------------------
+
+def parse_offset(text):
+    try:
+        rows, cols = (int(part) for part in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected ROWS,COLS, e.g. 2,-1")
+    return rows, cols
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare or merge knitting pattern files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    diff_parser = commands.add_parser("diff", help="list the rectangles of cells that differ")
+    diff_parser.add_argument("old")
+    diff_parser.add_argument("new")
+    diff_parser.add_argument("--offset", type=parse_offset, default=(0, 0), metavar="ROWS,COLS",
+                             help="where the new chart's top-left cell sits in the old one")
+    diff_parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    merge_parser = commands.add_parser("merge", help="three-way merge of two edited copies of a base chart")
+    merge_parser.add_argument("base")
+    merge_parser.add_argument("ours")
+    merge_parser.add_argument("theirs")
+    merge_parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        diff = Diff(load_pattern_file(args.old)[0], load_pattern_file(args.new)[0], args.offset)
+        if args.json:
+            print(json.dumps({"changed": diff.changed, "rectangles": diff.rectangles}))
+        else:
+            for top, left, bottom, right in diff.rectangles:
+                print(f"rows {top}-{bottom - 1}, cols {left}-{right - 1}")
+            print(f"{diff.changed} cells differ in {len(diff.rectangles)} regions")
+        return 1 if diff else 0
+
+    merged, conflicts = merge(*(load_pattern_file(path)[0] for path in (args.base, args.ours, args.theirs)))
+    save_pattern_file(args.output, merged)
+    for top, left, bottom, right in conflicts:
+        print(f"conflict: rows {top}-{bottom - 1}, cols {left}-{right - 1}", file=sys.stderr)
+    return 1 if conflicts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
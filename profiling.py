@@ -0,0 +1,42 @@
+import time
+from collections import deque
+from functools import wraps
+
+# Handler timing for the in-app profiler. Methods decorated with ``profiled``
+# report to their object's ``profiler`` only while it is enabled, so the
+# decorator costs one attribute check otherwise.
+
+
+class Profiler:
+    def __init__(self, samples=50):
+        self.samples = samples
+        self.enabled = False
+        self.timings = {}
+
+    def record(self, name, seconds):
+        timings = self.timings.get(name)
+        if timings is None:
+            timings = self.timings[name] = deque(maxlen=self.samples)
+        timings.append(seconds)
+
+    def clear(self):
+        self.timings.clear()
+
+    def summary(self):
+        """(name, last, mean, worst) in seconds over the recent samples, slowest mean first."""
+        rows = [(name, times[-1], sum(times) / len(times), max(times)) for name, times in self.timings.items()]
+        return sorted(rows, key=lambda row: -row[2])
+
+
+def profiled(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = self.profiler
+        if not profiler.enabled:
+            return method(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            profiler.record(method.__name__, time.perf_counter() - started)
+    return wrapper
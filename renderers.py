@@ -0,0 +1,497 @@
+import time
+import tkinter as tk
+
+
+class Renderer:
+    """Dirty-cell and viewport bookkeeping shared by the renderers.
+
+    Only the cells inside ``window`` (the visible area plus ``margin`` cells on
+    each side, as ``(top, left, bottom, right)`` with exclusive ends) have
+    anything on the canvas. Color changes are collected as flat cell indices and
+    flushed in one idle callback, which also catches up with any scrolling,
+    resizing or zooming since the last flush. Subclasses implement
+    ``sync_grid``, ``sync_window`` and ``paint``, and add to ``items_created``
+    whenever they create a canvas item; ``last_flush`` holds the duration and
+    item count of the latest flush for profiling.
+    """
+
+    margin = 4
+
+    def __init__(self, canvas, pattern, cell_size, outline="black", debug=False):
+        self.canvas = canvas
+        self.pattern = pattern
+        self.cell_size = cell_size
+        self.outline = outline
+        self.debug = debug
+
+        self.grid_width = 0
+        self.grid_height = 0
+        self.generation = 0
+        self.window = (0, 0, 0, 0)
+
+        self.dirty = set()
+        self.full_redraw = False
+        self.pending_flush = None
+        self.items_created = 0
+        self.last_flush = (0.0, 0)
+
+    def update_scrollregion(self):
+        self.canvas.config(scrollregion=(0, 0, self.grid_width * self.cell_size, self.grid_height * self.cell_size))
+
+#Viewport -----------------------------------------------------------------------------------------
+
+    def visible_window(self):
+        size = self.cell_size
+        x = self.canvas.canvasx(0)
+        y = self.canvas.canvasy(0)
+        top = max(0, int(y // size) - self.margin)
+        left = max(0, int(x // size) - self.margin)
+        bottom = min(self.grid_height, int((y + self.canvas.winfo_height()) // size) + 1 + self.margin)
+        right = min(self.grid_width, int((x + self.canvas.winfo_width()) // size) + 1 + self.margin)
+        if top >= bottom or left >= right:
+            return (0, 0, 0, 0)
+        return (top, left, bottom, right)
+
+    def viewport_changed(self, *args):
+        """Call after scrolling or resizing; the window is brought up to date on the next flush."""
+        self.schedule()
+
+#Dirty tracking -----------------------------------------------------------------------------------
+
+    def mark_dirty(self, cells):
+        width = self.pattern.width
+        self.dirty.update(row * width + col for row, col in cells)
+        self.schedule()
+
+    def mark_all_dirty(self):
+        self.full_redraw = True
+        self.schedule()
+
+    def schedule(self):
+        if self.pending_flush is None:
+            self.pending_flush = self.canvas.after_idle(self.flush)
+
+    def cancel(self):
+        if self.pending_flush is not None:
+            self.canvas.after_cancel(self.pending_flush)
+            self.pending_flush = None
+
+    def flush(self):
+        started = time.perf_counter()
+        created = self.items_created
+        self.cancel()
+        self.sync_grid()
+        self.sync_window()
+        if self.full_redraw:
+            self.paint(None)
+        elif self.dirty:
+            self.paint(self.dirty)
+        self.dirty.clear()
+        self.full_redraw = False
+        self.last_flush = (time.perf_counter() - started, self.items_created - created)
+
+
+class RectangleRenderer(Renderer):
+    """Draws a Pattern onto a canvas as one rectangle item per cell in the window.
+
+    Items are recycled as the window moves: cells that scroll out hand their item
+    to cells that scroll in, so the item count follows the window size rather
+    than the chart size. Zooming rescales the existing items in a single call.
+
+    ``items`` is the authoritative flat cell index -> item map for the window. It
+    is rebuilt whenever the window or the grid layout changes, and with ``debug``
+    enabled every lookup is checked against the canvas itself.
+    """
+
+    tag = "cell"
+
+    def __init__(self, canvas, pattern, cell_size, outline="black", debug=False):
+        super().__init__(canvas, pattern, cell_size, outline, debug)
+        self.items = {}
+
+#Layout -------------------------------------------------------------------------------------------
+
+    def sync_grid(self):
+        """Note a change of the pattern's dimensions; every windowed item is reassigned on the next sync."""
+        width, height = self.pattern.width, self.pattern.height
+        if (width, height) == (self.grid_width, self.grid_height):
+            return
+        self.grid_width, self.grid_height = width, height
+        self.generation += 1
+        self.window = None
+        self.full_redraw = True
+        self.update_scrollregion()
+
+    def sync_window(self):
+        """Give every cell in the visible window an item, reusing items from cells that left it."""
+        window = self.visible_window()
+        if window == self.window:
+            return
+
+        width = self.grid_width
+        top, left, bottom, right = window
+        kept = {}
+        spare = []
+        if self.window is not None:
+            for i, item in self.items.items():
+                row, col = divmod(i, width)
+                if top <= row < bottom and left <= col < right:
+                    kept[i] = item
+                else:
+                    spare.append(item)
+        else:
+            spare = list(self.items.values())
+
+        size = self.cell_size
+        data = self.pattern.data
+        palette = self.pattern.palette
+        for row in range(top, bottom):
+            for col in range(left, right):
+                i = row * width + col
+                if i in kept:
+                    continue
+                x1, y1 = col * size, row * size
+                if spare:
+                    item = spare.pop()
+                    self.canvas.coords(item, x1, y1, x1 + size, y1 + size)
+                    self.canvas.itemconfig(item, fill=palette[data[i]])
+                else:
+                    item = self.canvas.create_rectangle(x1, y1, x1 + size, y1 + size, outline=self.outline,
+                                                        fill=palette[data[i]], tags=self.tag)
+                    self.items_created += 1
+                kept[i] = item
+        if spare:
+            self.canvas.delete(*spare)
+        self.canvas.tag_lower(self.tag)
+
+        self.items = kept
+        self.window = window
+        if self.debug:
+            self.check_index()
+
+    def set_cell_size(self, cell_size):
+        if cell_size == self.cell_size:
+            return
+        factor = cell_size / self.cell_size
+        self.cell_size = cell_size
+        self.canvas.scale(self.tag, 0, 0, factor, factor)
+        self.update_scrollregion()
+        self.viewport_changed()
+
+    def clear(self):
+        """Delete every item this renderer created."""
+        self.cancel()
+        if self.items:
+            self.canvas.delete(*self.items.values())
+        self.items = {}
+        self.window = (0, 0, 0, 0)
+        self.grid_width = self.grid_height = 0
+        self.dirty.clear()
+
+#Item index ---------------------------------------------------------------------------------------
+
+    def item_at(self, row, col):
+        """The item showing a cell, or None when the cell is outside the window."""
+        item = self.items.get(row * self.grid_width + col)
+        if self.debug and item is not None:
+            self.check_item(item, row, col)
+        return item
+
+    def check_item(self, item, row, col):
+        size = self.cell_size
+        expected = [col * size, row * size, (col + 1) * size, (row + 1) * size]
+        actual = self.canvas.coords(item)
+        assert len(actual) == 4 and all(abs(a - e) < 0.5 for a, e in zip(actual, expected)), \
+            f"Canvas item {item} for cell ({row}, {col}) is at {actual}, expected {expected}"
+
+    def check_index(self):
+        top, left, bottom, right = self.window
+        assert len(self.items) == (bottom - top) * (right - left), "Item index does not cover the window"
+        assert set(self.canvas.find_withtag(self.tag)) == set(self.items.values()), "Item index is out of sync with the canvas"
+        for i, item in self.items.items():
+            self.check_item(item, *divmod(i, self.grid_width))
+
+#Drawing ------------------------------------------------------------------------------------------
+
+    def paint_cell(self, row, col, color):
+        """Show a color in one cell right away without touching the pattern, e.g. for previews."""
+        item = self.item_at(row, col)
+        if item is not None:
+            self.canvas.itemconfig(item, fill=color)
+
+    def paint(self, indices):
+        data = self.pattern.data
+        palette = self.pattern.palette
+        itemconfig = self.canvas.itemconfig
+        if indices is None:
+            for i, item in self.items.items():
+                itemconfig(item, fill=palette[data[i]])
+            return
+        items = self.items
+        for i in indices:
+            item = items.get(i)
+            if item is not None:
+                itemconfig(item, fill=palette[data[i]])
+
+
+class ImageRenderer(Renderer):
+    """Draws a Pattern as pixel blocks in a few photo images instead of one item per cell.
+
+    ``source`` holds one pixel per stitch and is updated with bulk ``put`` calls of
+    row strings, one per dirty row span; after a full redraw only the rows under
+    shown tiles are refreshed and the rest are left in ``stale_rows`` until they
+    scroll into view. Only tiles overlapping the window exist
+    on the canvas; each is ``tile_span`` stitches square (about ``tile_pixels``
+    wide at any zoom) and is filled from ``source`` with Tk's zooming ``copy``.
+    Tiles and their images are recycled as the window moves. Gridlines are plain
+    canvas lines over the window, kept above the tiles.
+    """
+
+    tag = "cell"
+    grid_tag = "gridline"
+    tile_pixels = 512
+
+    def __init__(self, canvas, pattern, cell_size, outline="black", debug=False):
+        super().__init__(canvas, pattern, cell_size, outline, debug)
+        self.source = None
+        self.tiles = {}
+        self.tile_window = None
+        self.stale_rows = set()
+        self.hex_colors = {}
+
+    @property
+    def tile_span(self):
+        return max(1, self.tile_pixels // self.cell_size)
+
+#Layout -------------------------------------------------------------------------------------------
+
+    def sync_grid(self):
+        """Recreate the source image when the pattern's dimensions change; tiles follow on the next sync."""
+        width, height = self.pattern.width, self.pattern.height
+        if (width, height) == (self.grid_width, self.grid_height):
+            return
+
+        self.grid_width, self.grid_height = width, height
+        self.generation += 1
+        self.source = tk.PhotoImage(master=self.canvas, width=width, height=height)
+        self.stale_rows = set(range(height))
+        self.window = None
+        self.tile_window = None
+        self.full_redraw = True
+        self.update_scrollregion()
+
+    def sync_window(self):
+        """Show a tile for every tile position overlapping the window, reusing tiles that left it."""
+        window = self.visible_window()
+        if window == self.window:
+            return
+        self.window = window
+        self.build_gridlines()
+
+        top, left, bottom, right = window
+        span = self.tile_span
+        tile_window = (top // span, left // span, -(-bottom // span), -(-right // span))
+        if tile_window == self.tile_window:
+            return
+
+        first_row, first_col, last_row, last_col = tile_window
+        self.refresh_rows(first_row * span, min(self.grid_height, last_row * span))
+        wanted = {(r, c) for r in range(first_row, last_row) for c in range(first_col, last_col)}
+        spare = [self.tiles.pop(key) for key in list(self.tiles) if key not in wanted]
+        size = self.cell_size
+        for key in wanted - self.tiles.keys():
+            tile_row, tile_col = key
+            if spare:
+                image, item = spare.pop()
+                image.blank()
+                self.canvas.coords(item, tile_col * span * size, tile_row * span * size)
+            else:
+                image = tk.PhotoImage(master=self.canvas, width=span * size, height=span * size)
+                item = self.canvas.create_image(tile_col * span * size, tile_row * span * size,
+                                                image=image, anchor="nw", tags=self.tag)
+                self.items_created += 1
+            self.tiles[key] = (image, item)
+            self.copy_tile(key)
+        for image, item in spare:
+            self.canvas.delete(item)
+
+        self.tile_window = tile_window
+        self.canvas.tag_lower(self.tag)
+
+    def build_gridlines(self):
+        self.canvas.delete(self.grid_tag)
+        top, left, bottom, right = self.window
+        size = self.cell_size
+        for col in range(left, right + 1):
+            self.canvas.create_line(col * size, top * size, col * size, bottom * size, fill=self.outline, tags=self.grid_tag)
+        for row in range(top, bottom + 1):
+            self.canvas.create_line(left * size, row * size, right * size, row * size, fill=self.outline, tags=self.grid_tag)
+        self.items_created += (right - left + 1) + (bottom - top + 1)
+        self.canvas.tag_lower(self.grid_tag)
+        self.canvas.tag_lower(self.tag)
+
+    def set_cell_size(self, cell_size):
+        if cell_size == self.cell_size:
+            return
+        self.cell_size = cell_size
+        self.canvas.delete(self.tag)
+        self.tiles = {}
+        self.window = None
+        self.tile_window = None
+        self.update_scrollregion()
+        self.viewport_changed()
+
+    def clear(self):
+        """Delete every item and image this renderer created."""
+        self.cancel()
+        self.canvas.delete(self.tag, self.grid_tag)
+        self.tiles = {}
+        self.source = None
+        self.stale_rows.clear()
+        self.window = (0, 0, 0, 0)
+        self.tile_window = None
+        self.grid_width = self.grid_height = 0
+        self.dirty.clear()
+
+#Drawing ------------------------------------------------------------------------------------------
+
+    def hex_color(self, color):
+        """Tk color name -> #rrggbb, so colors can be put into an image as plain list items."""
+        value = self.hex_colors.get(color)
+        if value is None:
+            r, g, b = self.canvas.winfo_rgb(color)
+            value = self.hex_colors[color] = f"#{r >> 8:02x}{g >> 8:02x}{b >> 8:02x}"
+        return value
+
+    def row_string(self, hexes, start, stop):
+        """One image row for the stitches in data[start:stop], as a Tk list of colors."""
+        return "{" + " ".join([hexes[cid] for cid in self.pattern.data[start:stop]]) + "}"
+
+    def refresh_rows(self, top, bottom):
+        """Bring stale source rows in [top, bottom) up to date, one put per run of consecutive rows."""
+        rows = [row for row in range(top, bottom) if row in self.stale_rows]
+        if not rows:
+            return
+        hexes = [self.hex_color(color) for color in self.pattern.palette]
+        width = self.grid_width
+        run = [rows[0]]
+        for row in rows[1:] + [None]:
+            if row is not None and row == run[-1] + 1:
+                run.append(row)
+                continue
+            strings = [self.row_string(hexes, r * width, (r + 1) * width) for r in run]
+            self.source.put(" ".join(strings), to=(0, run[0]))
+            if row is not None:
+                run = [row]
+        self.stale_rows.difference_update(rows)
+
+    def copy_tile(self, key):
+        span = self.tile_span
+        tile_row, tile_col = key
+        top, left = tile_row * span, tile_col * span
+        self.copy_region(top, left, min(self.grid_height, top + span), min(self.grid_width, left + span))
+
+    def copy_region(self, top, left, bottom, right):
+        """Scale source stitches [top, bottom) x [left, right) into every shown tile they overlap."""
+        size = self.cell_size
+        span = self.tile_span
+        for tile_row in range(top // span, (bottom - 1) // span + 1):
+            for tile_col in range(left // span, (right - 1) // span + 1):
+                tile = self.tiles.get((tile_row, tile_col))
+                if tile is None:
+                    continue
+                image = tile[0]
+                x1, y1 = max(left, tile_col * span), max(top, tile_row * span)
+                x2, y2 = min(right, (tile_col + 1) * span), min(bottom, (tile_row + 1) * span)
+                image.tk.call(image, "copy", self.source, "-from", x1, y1, x2, y2,
+                              "-to", (x1 - tile_col * span) * size, (y1 - tile_row * span) * size,
+                              "-zoom", size, size)
+
+    def paint_cell(self, row, col, color):
+        """Show a color in one cell right away without touching the pattern, e.g. for previews."""
+        span = self.tile_span
+        tile = self.tiles.get((row // span, col // span))
+        if tile is None:
+            return
+        size = self.cell_size
+        x, y = (col % span) * size, (row % span) * size
+        tile[0].put(self.hex_color(color), to=(x, y, x + size, y + size))
+
+    def paint(self, indices):
+        hexes = [self.hex_color(color) for color in self.pattern.palette]
+        width = self.grid_width
+        if indices is None:
+            self.stale_rows = set(range(self.grid_height))
+            if self.tile_window is not None:
+                span = self.tile_span
+                self.refresh_rows(self.tile_window[0] * span, min(self.grid_height, self.tile_window[2] * span))
+            for key in self.tiles:
+                self.copy_tile(key)
+            return
+
+        spans = {}
+        for i in indices:
+            row, col = divmod(i, width)
+            left, right = spans.get(row, (col, col))
+            spans[row] = (min(left, col), max(right, col))
+        for row, (left, right) in spans.items():
+            if row in self.stale_rows:
+                continue
+            self.source.put(self.row_string(hexes, row * width + left, row * width + right + 1), to=(left, row))
+            self.copy_region(row, left, row + 1, right + 1)
+
+
+class Overlay:
+    """Shapes drawn above the chart in cell units: selections, paste previews and highlights.
+
+    Each named shape is one canvas item that is moved with ``coords`` when it
+    changes, so a preview following the mouse never touches the cells beneath it.
+    Coordinates are kept in cells and re-placed when the zoom changes.
+    """
+
+    tag = "overlay"
+
+    def __init__(self, canvas, cell_size):
+        self.canvas = canvas
+        self.cell_size = cell_size
+        self.shapes = {}
+
+    def show(self, name, kind, points, **options):
+        size = self.cell_size
+        coords = [value * size for point in points for value in (point[1], point[0])]
+        shape = self.shapes.get(name)
+        if shape is None or shape[1] != kind:
+            self.remove(name)
+            create = self.canvas.create_rectangle if kind == "rectangle" else self.canvas.create_polygon
+            item = create(*coords, tags=self.tag, **options)
+        else:
+            item = shape[0]
+            self.canvas.coords(item, *coords)
+            if options:
+                self.canvas.itemconfig(item, **options)
+        self.canvas.tag_raise(item)
+        self.shapes[name] = (item, kind, points)
+
+    def rectangle(self, name, top, left, bottom, right, **options):
+        """Show a rectangle over [top, bottom) x [left, right)."""
+        self.show(name, "rectangle", [(top, left), (bottom, right)], **options)
+
+    def polygon(self, name, points, **options):
+        """Show a polygon through ``points`` given as (row, col) cell units; use +0.5 for cell centers."""
+        if len(points) < 2:
+            points = list(points) * 2
+        self.show(name, "polygon", list(points), **options)
+
+    def remove(self, name):
+        shape = self.shapes.pop(name, None)
+        if shape is not None:
+            self.canvas.delete(shape[0])
+
+    def clear(self):
+        self.canvas.delete(self.tag)
+        self.shapes.clear()
+
+    def set_cell_size(self, cell_size):
+        self.cell_size = cell_size
+        for item, kind, points in self.shapes.values():
+            self.canvas.coords(item, *[value * cell_size for point in points for value in (point[1], point[0])])
@@ -0,0 +1,170 @@
+from math import ceil, floor
+
+from pattern import DEFAULT_COLOR
+
+
+def line_cells(row1, col1, row2, col2):
+    """Cells on the line between two cells, both ends included (Bresenham)."""
+    d_row, d_col = abs(row2 - row1), abs(col2 - col1)
+    step_row = 1 if row2 >= row1 else -1
+    step_col = 1 if col2 >= col1 else -1
+    error = d_col - d_row
+    row, col = row1, col1
+    cells = [(row, col)]
+    while (row, col) != (row2, col2):
+        doubled = 2 * error
+        if doubled > -d_row:
+            error -= d_row
+            col += step_col
+        if doubled < d_col:
+            error += d_col
+            row += step_row
+        cells.append((row, col))
+    return cells
+
+
+class Selection:
+    """A set of cells given by a bounding box [top, bottom) x [left, right) and an optional mask.
+
+    ``mask`` has one byte per cell of the box, row-major, nonzero where the cell is
+    selected; None means the whole box is selected.
+    """
+
+    def __init__(self, top, left, bottom, right, mask=None):
+        self.top = top
+        self.left = left
+        self.bottom = bottom
+        self.right = right
+        self.mask = mask
+
+    @classmethod
+    def rectangle(cls, row1, col1, row2, col2, width, height):
+        """The inclusive rectangle spanned by two corner cells, clamped to a width x height grid."""
+        top, bottom = sorted((max(0, min(row1, height - 1)), max(0, min(row2, height - 1))))
+        left, right = sorted((max(0, min(col1, width - 1)), max(0, min(col2, width - 1))))
+        return cls(top, left, bottom + 1, right + 1)
+
+    @classmethod
+    def lasso(cls, points, width, height):
+        """Cells inside the closed path through ``points`` (cells as (row, col)), plus the path's edges.
+
+        Each row is filled between pairs of edge crossings (even-odd rule), sampling
+        the path at cell centers.
+        """
+        points = [(max(0, min(row, height - 1)), max(0, min(col, width - 1))) for row, col in points]
+        top = min(row for row, _ in points)
+        bottom = max(row for row, _ in points) + 1
+        left = min(col for _, col in points)
+        right = max(col for _, col in points) + 1
+        span = right - left
+        mask = bytearray(span * (bottom - top))
+
+        edges = list(zip(points, points[1:] + points[:1]))
+        for row in range(top, bottom):
+            crossings = sorted(
+                c1 + (row - r1) * (c2 - c1) / (r2 - r1)
+                for (r1, c1), (r2, c2) in edges
+                if r1 <= row < r2 or r2 <= row < r1
+            )
+            offset = (row - top) * span - left
+            for start, stop in zip(crossings[::2], crossings[1::2]):
+                first, last = max(left, ceil(start)), min(right - 1, floor(stop))
+                if first <= last:
+                    mask[offset + first:offset + last + 1] = b"\1" * (last - first + 1)
+        for (r1, c1), (r2, c2) in edges:
+            for row, col in line_cells(r1, c1, r2, c2):
+                mask[(row - top) * span + col - left] = 1
+        return cls(top, left, bottom, right, bytes(mask))
+
+    @property
+    def width(self):
+        return self.right - self.left
+
+    @property
+    def height(self):
+        return self.bottom - self.top
+
+    def __contains__(self, cell):
+        row, col = cell
+        if not (self.top <= row < self.bottom and self.left <= col < self.right):
+            return False
+        return self.mask is None or bool(self.mask[(row - self.top) * self.width + col - self.left])
+
+    def cells(self):
+        width = self.width
+        for row in range(self.top, self.bottom):
+            for col in range(self.left, self.right):
+                if self.mask is None or self.mask[(row - self.top) * width + col - self.left]:
+                    yield row, col
+
+    def fill(self, pattern, color=DEFAULT_COLOR, changes=None):
+        """Set every selected cell to ``color``, recording previous ids into ``changes``; returns the cells."""
+        cid = pattern.color_id(color)
+        data = pattern.data
+        touched = list(self.cells())
+        indices = [row * pattern.width + col for row, col in touched]
+        if changes is not None:
+            for i in indices:
+                changes.setdefault(i, data[i])
+        pattern.put_ids(indices, bytes([cid]) * len(indices))
+        return touched
+
+
+class Clip:
+    """A copied region: its color ids as one row-major slice, the colors they name, and an optional mask.
+
+    Only the colors the region uses travel with the clip, renumbered from 0, so it
+    can be pasted into a pattern with a different palette.
+    """
+
+    def __init__(self, width, height, colors, ids, mask=None):
+        self.width = width
+        self.height = height
+        self.colors = colors
+        self.ids = ids
+        self.mask = mask
+
+    @classmethod
+    def from_selection(cls, pattern, selection):
+        ids = pattern.region_ids(selection.top, selection.left, selection.bottom, selection.right)
+        used = sorted(set(ids))
+        table = bytearray(256)
+        for new_id, cid in enumerate(used):
+            table[cid] = new_id
+        colors = [pattern.palette[cid] for cid in used]
+        return cls(selection.width, selection.height, colors, ids.translate(table), selection.mask)
+
+    def paste(self, pattern, top, left, changes=None):
+        """Write the clip with its top-left corner at (top, left), clipped to the pattern.
+
+        Previous ids of the written cells are recorded into ``changes`` (a flat index ->
+        id map, as used by CellEdit.from_changes). Returns the cells written.
+        """
+        table = bytes(pattern.color_ids(self.colors)).ljust(256, b"\0")
+        ids = self.ids.translate(table)
+        first_row, last_row = max(0, top), min(pattern.height, top + self.height)
+        first_col, last_col = max(0, left), min(pattern.width, left + self.width)
+        if first_row >= last_row or first_col >= last_col:
+            return []
+
+        data = pattern.data
+        width = pattern.width
+        touched = []
+        indices = []
+        values = bytearray()
+        for row in range(first_row, last_row):
+            source = (row - top) * self.width - left
+            start = row * width
+            for col in range(first_col, last_col):
+                if self.mask is not None and not self.mask[source + col]:
+                    continue
+                if changes is not None:
+                    changes.setdefault(start + col, data[start + col])
+                touched.append((row, col))
+                indices.append(start + col)
+                values.append(ids[source + col])
+        if self.mask is None:
+            pattern.put_region_ids(first_row, first_col, last_row, last_col, bytes(values))
+        else:
+            pattern.put_ids(indices, values)
+        return touched
@@ -0,0 +1,71 @@
+from math import cos, pi, sin
+
+MODES = ("none", "vertical", "horizontal", "both", "rotational")
+
+
+class Symmetry:
+    """Where a painted cell is repeated: across a vertical and/or horizontal axis, or N-fold around a center.
+
+    ``center`` is given in doubled cell coordinates, so (2 * row, 2 * col) is the
+    middle of a cell and odd values fall on grid lines; None means the middle of
+    the chart. Doubling keeps mirror images exact integer arithmetic.
+    """
+
+    def __init__(self, mode="none", folds=4, center=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown symmetry mode: {mode}")
+        self.mode = mode
+        self.folds = folds
+        self.center = center
+
+    def doubled_center(self, width, height):
+        if self.center is None:
+            return height - 1, width - 1
+        return self.center
+
+    def maps(self, width, height):
+        """Functions taking a (row, col) to each of its images, identity first."""
+        rows2, cols2 = self.doubled_center(width, height)
+        maps = [lambda row, col: (row, col)]
+        if self.mode in ("vertical", "both"):
+            maps.append(lambda row, col: (row, cols2 - col))
+        if self.mode in ("horizontal", "both"):
+            maps.append(lambda row, col: (rows2 - row, col))
+        if self.mode == "both":
+            maps.append(lambda row, col: (rows2 - row, cols2 - col))
+        if self.mode == "rotational":
+            for k in range(1, self.folds):
+                maps.append(self.rotation(2 * pi * k / self.folds, rows2 / 2, cols2 / 2))
+        return maps
+
+    @staticmethod
+    def rotation(angle, center_row, center_col):
+        c, s = round(cos(angle), 12), round(sin(angle), 12)
+
+        def rotate(row, col):
+            d_row, d_col = row - center_row, col - center_col
+            return (round(center_row + d_col * s + d_row * c), round(center_col + d_col * c - d_row * s))
+        return rotate
+
+    def segments(self, start, end, width, height):
+        """The images of the segment from ``start`` to ``end`` (None for a single cell) as endpoint pairs."""
+        if self.mode == "none":
+            return [(start, end)]
+        maps = self.maps(width, height)
+        if start is None:
+            return [(None, f(*end)) for f in maps]
+        return [(f(*start), f(*end)) for f in maps]
+
+    def guides(self, width, height):
+        """Overlay lines as ((row1, col1), (row2, col2)) in cell units: the mirror axes, or a cross at the center."""
+        rows2, cols2 = self.doubled_center(width, height)
+        middle_row, middle_col = rows2 / 2 + 0.5, cols2 / 2 + 0.5
+        lines = []
+        if self.mode in ("vertical", "both"):
+            lines.append(((0, middle_col), (height, middle_col)))
+        if self.mode in ("horizontal", "both"):
+            lines.append(((middle_row, 0), (middle_row, width)))
+        if self.mode == "rotational":
+            lines.append(((middle_row - 1, middle_col), (middle_row + 1, middle_col)))
+            lines.append(((middle_row, middle_col - 1), (middle_row, middle_col + 1)))
+        return lines
@@ -0,0 +1,125 @@
+import queue
+import threading
+from collections import deque
+
+# Background work for the editor. A task's work function runs on a worker
+# thread, on copies of whatever model state it needs, and its result comes back
+# through a queue the Tk thread polls with ``after``, so callbacks always run on
+# the Tk thread. Tasks run one at a time in the order they were started, which
+# keeps e.g. a save queued behind a load from racing it.
+#
+# Cancellation is cooperative: work functions get a ``progress(fraction)``
+# callback that raises Cancelled once their task is cancelled. Work that never
+# reports progress runs to the end, but a cancelled task's result is dropped.
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Task:
+    def __init__(self, title, work, on_done, on_error=None, on_cancel=None, cancellable=True):
+        self.title = title
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.cancellable = cancellable
+        self.cancelled = threading.Event()
+        self.progress = None
+
+    def cancel(self):
+        if self.cancellable:
+            self.cancelled.set()
+
+
+class TaskScheduler:
+    """Runs tasks on a worker thread and reports them through ``on_change(task)``.
+
+    ``on_change`` is called on the Tk thread whenever the running task starts,
+    reports progress or finishes; it gets None once nothing is left to run.
+    """
+
+    def __init__(self, master, on_change=None, interval=50):
+        self.master = master
+        self.on_change = on_change
+        self.interval = interval
+        self.pending = deque()
+        self.current = None
+        self.messages = queue.Queue()
+
+    @property
+    def busy(self):
+        return self.current is not None
+
+    def run(self, title, work, on_done, on_error=None, on_cancel=None, cancellable=True):
+        """Queue ``work(progress)``; ``on_done(result)`` or ``on_error(exception)`` is called when it ends."""
+        task = Task(title, work, on_done, on_error, on_cancel, cancellable)
+        self.pending.append(task)
+        if self.current is None:
+            self.start_next()
+        else:
+            self.changed()
+        return task
+
+    def cancel(self, task):
+        if task in self.pending:
+            self.pending.remove(task)
+            if task.on_cancel is not None:
+                task.on_cancel()
+            self.changed()
+        else:
+            task.cancel()
+
+    def changed(self):
+        if self.on_change is not None:
+            self.on_change(self.current)
+
+    def start_next(self):
+        self.current = self.pending.popleft() if self.pending else None
+        self.changed()
+        if self.current is not None:
+            threading.Thread(target=self.execute, args=(self.current,), daemon=True).start()
+            self.master.after(self.interval, self.poll)
+
+    def execute(self, task):
+        """Worker thread: run the task and queue its progress and outcome."""
+        def progress(done):
+            if task.cancelled.is_set():
+                raise Cancelled
+            self.messages.put((task, "progress", done))
+
+        try:
+            result = task.work(progress)
+        except Cancelled:
+            self.messages.put((task, "cancelled", None))
+        except Exception as e:
+            self.messages.put((task, "error", e))
+        else:
+            self.messages.put((task, "done", result))
+
+    def poll(self):
+        while True:
+            try:
+                task, kind, value = self.messages.get_nowait()
+            except queue.Empty:
+                self.master.after(self.interval, self.poll)
+                return
+            if kind != "progress":
+                break
+            task.progress = value
+            self.changed()
+
+        if kind == "done" and task.cancelled.is_set():
+            kind = "cancelled"
+        try:
+            if kind == "done":
+                task.on_done(value)
+            elif kind == "error":
+                if task.on_error is None:
+                    raise value
+                task.on_error(value)
+            elif task.on_cancel is not None:
+                task.on_cancel()
+        finally:
+            self.start_next()
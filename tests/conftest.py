@@ -0,0 +1,27 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pattern import Pattern  # noqa: E402
+
+COLORS = ["white", "black", "#aa0000", "#00aa00", "#0000aa"]
+
+
+def rows_of(pattern):
+    """The chart as a list of rows of color names, for comparing charts whatever their ids."""
+    return [pattern.row_colors(row) for row in range(pattern.height)]
+
+
+@pytest.fixture
+def chart():
+    """A 7x5 chart with a few colors scattered over it."""
+    rng = random.Random(7)
+    pattern = Pattern(7, 5)
+    for row in range(pattern.height):
+        for col in range(pattern.width):
+            pattern.set(row, col, rng.choice(COLORS))
+    return pattern
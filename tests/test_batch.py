@@ -0,0 +1,103 @@
+import argparse
+import os
+
+import pytest
+
+import batch
+from conftest import rows_of
+from fileformats import load_pattern_file, save_pattern_file
+from pattern import YARN_PER_STITCH_CM
+
+
+def write_charts(chart, *paths):
+    for path in paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_pattern_file(str(path), chart)
+
+
+def options(output_dir, **overrides):
+    values = {"output_dir": str(output_dir), "format": "knit", "flip": None, "tile": None, "recolor": [],
+              "png": None, "report": False, "yarn_per_stitch": YARN_PER_STITCH_CM, "max_cells": 4096 * 4096}
+    values.update(overrides)
+    return values
+
+
+def test_find_patterns_searches_directories(tmp_path, chart):
+    write_charts(chart, tmp_path / "b.json", tmp_path / "sub" / "a.knit", tmp_path / "notes.txt")
+    found = batch.find_patterns([str(tmp_path), str(tmp_path / "notes.txt")])
+    assert found == [(str(tmp_path / "b.json"), "b.json"),
+                     (str(tmp_path / "sub" / "a.knit"), os.path.join("sub", "a.knit")),
+                     (str(tmp_path / "notes.txt"), "notes.txt")]
+
+
+def test_find_patterns_picks_up_every_loadable_format(tmp_path, chart):
+    write_charts(chart, tmp_path / "a.kmb", tmp_path / "b.csv", tmp_path / "c.png")
+    found = batch.find_patterns([str(tmp_path)])
+    assert [name for _, name in found] == ["a.kmb", "b.csv"]
+
+
+def test_outputs_keep_paths_relative_to_the_input_directory(tmp_path, chart):
+    library = tmp_path / "library"
+    write_charts(chart, library / "a" / "front.json", library / "b" / "front.json")
+    plans, errors = batch.plan_outputs(batch.find_patterns([str(library)]), options(tmp_path / "out", png=2))
+    assert errors == []
+    assert plans[str(library / "a" / "front.json")] == [str(tmp_path / "out" / "a" / "front.knit"),
+                                                         str(tmp_path / "out" / "a" / "front.png")]
+    assert plans[str(library / "b" / "front.json")][0] == str(tmp_path / "out" / "b" / "front.knit")
+
+
+def test_inputs_are_never_overwritten(tmp_path, chart):
+    write_charts(chart, tmp_path / "front.knit")
+    plans, errors = batch.plan_outputs(batch.find_patterns([str(tmp_path)]), options(tmp_path))
+    assert plans == {} and "refusing to overwrite" in str(errors[0][1])
+
+
+def test_clashing_outputs_are_reported(tmp_path, chart):
+    write_charts(chart, tmp_path / "one" / "front.json", tmp_path / "two" / "front.json")
+    files = batch.find_patterns([str(tmp_path / "one"), str(tmp_path / "two")])
+    plans, errors = batch.plan_outputs(files, options(tmp_path / "out"))
+    assert list(plans) == [str(tmp_path / "one" / "front.json")]
+    assert [path for path, _ in errors] == [str(tmp_path / "two" / "front.json")]
+
+
+def test_main_converts_and_transforms(tmp_path, chart):
+    write_charts(chart, tmp_path / "in" / "sub" / "front.json")
+    out = tmp_path / "out" / "sub"
+    assert batch.main([str(tmp_path / "in"), "-o", str(out.parent), "--format", "knit", "--flip", "vertical",
+                       "--tile", "2x1", "--recolor", "black=red", "--png", "2",
+                       "--report", str(tmp_path / "counts.csv"), "-j", "1", "--max-memory", "0"]) == 0
+    converted, _ = load_pattern_file(str(out / "front.knit"))
+    expected = [[("red" if color == "black" else color) for color in row * 2] for row in rows_of(chart)[::-1]]
+    assert rows_of(converted) == expected
+    assert (out / "front.png").read_bytes().startswith(b"\x89PNG")
+    with open(tmp_path / "counts.csv") as report:
+        lines = report.read().splitlines()
+    assert lines[0] == "file,width,height,color,stitches,yarn_m"
+    assert len(lines) == 1 + len(converted.color_counts())
+
+
+def test_oversized_and_broken_files_fail_without_stopping_the_batch(tmp_path, chart):
+    write_charts(chart, tmp_path / "in" / "good.json")
+    (tmp_path / "in" / "bad.json").write_text("{not json")
+    assert batch.main([str(tmp_path / "in"), "-o", str(tmp_path / "out"), "--format", "json", "-j", "1"]) == 1
+    assert (tmp_path / "out" / "good.json").exists()
+    assert batch.main([str(tmp_path / "in" / "good.json"), "-o", str(tmp_path / "out"), "--max-cells", "10",
+                       "-j", "1"]) == 1
+    assert batch.main([str(tmp_path / "in" / "good.json"), "-o", str(tmp_path / "in"), "--format", "json",
+                       "-j", "1"]) == 1
+
+
+def test_argument_parsing():
+    assert batch.parse_tile("3X2") == (3, 2)
+    assert batch.parse_recolor("white=#F0B884") == ("white", "#F0B884")
+    for bad in ("3", "0x2", "axb"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            batch.parse_tile(bad)
+    with pytest.raises(argparse.ArgumentTypeError):
+        batch.parse_recolor("white")
+
+
+def test_list_formats(capsys):
+    assert batch.main(["--list-formats"]) == 0
+    listed = {line.split()[0]: line.split()[2] for line in capsys.readouterr().out.splitlines()}
+    assert listed["machine"] == "load/save" and listed["chart"] == "save"
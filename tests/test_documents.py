@@ -0,0 +1,30 @@
+import os
+
+from conftest import rows_of
+from documents import Document
+from history import History
+from journal import Journal
+import transforms
+
+
+def test_lazy_document_loads_on_demand(tmp_path, chart):
+    journal = Journal(str(tmp_path / "doc.journal"), batch_delay=0)
+    document = Document("front.json", History(), journal, loader=lambda: (chart, "red"), path="charts/front.json")
+    assert not document.loaded and document.instructions is None
+    document.finish_load(document.loader())
+    assert document.loaded and document.loader is None
+    assert document.selected_color == "red" and rows_of(document.pattern) == rows_of(chart)
+    document.close()
+    assert not os.path.exists(journal.path)
+
+
+def test_background_documents_pack_their_history(tmp_path, chart):
+    document = Document("Untitled 1", History(), Journal(str(tmp_path / "doc.journal"), batch_delay=0), chart)
+    document.history.push(transforms.flip_vertical())
+    document.suspend((0.25, 0.5))
+    assert document.history.packed and document.view == (0.25, 0.5)
+    document.resume()
+    assert not document.history.packed
+    document.rename(os.path.join("charts", "back.knit"))
+    assert document.title == "back.knit"
+    document.close()
@@ -0,0 +1,62 @@
+import pytest
+
+from conftest import rows_of
+from fileformats import FORMATS, format_for_path, formats, load_pattern_file, register_format, save_pattern_file
+from pattern import Pattern
+
+
+@pytest.mark.parametrize("extension", [".json", ".knit", ".kmb", ".csv"])
+def test_round_trip(tmp_path, chart, extension):
+    path = str(tmp_path / ("chart" + extension))
+    save_pattern_file(path, chart, "#0000aa")
+    loaded, _ = load_pattern_file(path)
+    assert (loaded.width, loaded.height) == (chart.width, chart.height)
+    assert rows_of(loaded) == rows_of(chart)
+
+
+@pytest.mark.parametrize("extension", [".json", ".knit"])
+def test_selected_color_is_kept(tmp_path, chart, extension):
+    path = str(tmp_path / ("chart" + extension))
+    save_pattern_file(path, chart, "#0000aa")
+    assert load_pattern_file(path)[1] == "#0000aa"
+
+
+def test_knit_files_are_recognized_by_content(tmp_path, chart):
+    path = tmp_path / "chart.knit"
+    save_pattern_file(str(path), chart)
+    renamed = path.rename(tmp_path / "chart.json")
+    assert rows_of(load_pattern_file(str(renamed))[0]) == rows_of(chart)
+
+
+def test_truncated_knit_file_is_rejected(tmp_path):
+    path = tmp_path / "chart.knit"
+    save_pattern_file(str(path), Pattern(20, 20))
+    path.write_bytes(path.read_bytes()[:-10])
+    with pytest.raises(ValueError):
+        load_pattern_file(str(path))
+
+
+def test_unknown_extensions_save_as_json(tmp_path, chart):
+    path = str(tmp_path / "chart.pattern")
+    save_pattern_file(path, chart)
+    assert format_for_path(path) is None
+    assert rows_of(load_pattern_file(path)[0]) == rows_of(chart)
+
+
+def test_export_only_formats_refuse_to_load(tmp_path, chart):
+    path = str(tmp_path / "chart.png")
+    save_pattern_file(path, chart)
+    assert (tmp_path / "chart.png").read_bytes().startswith(b"\x89PNG")
+    with pytest.raises(ValueError):
+        load_pattern_file(path)
+
+
+def test_registered_formats_are_used_by_extension(tmp_path, chart):
+    saved = []
+    register_format("test", ".tst", "Test charts", save=lambda path, pattern, color: saved.append(path))
+    try:
+        assert FORMATS["test"] in formats(can_save=True) and FORMATS["test"] not in formats(can_load=True)
+        save_pattern_file(str(tmp_path / "chart.TST"), chart)
+        assert saved == [str(tmp_path / "chart.TST")]
+    finally:
+        del FORMATS["test"]
@@ -0,0 +1,78 @@
+import pytest
+
+import generators
+from pattern import Pattern
+from selection import Clip
+
+
+def clip_rows(clip):
+    return [[clip.colors[cid] for cid in clip.ids[row * clip.width:(row + 1) * clip.width]] for row in range(clip.height)]
+
+
+@pytest.fixture
+def motif():
+    """A 2x2 motif: red top-left, white elsewhere."""
+    return Clip(2, 2, ["white", "red"], bytes([1, 0, 0, 0]))
+
+
+def test_straight_repeat_with_offsets(motif):
+    clip = generators.repeat(motif, 5, 3, row_offset=1, col_offset=1)
+    assert clip_rows(clip) == [["white"] * 5,
+                               ["white", "red", "white", "red", "white"],
+                               ["white"] * 5]
+
+
+def test_half_drop_and_half_brick(motif):
+    dropped = generators.repeat(motif, 4, 2, drop=1)
+    assert clip_rows(dropped) == [["red", "white", "white", "white"], ["white", "white", "red", "white"]]
+    bricked = generators.repeat(motif, 4, 4, brick=1)
+    assert [row.index("red") for row in clip_rows(bricked)[::2]] == [0, 1]
+    with pytest.raises(ValueError):
+        generators.repeat(motif, 4, 4, drop=1, brick=1)
+
+
+def test_fair_isle_bands_use_two_colors_per_row():
+    clip = generators.fair_isle(12, 20, ["peerie", "checks"], ["red", "blue"], background="white", gap=1)
+    rows = clip_rows(clip)
+    assert rows[0] == ["white"] * 12
+    assert all(len(set(row)) <= 2 for row in rows)
+    assert set(rows[3]) == {"white", "red"} and set(rows[7]) == {"white", "blue"}
+
+
+def test_fair_isle_rejects_unknown_bands():
+    with pytest.raises(ValueError):
+        generators.fair_isle(10, 10, ["paisley"], ["red"])
+
+
+@pytest.mark.parametrize("dither", generators.DITHERS)
+def test_gradient_goes_from_first_to_last_color(dither):
+    clip = generators.gradient(8, 32, ["white", "black"], "vertical", dither)
+    rows = clip_rows(clip)
+    assert rows[0] == ["white"] * 8 and rows[-1] == ["black"] * 8
+    darkness = [row.count("black") for row in rows]
+    assert sum(darkness[:16]) < sum(darkness[16:]) and darkness[8] <= darkness[24]
+
+
+def test_horizontal_gradient_runs_left_to_right():
+    rows = clip_rows(generators.gradient(16, 4, ["red", "green", "blue"], "horizontal", "none"))
+    assert rows[0][0] == "red" and rows[0][8] == "green" and rows[0][-1] == "blue"
+
+
+def test_text_is_centered_in_the_block():
+    clip = generators.text("I", 9, 9, "black", "white")
+    rows = clip_rows(clip)
+    assert rows[0] == rows[8] == ["white"] * 9
+    assert rows[1] == ["white"] * 3 + ["black"] * 3 + ["white"] * 3
+    assert [row[4] for row in rows[1:8]] == ["black"] * 7
+
+
+def test_scaled_text_is_clipped_to_the_block():
+    clip = generators.text("HI", 6, 10, scale=2)
+    assert (clip.width, clip.height) == (6, 10)
+    assert "black" in clip.colors
+
+
+def test_generated_clips_paste_into_any_palette(motif):
+    pattern = Pattern(4, 4, "#123456")
+    generators.repeat(motif, 4, 4).paste(pattern, 0, 0)
+    assert pattern.color_counts() == {"red": 4, "white": 12}
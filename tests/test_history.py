@@ -0,0 +1,133 @@
+from conftest import rows_of
+from history import CellEdit, GridEdit, History, RegionEdit, region_cells
+from pattern import Pattern
+
+
+def paint(pattern, history, cells, color):
+    """Paint cells as one stroke and push it the way the app does."""
+    changes = {}
+    for row, col in cells:
+        i = pattern.index(row, col)
+        changes.setdefault(i, pattern.data[i])
+        pattern.set(row, col, color)
+    history.push(CellEdit.from_changes(pattern, changes))
+
+
+def test_undo_and_redo_walk_the_history(chart):
+    history = History()
+    states = [rows_of(chart)]
+    paint(chart, history, [(0, 0), (0, 1)], "red")
+    states.append(rows_of(chart))
+    edit = GridEdit([("flip_vertical", ())], [("flip_vertical", ())])
+    edit.redo(chart)
+    history.push(edit)
+    states.append(rows_of(chart))
+    paint(chart, history, [(4, 6), (3, 6), (4, 6)], "blue")
+    states.append(rows_of(chart))
+    region = RegionEdit(1, 1, 3, 4, chart.region_ids(1, 1, 3, 4), bytes([chart.color_id("green")]) * 6)
+    region.redo(chart)
+    history.push(region)
+    states.append(rows_of(chart))
+
+    for state in reversed(states[:-1]):
+        history.undo(chart)
+        assert rows_of(chart) == state
+    assert not history.can_undo()
+    for state in states[1:]:
+        history.redo(chart)
+        assert rows_of(chart) == state
+    assert not history.can_redo()
+
+
+def test_undo_returns_the_cells_to_redraw():
+    pattern = Pattern(4, 3)
+    history = History()
+    paint(pattern, history, [(1, 2), (2, 0)], "red")
+    assert sorted(history.undo(pattern)) == [(1, 2), (2, 0)]
+    assert history.undo(pattern) == []
+
+
+def test_push_after_undo_drops_the_redo_branch():
+    pattern = Pattern(4, 1)
+    history = History()
+    paint(pattern, history, [(0, 0)], "red")
+    paint(pattern, history, [(0, 1)], "red")
+    history.undo(pattern)
+    paint(pattern, history, [(0, 2)], "blue")
+    assert len(history.entries) == 2 and not history.can_redo()
+    assert history.memory_used == sum(edit.size() for edit in history.entries)
+
+
+def test_unchanged_strokes_are_not_recorded():
+    pattern = Pattern(2, 1)
+    history = History()
+    paint(pattern, history, [(0, 0)], "white")
+    assert not history.can_undo()
+
+
+def test_eviction_keeps_the_newest_edits_within_budget():
+    pattern = Pattern(10, 10)
+    history = History(memory_budget=700)
+    for i in range(20):
+        paint(pattern, history, [(i // 10, i % 10)], "red")
+    assert history.memory_used <= history.memory_budget
+    assert 1 < len(history.entries) < 20
+    while history.can_undo():
+        history.undo(pattern)
+    kept = len(history.entries)
+    assert sum(row.count("red") for row in rows_of(pattern)) == 20 - kept
+
+
+def test_saved_position_follows_undo_and_redo():
+    pattern = Pattern(4, 1)
+    history = History()
+    assert not history.is_modified()
+    paint(pattern, history, [(0, 0)], "red")
+    history.mark_saved()
+    paint(pattern, history, [(0, 1)], "red")
+    assert history.is_modified()
+    history.undo(pattern)
+    assert not history.is_modified()
+    history.undo(pattern)
+    assert history.is_modified()
+    paint(pattern, history, [(0, 2)], "blue")
+    history.undo(pattern)
+    history.redo(pattern)
+    assert history.saved_position is None and history.is_modified()
+
+
+def test_saved_position_survives_eviction():
+    pattern = Pattern(10, 10)
+    history = History(memory_budget=700)
+    paint(pattern, history, [(0, 0)], "red")
+    history.mark_saved()
+    for i in range(1, 20):
+        paint(pattern, history, [(i // 10, i % 10)], "red")
+    assert history.saved_position is None
+    history.mark_saved()
+    paint(pattern, history, [(9, 9)], "blue")
+    history.undo(pattern)
+    assert not history.is_modified()
+
+
+def test_packed_history_still_undoes(chart):
+    history = History()
+    before = rows_of(chart)
+    paint(chart, history, [(0, 0), (1, 1)], "red")
+    paint(chart, history, [(2, 2)], "blue")
+    ids = history.referenced_ids()
+    assert {chart.color_id("red"), chart.color_id("blue")} <= ids
+    history.pack()
+    assert history.referenced_ids() == ids
+    assert history.packed and len(history.entries) == 2
+    history.unpack()
+    history.undo(chart)
+    history.undo(chart)
+    assert rows_of(chart) == before
+
+
+def test_region_edits_redraw_only_their_rectangle(chart):
+    edit = RegionEdit(0, 0, 2, 2, chart.region_ids(0, 0, 2, 2), bytes(4))
+    assert sorted(edit.redo(chart)) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    assert region_cells(chart, 0, 0, chart.height, chart.width) is None
+    assert len(RegionEdit(0, 0, 1, 1, b"\1", b"\1")) == 0
@@ -0,0 +1,145 @@
+import struct
+import zlib
+
+import pytest
+
+from conftest import rows_of
+from imaging import (PNG_SIGNATURE, PngReader, color_rgb, import_image, median_cut, open_image, rgb_hex,
+                     write_chunk, write_png)
+from pattern import Pattern
+from tasks import Cancelled
+
+
+def read_rgb(path):
+    image = open_image(path)
+    return image, [bytes(image.rgb(line)) for line in image.rows()]
+
+
+def pixel(rows, x, y):
+    return tuple(rows[y][3 * x:3 * x + 3])
+
+
+def paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    return a if pa <= pb and pa <= pc else b if pb <= pc else c
+
+
+def write_filtered_png(path, width, rows, color_type, bpp):
+    """A PNG whose scanlines cycle through all five filter types."""
+    raw = bytearray()
+    previous = bytes(len(rows[0]))
+    for y, row in enumerate(rows):
+        kind = y % 5
+        raw.append(kind)
+        for i, value in enumerate(row):
+            a = row[i - bpp] if i >= bpp else 0
+            b = previous[i]
+            c = previous[i - bpp] if i >= bpp else 0
+            raw.append((value - [0, a, b, (a + b) >> 1, paeth(a, b, c)][kind]) & 255)
+        previous = row
+    with open(path, 'wb') as file:
+        file.write(PNG_SIGNATURE)
+        write_chunk(file, b"IHDR", struct.pack(">IIBBBBB", width, len(rows), 8, color_type, 0, 0, 0))
+        data = zlib.compress(bytes(raw))
+        for start in range(0, len(data), 50):
+            write_chunk(file, b"IDAT", data[start:start + 50])
+        write_chunk(file, b"IEND", b"")
+
+
+def test_color_strings():
+    assert color_rgb("#f80") == (255, 136, 0)
+    assert color_rgb("#0000ffff8000") == (0, 255, 128)
+    assert color_rgb("White") == (255, 255, 255)
+    assert rgb_hex((1, 171, 255)) == "#01abff"
+    with pytest.raises(ValueError):
+        color_rgb("#12")
+
+
+def test_png_blocks_per_stitch(tmp_path, chart):
+    path = str(tmp_path / "chart.png")
+    write_png(path, chart, scale=3)
+    image, rows = read_rgb(path)
+    assert (image.width, image.height) == (21, 15)
+    for row in range(chart.height):
+        for col in range(chart.width):
+            for dy, dx in ((0, 0), (2, 1)):
+                assert pixel(rows, 3 * col + dx, 3 * row + dy) == color_rgb(chart.get(row, col))
+
+
+def test_png_gridlines(tmp_path):
+    pattern = Pattern(2, 1, "red")
+    path = str(tmp_path / "chart.png")
+    write_png(path, pattern, scale=4, gridlines="black")
+    image, rows = read_rgb(path)
+    assert (image.width, image.height) == (9, 5)
+    assert [pixel(rows, x, 2) for x in (0, 1, 4, 5, 8)] == [(0, 0, 0), (255, 0, 0), (0, 0, 0), (255, 0, 0), (0, 0, 0)]
+    assert pixel(rows, 3, 0) == pixel(rows, 3, 4) == (0, 0, 0)
+
+
+def test_interrupted_png_write_leaves_no_file(tmp_path):
+    pattern = Pattern(3, 200)
+    path = tmp_path / "chart.png"
+    done = []
+
+    def progress(fraction):
+        done.append(fraction)
+        if fraction > 0.5:
+            raise Cancelled
+
+    with pytest.raises(Cancelled):
+        write_png(str(path), pattern, progress=progress)
+    assert done == [0.0, 0.32, 0.64]
+    assert not path.exists()
+
+
+def test_filtered_rgba_png_is_blended_onto_white(tmp_path):
+    rows = [b"".join(bytes([x * 20, y * 30, 100, 0 if x == 0 else 255]) for x in range(5)) for y in range(6)]
+    path = str(tmp_path / "rgba.png")
+    write_filtered_png(path, 5, rows, color_type=6, bpp=4)
+    image, decoded = read_rgb(path)
+    assert isinstance(image, PngReader)
+    for y in range(6):
+        assert pixel(decoded, 0, y) == (255, 255, 255)
+        for x in range(1, 5):
+            assert pixel(decoded, x, y) == (x * 20, y * 30, 100)
+
+
+def test_pgm_is_read_as_gray(tmp_path):
+    path = tmp_path / "gray.pgm"
+    path.write_bytes(b"P5\n# comment\n3 2\n255\n" + bytes([0, 128, 255, 10, 20, 30]))
+    image, rows = read_rgb(str(path))
+    assert (image.width, image.height) == (3, 2)
+    assert pixel(rows, 1, 0) == (128, 128, 128) and pixel(rows, 2, 1) == (30, 30, 30)
+
+
+def test_other_files_are_not_images(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("hello")
+    with pytest.raises(ValueError):
+        open_image(str(path))
+
+
+def test_median_cut_keeps_distinct_clusters():
+    pixels = [(250, 0, 0)] * 10 + [(240, 10, 0)] * 10 + [(0, 0, 250)] * 10 + [(0, 10, 240)] * 10
+    palette, mapping = median_cut(pixels, 2)
+    assert len(palette) == 2
+    assert mapping[(250, 0, 0)] == mapping[(240, 10, 0)] != mapping[(0, 0, 250)] == mapping[(0, 10, 240)]
+    assert palette[mapping[(250, 0, 0)]] == (245, 5, 0)
+
+
+def test_median_cut_never_makes_more_colors_than_pixels():
+    palette, _ = median_cut([(1, 2, 3)] * 4, 8)
+    assert palette == [(1, 2, 3)]
+
+
+def test_import_recovers_a_chart_from_its_png(tmp_path):
+    pattern = Pattern(6, 4, "#ffffff")
+    pattern.fill_rect(1, 1, 2, 4, "#ff0000")
+    pattern.set(3, 5, "#0000ff")
+    path = str(tmp_path / "chart.png")
+    write_png(path, pattern, scale=5)
+    progress = []
+    imported = import_image(path, 6, 4, colors=3, progress=progress.append)
+    assert rows_of(imported) == rows_of(pattern)
+    assert progress[-1] == 1.0
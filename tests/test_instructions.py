@@ -0,0 +1,59 @@
+import io
+
+import pytest
+
+from instructions import RowInstructions, color_labels, write_instructions
+from pattern import Pattern
+
+
+@pytest.fixture
+def stripes():
+    """4 stitches x 3 rows: a red stitch at the left of the top row, a blue row at the bottom."""
+    pattern = Pattern(4, 3)
+    pattern.set(0, 0, "red")
+    pattern.fill_rect(2, 0, 2, 3, "blue")
+    return pattern
+
+
+def test_labels_go_by_stitch_count(stripes):
+    labels = color_labels(stripes)
+    assert {stripes.palette[cid]: label for cid, label in labels.items()} == {"white": "MC", "blue": "CC1", "red": "CC2"}
+
+
+def test_flat_rows_alternate_sides_from_the_bottom(stripes):
+    assert list(RowInstructions(stripes).lines()) == [
+        "Row 1 (RS): 4 CC1",
+        "Row 2 (WS): 4 MC",
+        "Row 3 (RS): 3 MC, 1 CC2",
+    ]
+
+
+def test_rounds_are_all_read_right_to_left(stripes):
+    lines = list(RowInstructions(stripes, "round").lines())
+    assert lines[1] == "Rnd 2: 4 MC"
+    assert lines[2] == "Rnd 3: 3 MC, 1 CC2"
+
+
+def test_unknown_mode_is_rejected(stripes):
+    with pytest.raises(ValueError):
+        RowInstructions(stripes, "sideways")
+
+
+def test_cached_rows_refresh_only_when_invalidated(stripes):
+    instructions = RowInstructions(stripes)
+    labels = color_labels(stripes)
+    list(instructions.lines(labels))
+    stripes.set(1, 3, "red")
+    assert instructions.line(1, labels) == "Row 2 (WS): 4 MC"
+    instructions.invalidate([1])
+    assert instructions.line(1, labels) == "Row 2 (WS): 3 MC, 1 CC2"
+
+
+def test_write_text_and_markdown(stripes):
+    text = io.StringIO()
+    write_instructions(text, stripes)
+    assert text.getvalue().splitlines()[:4] == ["4 stitches x 3 rows, worked flat.", "", "MC = white (7 st)", "CC1 = blue (4 st)"]
+    markdown = io.StringIO()
+    write_instructions(markdown, stripes, "round", markdown=True)
+    assert "| CC2 | red | 1 |" in markdown.getvalue()
+    assert markdown.getvalue().rstrip().endswith("- **Rnd 3:** 3 MC, 1 CC2")
@@ -0,0 +1,98 @@
+import os
+import time
+
+from conftest import rows_of
+from journal import MAGIC, Journal, claim_orphans, lock_journal, release_journal, replay
+from pattern import MAX_PALETTE_SIZE
+
+
+def journaled(tmp_path, chart, edits, **options):
+    """Journal ``edits(pattern, journal)`` on a copy of the chart, then close without deleting."""
+    path = str(tmp_path / "session.journal")
+    pattern = chart.copy()
+    journal = Journal(path, batch_delay=0, snapshot_interval=4, **options)
+    journal.start(pattern)
+    edits(pattern, journal)
+    journal.close()
+    return path, pattern
+
+
+def test_replay_rebuilds_the_last_state(tmp_path, chart):
+    def edits(pattern, journal):
+        for i in range(10):
+            pattern.set(i % pattern.height, i % pattern.width, f"#1{i:05x}")
+            journal.record(pattern, [(i % pattern.height, i % pattern.width)])
+        pattern.flip_horizontal()
+        journal.record(pattern, None)
+        pattern.set(0, 0, "red")
+        journal.record(pattern, [(0, 0)])
+
+    path, pattern = journaled(tmp_path, chart, edits)
+    assert rows_of(replay(path)) == rows_of(pattern)
+
+
+def test_replay_survives_reused_palette_ids(tmp_path, chart):
+    def edits(pattern, journal):
+        for i in range(MAX_PALETTE_SIZE + 20):
+            pattern.set(0, 0, f"#2{i:05x}")
+            journal.record(pattern, [(0, 0)])
+
+    path, pattern = journaled(tmp_path, chart, edits)
+    assert pattern.palette_generation > 0
+    assert rows_of(replay(path)) == rows_of(pattern)
+
+
+def test_large_journals_are_compacted(tmp_path, chart):
+    def edits(pattern, journal):
+        for i in range(200):
+            pattern.set(0, 0, "red" if i % 2 else "blue")
+            journal.record(pattern, [(0, 0)])
+            while not journal.queue.empty():
+                time.sleep(0.001)
+
+    path, pattern = journaled(tmp_path, chart, edits, compact_ratio=2)
+    assert os.path.getsize(path) < 6000
+    assert rows_of(replay(path)) == rows_of(pattern)
+
+
+def test_replay_stops_at_a_damaged_record(tmp_path, chart):
+    def edits(pattern, journal):
+        pattern.set(0, 0, "red")
+        journal.record(pattern, [(0, 0)])
+
+    path, _ = journaled(tmp_path, chart, edits)
+    with open(path, 'ab') as file:
+        file.write(b"\x40\x00\x00\x00garbage")
+    assert replay(path).get(0, 0) == "red"
+
+
+def test_journal_without_a_snapshot_replays_to_nothing(tmp_path):
+    path = tmp_path / "empty.journal"
+    path.write_bytes(MAGIC)
+    assert replay(str(path)) is None
+
+
+def test_clean_close_deletes_the_journal(tmp_path, chart):
+    path = str(tmp_path / "session.journal")
+    journal = Journal(path, batch_delay=0)
+    journal.start(chart)
+    journal.close(delete=True)
+    assert not os.path.exists(path) and not os.path.exists(path + ".lock")
+
+
+def test_only_unlocked_journals_are_orphans(tmp_path, chart):
+    live = Journal(str(tmp_path / "live.journal"), batch_delay=0)
+    live.start(chart)
+    path, _ = journaled(tmp_path, chart, lambda pattern, journal: None)
+    try:
+        orphans = claim_orphans(str(tmp_path))
+        assert [orphan for orphan, _ in orphans] == [path]
+        assert lock_journal(path) is None
+        for orphan, lock in orphans:
+            release_journal(orphan, lock)
+        assert os.path.exists(path)
+        orphan, lock = claim_orphans(str(tmp_path))[0]
+        release_journal(orphan, lock, delete=True)
+        assert not os.path.exists(path)
+    finally:
+        live.close(delete=True)
@@ -0,0 +1,169 @@
+from collections import Counter
+
+import pytest
+
+from conftest import rows_of
+from pattern import MAX_PALETTE_SIZE, PaletteFullError, Pattern
+
+
+def test_set_reports_changes():
+    pattern = Pattern(3, 2)
+    assert pattern.set(0, 1, "red")
+    assert not pattern.set(0, 1, "red")
+    assert pattern.get(0, 1) == "red"
+    assert pattern.row_colors(0) == ["white", "red", "white"]
+
+
+def test_fill_and_fill_rect(chart):
+    chart.fill("black")
+    assert rows_of(chart) == [["black"] * 7] * 5
+    chart.fill_rect(3, 4, 1, 2, "red")
+    assert rows_of(chart)[0] == ["black"] * 7
+    assert rows_of(chart)[2] == ["black", "black", "red", "red", "red", "black", "black"]
+
+
+def test_flips(chart):
+    before = rows_of(chart)
+    chart.flip_horizontal()
+    assert rows_of(chart) == [row[::-1] for row in before]
+    chart.flip_vertical()
+    assert rows_of(chart) == [row[::-1] for row in before[::-1]]
+
+
+def test_insert_and_remove_rows_and_columns(chart):
+    before = rows_of(chart)
+    chart.insert_row(2, "red")
+    chart.insert_column(0, "blue")
+    assert (chart.width, chart.height) == (8, 6)
+    assert rows_of(chart)[2] == ["blue"] + ["red"] * 7
+    chart.remove_row(2)
+    chart.remove_column(0)
+    assert rows_of(chart) == before
+
+
+def test_a_pattern_keeps_one_row_and_column():
+    pattern = Pattern(1, 1)
+    with pytest.raises(ValueError):
+        pattern.remove_row(0)
+    with pytest.raises(ValueError):
+        pattern.remove_column(0)
+
+
+def test_mirrored_tile():
+    pattern = Pattern(2, 2)
+    pattern.set(0, 0, "red")
+    pattern.tile(3, 2, mirror=True)
+    assert rows_of(pattern)[0] == ["red", "white", "white", "red", "red", "white"]
+    assert rows_of(pattern)[3] == rows_of(pattern)[0]
+    assert pattern.color_counts() == {"red": 6, "white": 18}
+
+
+def test_full_palette_reuses_unused_ids():
+    pattern = Pattern(2, 1)
+    for i in range(MAX_PALETTE_SIZE * 2):
+        pattern.set(0, 0, f"#{i:06x}")
+    assert pattern.get(0, 0) == f"#{MAX_PALETTE_SIZE * 2 - 1:06x}"
+    assert pattern.get(0, 1) == "white"
+    assert len(pattern.palette) == MAX_PALETTE_SIZE
+    assert pattern.palette_generation > 0
+
+
+def test_full_palette_keeps_retained_ids():
+    pattern = Pattern(2, 1)
+    for i in range(MAX_PALETTE_SIZE - 1):
+        pattern.color_id(f"#{i:06x}")
+    pattern.retained_ids = lambda: set(range(MAX_PALETTE_SIZE))
+    with pytest.raises(PaletteFullError):
+        pattern.set(0, 0, "red")
+    assert pattern.get(0, 0) == "white"
+
+
+def test_color_ids_never_hand_out_the_same_id_twice():
+    pattern = Pattern(1, 1)
+    for i in range(MAX_PALETTE_SIZE - 1):
+        pattern.color_id(f"#{i:06x}")
+    ids = pattern.color_ids(["red", "green", "blue"])
+    assert len(set(ids)) == 3
+    assert [pattern.color_of(cid) for cid in ids] == ["red", "green", "blue"]
+
+
+def test_copy_is_independent(chart):
+    other = chart.copy()
+    other.set(0, 0, "red" if chart.get(0, 0) != "red" else "blue")
+    assert rows_of(other) != rows_of(chart)
+
+
+def test_assign_maps_colors_onto_existing_ids(chart):
+    pattern = Pattern(2, 2, "black")
+    black = pattern.color_id("black")
+    pattern.assign(chart)
+    assert rows_of(pattern) == rows_of(chart)
+    assert pattern.color_id("black") == black
+
+
+def test_dict_round_trip(chart):
+    assert rows_of(Pattern.from_dict(chart.to_dict())) == rows_of(chart)
+
+
+def test_from_dict_ignores_cells_outside_the_chart():
+    pattern = Pattern.from_dict({"width": 2, "height": 2, "cells": {"0,1": "red", "5,5": "blue"}})
+    assert rows_of(pattern) == [["white", "red"], ["white", "white"]]
+
+
+def test_flood_fill_stops_at_other_colors():
+    pattern = Pattern(7, 5)
+    pattern.fill_rect(0, 3, 4, 3, "black")
+    changed = pattern.flood_fill(0, 0, "red")
+    assert len(changed) == 15
+    assert rows_of(pattern)[4] == ["red"] * 3 + ["black"] + ["white"] * 3
+
+
+def test_flood_fill_diagonal_crosses_corners():
+    pattern = Pattern(3, 3)
+    pattern.set(0, 1, "black")
+    pattern.set(1, 0, "black")
+    assert len(pattern.flood_fill(0, 0, "red")) == 1
+    assert len(pattern.flood_fill(1, 1, "blue", diagonal=True)) == 6
+    assert pattern.get(0, 0) == "red"
+
+
+def test_replace_color(chart):
+    before = rows_of(chart)
+    changed = chart.replace_color("black", "red")
+    assert len(changed) == sum(row.count("black") for row in before)
+    assert rows_of(chart) == [["red" if color == "black" else color for color in row] for row in before]
+    assert chart.replace_color("#fedcba", "red") == []
+
+
+def stitch_counts(pattern):
+    return dict(Counter(color for row in rows_of(pattern) for color in row))
+
+
+def test_counts_follow_cell_edits():
+    pattern = Pattern(3, 2)
+    pattern.set(0, 1, "red")
+    pattern.set(0, 1, "red")
+    assert pattern.color_counts() == {"white": 5, "red": 1}
+    pattern.fill_rect(0, 0, 1, 0, "blue")
+    assert pattern.color_counts() == {"white": 3, "red": 1, "blue": 2}
+    pattern.fill("black")
+    assert pattern.color_counts() == {"black": 6}
+
+
+def test_counts_match_data_after_bulk_operations(chart):
+    chart.insert_rows(2, 2, "red")
+    chart.remove_columns(1, 3)
+    chart.shift(1, -2)
+    chart.tile(2, 3)
+    chart.rotate_clockwise()
+    chart.crop(1, 1, 5, 6)
+    chart.replace_color("black", "red")
+    chart.flood_fill(0, 0, "blue")
+    chart.restore(chart.copy().snapshot())
+    assert chart.color_counts() == stitch_counts(chart)
+
+
+def test_color_usage_is_sorted_by_stitches():
+    pattern = Pattern(10, 2)
+    pattern.fill_rect(0, 0, 0, 2, "red")
+    assert pattern.color_usage(2.5) == [("white", 17, 0.425), ("red", 3, 0.075)]
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from conftest import rows_of
+from fileformats import load_pattern_file, save_pattern_file
+from pattern import Pattern
+from patterndiff import Diff, main, merge
+
+
+def test_identical_charts_have_no_diff(chart):
+    diff = Diff(chart, chart.copy())
+    assert not diff and diff.rectangles == []
+
+
+def test_diff_finds_changed_regions(chart):
+    other = chart.copy()
+    other.fill_rect(1, 1, 2, 2, "red")
+    other.set(4, 6, "red" if chart.get(4, 6) != "red" else "blue")
+    diff = Diff(chart, other)
+    changed = sum(chart.get(r, c) != other.get(r, c) for r in range(chart.height) for c in range(chart.width))
+    assert diff.changed == changed
+    assert (4, 6, 5, 7) in diff.rectangles
+
+
+def test_diff_compares_by_color_not_id(chart):
+    shuffled = Pattern(1, 1, "#0000aa")
+    shuffled.assign(chart)
+    assert not Diff(chart, shuffled)
+
+
+def test_unused_palette_entries_take_no_shared_ids(chart):
+    ours, theirs = chart.copy(), chart.copy()
+    for i in range(200):
+        ours.color_id(f"#10{i:04x}")
+        theirs.color_id(f"#20{i:04x}")
+    theirs.set(0, 0, "#200000")
+    merged, conflicts = merge(chart, ours, theirs)
+    assert merged.get(0, 0) == "#200000" and not conflicts
+    assert Diff(ours, theirs).rectangles == [(0, 0, 1, 1)]
+
+
+def test_offset_diff_counts_cells_outside_either_chart(chart):
+    diff = Diff(chart, chart.copy(), offset=(0, 1))
+    assert diff.left == 0 and any(right == chart.width + 1 for _, _, _, right in diff.rectangles)
+
+
+def test_merge_takes_each_sides_changes(chart):
+    ours, theirs = chart.copy(), chart.copy()
+    ours.fill_rect(0, 0, 0, 2, "red")
+    theirs.fill_rect(4, 4, 4, 6, "blue")
+    merged, conflicts = merge(chart, ours, theirs)
+    expected = rows_of(ours)
+    expected[4][4:7] = ["blue"] * 3
+    assert rows_of(merged) == expected and conflicts == []
+
+
+def test_merge_reports_conflicts_and_keeps_ours(chart):
+    ours, theirs = chart.copy(), chart.copy()
+    ours.set(2, 3, "red")
+    theirs.set(2, 3, "blue")
+    merged, conflicts = merge(chart, ours, theirs)
+    assert merged.get(2, 3) == "red"
+    assert conflicts == [(2, 3, 3, 4)]
+
+
+def test_merge_needs_same_sized_charts(chart):
+    smaller = chart.copy()
+    smaller.remove_rows(0)
+    with pytest.raises(ValueError):
+        merge(chart, chart.copy(), smaller)
+
+
+def test_command_line(tmp_path, chart, capsys):
+    ours, theirs = chart.copy(), chart.copy()
+    ours.set(0, 0, "red" if chart.get(0, 0) != "red" else "blue")
+    theirs.fill_rect(4, 0, 4, 6, "#123456")
+    paths = []
+    for name, pattern in (("base", chart), ("ours", ours), ("theirs", theirs)):
+        paths.append(str(tmp_path / f"{name}.knit"))
+        save_pattern_file(paths[-1], pattern)
+
+    assert main(["diff", paths[0], paths[0]]) == 0
+    assert main(["diff", paths[0], paths[1], "--json"]) == 1
+    assert json.loads(capsys.readouterr().out.splitlines()[-1]) == {"changed": 1, "rectangles": [[0, 0, 1, 1]]}
+    output = str(tmp_path / "merged.json")
+    assert main(["merge", *paths, "-o", output]) == 0
+    assert rows_of(load_pattern_file(output)[0]) == rows_of(ours)[:4] + [["#123456"] * 7]
@@ -0,0 +1,65 @@
+from conftest import rows_of
+from pattern import Pattern
+from selection import Clip, Selection, line_cells
+
+
+def test_line_cells_include_both_ends():
+    assert line_cells(0, 0, 0, 3) == [(0, 0), (0, 1), (0, 2), (0, 3)]
+    assert line_cells(2, 2, 2, 2) == [(2, 2)]
+    assert line_cells(0, 0, 3, 3) == [(0, 0), (1, 1), (2, 2), (3, 3)]
+
+
+def test_line_cells_step_one_cell_at_a_time():
+    for end in [(5, 2), (-4, 7), (1, -6), (-3, -3)]:
+        cells = line_cells(0, 0, *end)
+        assert cells[-1] == end
+        assert all(max(abs(r2 - r1), abs(c2 - c1)) == 1 for (r1, c1), (r2, c2) in zip(cells, cells[1:]))
+        assert len(cells) == max(abs(end[0]), abs(end[1])) + 1
+
+
+def test_rectangle_is_clamped_and_ordered():
+    selection = Selection.rectangle(6, -2, 1, 3, width=5, height=4)
+    assert (selection.top, selection.left, selection.bottom, selection.right) == (1, 0, 4, 4)
+    assert len(list(selection.cells())) == 12
+
+
+def test_lasso_fills_inside_the_path():
+    selection = Selection.lasso([(0, 2), (4, 6), (4, -2)], width=5, height=5)
+    assert (0, 2) in selection and (3, 2) in selection and (4, 0) in selection
+    assert (0, 0) not in selection and (1, 4) not in selection
+    assert (selection.left, selection.right) == (0, 5)
+
+
+def test_lasso_of_a_square_outline_selects_the_whole_square():
+    selection = Selection.lasso([(1, 1), (1, 4), (4, 4), (4, 1)], width=6, height=6)
+    assert sorted(selection.cells()) == [(row, col) for row in range(1, 5) for col in range(1, 5)]
+
+
+def test_fill_records_previous_ids(chart):
+    before = chart.copy()
+    changes = {}
+    selection = Selection.rectangle(1, 1, 2, 3, chart.width, chart.height)
+    touched = selection.fill(chart, "red", changes)
+    assert len(touched) == 6 and all(chart.get(row, col) == "red" for row, col in touched)
+    assert changes == {chart.index(row, col): before.data[chart.index(row, col)] for row, col in touched}
+
+
+def test_copy_and_paste_into_another_palette(chart):
+    clip = Clip.from_selection(chart, Selection.rectangle(0, 0, 1, 2, chart.width, chart.height))
+    assert sorted(clip.colors) == sorted({chart.get(row, col) for row in range(2) for col in range(3)})
+    target = Pattern(5, 5, "#123456")
+    touched = clip.paste(target, 3, -1)
+    assert touched == [(3, 0), (3, 1), (4, 0), (4, 1)]
+    assert rows_of(target)[3][:2] == rows_of(chart)[0][1:3]
+    assert rows_of(target)[4][2:] == ["#123456"] * 3
+
+
+def test_masked_clip_only_pastes_selected_cells(chart):
+    lasso = Selection.lasso([(0, 0), (0, 2), (2, 0)], chart.width, chart.height)
+    clip = Clip.from_selection(chart, lasso)
+    target = Pattern(3, 3, "#123456")
+    clip.paste(target, 0, 0)
+    for row in range(3):
+        for col in range(3):
+            expected = chart.get(row, col) if (row, col) in lasso else "#123456"
+            assert target.get(row, col) == expected
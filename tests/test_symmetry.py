@@ -0,0 +1,43 @@
+import pytest
+
+from symmetry import Symmetry
+
+
+def images(symmetry, cell, width=6, height=5):
+    return [f(*cell) for f in symmetry.maps(width, height)]
+
+
+def test_mirrors_about_the_middle_of_the_chart():
+    assert images(Symmetry("vertical"), (1, 0)) == [(1, 0), (1, 5)]
+    assert images(Symmetry("horizontal"), (1, 0)) == [(1, 0), (3, 0)]
+    assert images(Symmetry("both"), (0, 1)) == [(0, 1), (0, 4), (4, 1), (4, 4)]
+
+
+def test_center_is_in_doubled_cell_coordinates():
+    # (3, 3) is the corner shared by cells (1, 1) and (2, 2), so mirrors land on whole cells.
+    assert images(Symmetry("vertical", center=(3, 3)), (0, 0)) == [(0, 0), (0, 3)]
+    assert images(Symmetry("horizontal", center=(4, 4)), (0, 0)) == [(0, 0), (4, 0)]
+
+
+def test_rotational_images_go_around_the_center():
+    symmetry = Symmetry("rotational", folds=4, center=(4, 4))
+    assert sorted(images(symmetry, (0, 2))) == [(0, 2), (2, 0), (2, 4), (4, 2)]
+    assert images(symmetry, (2, 2)) == [(2, 2)] * 4
+
+
+def test_segments_map_both_ends():
+    symmetry = Symmetry("vertical")
+    assert symmetry.segments((0, 0), (2, 1), 6, 5) == [((0, 0), (2, 1)), ((0, 5), (2, 4))]
+    assert symmetry.segments(None, (2, 1), 6, 5) == [(None, (2, 1)), (None, (2, 4))]
+    assert Symmetry().segments((0, 0), (1, 1), 6, 5) == [((0, 0), (1, 1))]
+
+
+def test_guides():
+    assert Symmetry("vertical").guides(6, 5) == [((0, 3.0), (5, 3.0))]
+    assert len(Symmetry("rotational").guides(6, 5)) == 2
+    assert Symmetry().guides(6, 5) == []
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        Symmetry("radial")
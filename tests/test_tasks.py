@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from tasks import TaskScheduler
+
+
+class FakeMaster:
+    """Stands in for the Tk root: ``after`` callbacks run when the test calls ``run_pending``."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, callback):
+        self.callbacks.append(callback)
+
+    def run_pending(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+def wait(scheduler, master, timeout=5):
+    deadline = time.monotonic() + timeout
+    while scheduler.busy:
+        assert time.monotonic() < deadline, "task never finished"
+        time.sleep(0.005)
+        master.run_pending()
+
+
+@pytest.fixture
+def master():
+    return FakeMaster()
+
+
+def test_tasks_run_in_order_and_report_on_the_polling_thread(master):
+    changes = []
+    scheduler = TaskScheduler(master, changes.append)
+    results = []
+    main_thread = threading.current_thread()
+    for n in range(3):
+        scheduler.run(f"task {n}", lambda progress, n=n: n * n,
+                      lambda result: results.append((result, threading.current_thread() is main_thread)))
+    wait(scheduler, master)
+    assert results == [(0, True), (1, True), (4, True)]
+    assert changes[-1] is None
+
+
+def test_progress_is_reported(master):
+    seen = []
+    scheduler = TaskScheduler(master, lambda task: seen.append(task and task.progress))
+    release = threading.Event()
+
+    def work(progress):
+        progress(0.5)
+        release.wait(5)
+        return "done"
+
+    scheduler.run("slow", work, lambda result: None)
+    while 0.5 not in seen:
+        time.sleep(0.005)
+        master.run_pending()
+    release.set()
+    wait(scheduler, master)
+
+
+def test_errors_go_to_on_error_or_escape_poll(master):
+    scheduler = TaskScheduler(master)
+    errors = []
+    scheduler.run("fails", lambda progress: 1 / 0, lambda result: None, errors.append)
+    wait(scheduler, master)
+    assert isinstance(errors[0], ZeroDivisionError)
+
+    after = []
+    scheduler.run("unhandled", lambda progress: int("x"), lambda result: None)
+    scheduler.run("next", lambda progress: "ran", after.append)
+    with pytest.raises(ValueError):
+        wait(scheduler, master)
+    wait(scheduler, master)
+    assert after == ["ran"]
+
+
+def test_cancelling_queued_and_running_tasks(master):
+    scheduler = TaskScheduler(master)
+    started = threading.Event()
+    cancelled = []
+
+    def work(progress):
+        started.set()
+        while True:
+            progress(0.1)
+            time.sleep(0.005)
+
+    running = scheduler.run("running", work, lambda result: None, on_cancel=lambda: cancelled.append("running"))
+    queued = scheduler.run("queued", lambda progress: None, lambda result: None,
+                           on_cancel=lambda: cancelled.append("queued"))
+    scheduler.cancel(queued)
+    assert cancelled == ["queued"]
+    started.wait(5)
+    scheduler.cancel(running)
+    wait(scheduler, master)
+    assert cancelled == ["queued", "running"]
+
+
+def test_uncancellable_tasks_finish(master):
+    scheduler = TaskScheduler(master)
+    results = []
+    task = scheduler.run("save", lambda progress: (progress(0.5), "saved")[1], results.append, cancellable=False)
+    scheduler.cancel(task)
+    wait(scheduler, master)
+    assert results == ["saved"]
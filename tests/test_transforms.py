@@ -0,0 +1,68 @@
+import pytest
+
+from conftest import rows_of
+import transforms
+
+EDITS = {
+    "flip horizontal": lambda p: transforms.flip_horizontal(),
+    "flip vertical": lambda p: transforms.flip_vertical(),
+    "rotate clockwise": lambda p: transforms.rotate_clockwise(),
+    "rotate counterclockwise": lambda p: transforms.rotate_counterclockwise(),
+    "rotate 180": lambda p: transforms.rotate_180(),
+    "shift": lambda p: transforms.shift(2, -3),
+    "insert rows": lambda p: transforms.insert_rows(1, 2, "red"),
+    "remove rows": lambda p: transforms.remove_rows(p, 1, 2),
+    "insert columns": lambda p: transforms.insert_columns(7, 3, "red"),
+    "remove columns": lambda p: transforms.remove_columns(p, 0, 4),
+    "crop": lambda p: transforms.crop(p, 1, 2, 4, 5),
+    "tile": lambda p: transforms.tile(p, 2, 3),
+    "mirror tile": lambda p: transforms.tile(p, 3, 2, mirror=True),
+}
+
+
+@pytest.mark.parametrize("name", EDITS)
+def test_undo_inverts_redo(chart, name):
+    before = rows_of(chart)
+    edit = EDITS[name](chart)
+    edit.redo(chart)
+    after = rows_of(chart)
+    assert after != before
+    edit.undo(chart)
+    assert rows_of(chart) == before
+    edit.redo(chart)
+    assert rows_of(chart) == after
+
+
+def test_rotations_match_cell_by_cell(chart):
+    expected = [[chart.get(chart.height - 1 - col, row) for col in range(chart.height)] for row in range(chart.width)]
+    transforms.rotate_clockwise().redo(chart)
+    assert rows_of(chart) == expected
+
+
+def test_shift_wraps_around(chart):
+    before = rows_of(chart)
+    transforms.shift(1, 2).redo(chart)
+    assert rows_of(chart)[1][2:] == before[0][:-2]
+    assert rows_of(chart)[0] == before[-1][-2:] + before[-1][:-2]
+
+
+def test_crop_keeps_the_rectangle(chart):
+    before = rows_of(chart)
+    transforms.crop(chart, 1, 2, 4, 5).redo(chart)
+    assert rows_of(chart) == [row[2:5] for row in before[1:4]]
+
+
+def test_tile_repeats_the_chart(chart):
+    before = rows_of(chart)
+    transforms.tile(chart, 2, 3).redo(chart)
+    assert rows_of(chart) == [row * 2 for row in before] * 3
+
+
+def test_removed_cells_are_all_undo_keeps(chart):
+    edit = transforms.remove_rows(chart, 0)
+    assert edit.size() == chart.width + 64
+
+
+def test_grid_edit_reports_the_ids_it_holds(chart):
+    edit = transforms.remove_rows(chart, 0)
+    assert edit.ids() == set(chart.row_ids(0))
@@ -0,0 +1,76 @@
+from history import GridEdit
+from pattern import DEFAULT_COLOR
+
+# Whole-chart transforms as history edits. Each function returns a GridEdit whose
+# redo ops run the transform through Pattern's bulk methods and whose undo ops
+# invert it, keeping only the cell ids the inverse can't recompute.
+
+
+def flip_horizontal():
+    return GridEdit([("flip_horizontal", ())], [("flip_horizontal", ())])
+
+
+def flip_vertical():
+    return GridEdit([("flip_vertical", ())], [("flip_vertical", ())])
+
+
+def rotate_clockwise():
+    return GridEdit([("rotate_clockwise", ())], [("rotate_counterclockwise", ())])
+
+
+def rotate_counterclockwise():
+    return GridEdit([("rotate_counterclockwise", ())], [("rotate_clockwise", ())])
+
+
+def rotate_180():
+    return GridEdit([("rotate_180", ())], [("rotate_180", ())])
+
+
+def shift(rows=0, cols=0):
+    return GridEdit([("shift", (rows, cols))], [("shift", (-rows, -cols))])
+
+
+def insert_rows(index, count=1, color=DEFAULT_COLOR):
+    return GridEdit([("insert_rows", (index, count, color))], [("remove_rows", (index, count))])
+
+
+def remove_rows(pattern, index, count=1):
+    removed = pattern.region_ids(index, 0, index + count, pattern.width)
+    return GridEdit([("remove_rows", (index, count))],
+                    [("insert_rows", (index, count)), ("put_region_ids", (index, 0, index + count, pattern.width, removed))])
+
+
+def insert_columns(index, count=1, color=DEFAULT_COLOR):
+    return GridEdit([("insert_columns", (index, count, color))], [("remove_columns", (index, count))])
+
+
+def remove_columns(pattern, index, count=1):
+    removed = pattern.region_ids(0, index, pattern.height, index + count)
+    return GridEdit([("remove_columns", (index, count))],
+                    [("insert_columns", (index, count)), ("put_region_ids", (0, index, pattern.height, index + count, removed))])
+
+
+def crop(pattern, top, left, bottom, right):
+    """Crop to [top, bottom) x [left, right); undo regrows the border and puts back only the cropped-off cells."""
+    width, height = pattern.width, pattern.height
+    bands = [
+        (0, 0, top, width),
+        (bottom, 0, height, width),
+        (top, 0, bottom, left),
+        (top, right, bottom, width),
+    ]
+    undo_ops = [
+        ("insert_rows", (0, top)),
+        ("insert_rows", (bottom, height - bottom)),
+        ("insert_columns", (0, left)),
+        ("insert_columns", (right, width - right)),
+    ]
+    for band in bands:
+        if band[0] < band[2] and band[1] < band[3]:
+            undo_ops.append(("put_region_ids", band + (pattern.region_ids(*band),)))
+    return GridEdit([("crop", (top, left, bottom, right))], undo_ops)
+
+
+def tile(pattern, across, down, mirror=False):
+    """Repeat the chart as an across x down block; the original stays in the top-left corner, so undo is a crop."""
+    return GridEdit([("tile", (across, down, mirror))], [("crop", (0, 0, pattern.height, pattern.width))])